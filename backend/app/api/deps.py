@@ -3,22 +3,32 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from app.models.user import UserInDB, User
 from app.core.config import settings
-from app.core.database import db
-from passlib.context import CryptContext
+from app.crud import crud_users
+from app.core.cache import MISSING, TTLCache
+from app.core.hashing import password_hasher
+from app.core.principals import principal_cache
+from app.core.serialization import mongo_projection
 from typing import Optional
+import time
 ## Removed circular import of get_current_user
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_hasher.context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+# For endpoints that also serve anonymous requests
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token", auto_error=False)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Decoded JWT payloads keyed by the raw token. The users behind the tokens
+# are cached by app/core/principals.py.
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 async def get_user(email: str):
-    user = await db.users.find_one({"email": email})
+    user = await crud_users.get_user_by_email(email)
     if user:
         user["id"] = str(user["_id"])
         return UserInDB(**user)
@@ -28,11 +38,34 @@ async def authenticate_user(email: str, password: str):
     user = await get_user(email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # The stored hash uses outdated parameters; upgrade it transparently
+        await crud_users.set_password_hash(user.id, new_hash)
     return user
 
 
+def decode_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, reusing the result for repeat requests with the same token.
+    Raises JWTError for invalid or expired tokens.
+    """
+    payload = token_cache.get(token)
+    if payload is MISSING:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # Never serve a token from the cache past its own expiry
+        ttl = settings.AUTH_CACHE_TTL_SECONDS
+        if payload.get("exp") is not None:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "principals": principal_cache.stats()}
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,19 +73,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        print(payload)
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = await get_user(email=email)
+
+    async def load() -> Optional[User]:
+        # One lookup on the unique email index, without the password hash
+        user_in_db = await crud_users.get_user_by_email(email, mongo_projection(User))
+        return User(**user_in_db) if user_in_db is not None else None
+
+    user = await principal_cache.get_or_load(email, load)
     if user is None:
         raise credentials_exception
     return user
 
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[User]:
+    """
+    The authenticated user, or None without a token. A token that is sent
+    but invalid is still rejected.
+    """
+    if not token:
+        return None
+    return await get_current_user(token)
+
 async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_admin:
         raise HTTPException(
@@ -1,41 +1,129 @@
 # app/api/endpoints/admin.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import datetime
 from app.api.deps import get_current_admin_user
+from app.api.pagination import NEXT_CURSOR_HEADER, SortMode, paginate
 from app.core.database import db
+from app.core.indexes import index_registry
+from app.core.principals import principal_cache
+from app.core.jobs import job_queue
+from app.core.response_cache import IDEA_LISTS, comments_tag, idea_tag, response_cache
+from app.core.serialization import json_response, mongo_projection
+from app.crud import crud_ideas, crud_users
 
 from app.models.user import User
-from app.models.idea import Idea, IdeaStatus
+from app.models.idea import BulkIdeaSelection, BulkResult, BulkStatusUpdate, Idea, IdeaStats, IdeaStatus, IdeaCategory
+from app.services.clusters import update_idea_cells
+from app.services.search import TEXT_PROJECTION, update_search_terms
+from app.services.stats import STATS_FIELDS, read_idea_stats, update_idea_stats
+from app.services.idea_events import mark_ideas_changed, publish_idea_deleted
+from app.services.moderation import bulk_delete, bulk_set_status
+from app.services.tasks import CELL_FIELDS
+from app.services.votes import vote_counter_buffer
+from app.services.export import (
+    ExportFormat, MEDIA_TYPES, IDEA_EXPORT_FIELDS, USER_EXPORT_FIELDS,
+    resolve_fields, projection_for, stream_export,
+)
 
 router = APIRouter()
 
 @router.get("/ideas", response_model=list[Idea], summary="Get all ideas (Admin Only)")
-async def read_all_ideas(current_user: User = Depends(get_current_admin_user)):
+async def read_all_ideas(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: SortMode = SortMode.NEWEST,
+    current_user: User = Depends(get_current_admin_user)
+):
     """
-    Retrieve a list of all ideas.
+    Retrieve a page of ideas; follow `X-Next-Cursor` for the next one.
     Accessible only by admin users.
     """
-    ideas = []
-    cursor = db.ideas.find({})
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        ideas.append(Idea(**doc))
-    return ideas
+    docs = await paginate(db.ideas, {}, sort, cursor, limit, response, projection=mongo_projection(Idea))
+    return json_response(List[Idea], docs, response, headers=(NEXT_CURSOR_HEADER,))
+
+def _created_range(created_from: Optional[datetime], created_to: Optional[datetime]) -> dict:
+    created = {}
+    if created_from:
+        created["$gte"] = created_from
+    if created_to:
+        created["$lt"] = created_to
+    return {"created_at": created} if created else {}
+
+def _export_response(collection, query: dict, fields: Optional[str], allowed: List[str], fmt: ExportFormat, batch_size: int, name: str):
+    try:
+        export_fields = resolve_fields(fields, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Sorting on _id keeps the export stable and is served by the primary key index
+    cursor = collection.find(query, projection_for(export_fields)).sort("_id", 1).batch_size(batch_size)
+    return StreamingResponse(
+        stream_export(cursor, export_fields, fmt, batch_size),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'},
+    )
+
+@router.get("/ideas/export", summary="Stream all ideas as NDJSON or CSV (Admin Only)")
+async def export_ideas(
+    format: ExportFormat = ExportFormat.NDJSON,
+    fields: Optional[str] = Query(None, description="Comma separated fields to include"),
+    idea_status: Optional[IdeaStatus] = Query(None, alias="status"),
+    category: Optional[IdeaCategory] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = Query(500, ge=1, le=10000),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Stream ideas straight from the database cursor.
+    Accessible only by admin users.
+    """
+    query = _created_range(created_from, created_to)
+    if idea_status:
+        query["status"] = idea_status.value
+    if category:
+        query["category"] = category.value
+    return _export_response(db.ideas, query, fields, IDEA_EXPORT_FIELDS, format, batch_size, "ideas")
+
+@router.get("/users/export", summary="Stream all users as NDJSON or CSV (Admin Only)")
+async def export_users(
+    format: ExportFormat = ExportFormat.NDJSON,
+    fields: Optional[str] = Query(None, description="Comma separated fields to include"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = Query(500, ge=1, le=10000),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Stream users straight from the database cursor.
+    Accessible only by admin users.
+    """
+    query = _created_range(created_from, created_to)
+    return _export_response(db.users, query, fields, USER_EXPORT_FIELDS, format, batch_size, "users")
 
 @router.get("/users", response_model=list[User], summary="Get all users (Admin Only)")
-async def read_all_users(current_user: User = Depends(get_current_admin_user)):
+async def read_all_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: SortMode = SortMode.NEWEST,
+    current_user: User = Depends(get_current_admin_user)
+):
     """
-    Retrieve a list of all users.
+    Retrieve a page of users; follow `X-Next-Cursor` for the next one.
     Accessible only by admin users.
     """
-    users = []
-    cursor = db.users.find({})
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        users.append(User(**doc))
-    return users
+    # Projecting the User fields also keeps hashed_password out of the response
+    docs = await paginate(
+        db.users, {}, sort, cursor, limit, response,
+        projection=mongo_projection(User),
+        allowed=(SortMode.NEWEST, SortMode.OLDEST)
+    )
+    return json_response(List[User], docs, response, headers=(NEXT_CURSOR_HEADER,))
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete a user (Admin Only)")
 async def delete_user(user_id: str, current_user: User = Depends(get_current_admin_user)):
@@ -43,36 +131,69 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_adm
     Delete a user by their ID.
     Accessible only by admin users.
     """
-    # Check if the user to be deleted exists
-    user_to_delete = await db.users.find_one({"_id": ObjectId(user_id)})
+    # Prevent an admin from deleting themselves
+    if user_id == str(current_user.id):
+        raise HTTPException(status_code=403, detail="Cannot delete your own admin account")
+
+    user_to_delete = await crud_users.delete_user(user_id)
     if user_to_delete is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Optional: Prevent an admin from deleting themselves
-    if str(user_to_delete["_id"]) == str(current_user.id):
-        raise HTTPException(status_code=403, detail="Cannot delete your own admin account")
+    await principal_cache.evict(user_to_delete["email"])
 
-    # Delete the user and their associated data
-    await db.users.delete_one({"_id": ObjectId(user_id)})
-    await db.ideas.delete_many({"creator_id": user_id})
-    await db.votes.delete_many({"user_id": user_id})
+    # Their ideas, comments and votes are removed in batches by a background job
+    await job_queue.enqueue("delete_user_content", {"user_id": user_id}, key=f"delete_user_content:{user_id}")
 
     return {"status": "success"}
 
+def _bulk_result(results: dict, truncated: bool) -> BulkResult:
+    counts = {}
+    for result in results.values():
+        counts[result] = counts.get(result, 0) + 1
+    return BulkResult(results=results, counts=counts, truncated=truncated)
+
+@router.post("/ideas/bulk/status", response_model=BulkResult, summary="Change the status of many ideas (Admin Only)")
+async def bulk_update_status(update: BulkStatusUpdate, current_user: User = Depends(get_current_admin_user)):
+    """
+    Set the status of the ideas given by `ids` or by `filter`.
+    Accessible only by admin users.
+    """
+    try:
+        results, truncated = await bulk_set_status(update, update.status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _bulk_result(results, truncated)
+
+@router.post("/ideas/bulk/delete", response_model=BulkResult, summary="Delete many ideas (Admin Only)")
+async def bulk_delete_ideas(selection: BulkIdeaSelection, current_user: User = Depends(get_current_admin_user)):
+    """
+    Delete the ideas given by `ids` or by `filter`; their votes and comments
+    are removed by a background job.
+    Accessible only by admin users.
+    """
+    try:
+        results, truncated = await bulk_delete(selection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _bulk_result(results, truncated)
+
 @router.delete("/ideas/{idea_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete an idea (Admin Only)")
 async def delete_idea(idea_id: str, current_user: User = Depends(get_current_admin_user)):
     """
     Delete any idea by its ID.
     Accessible only by admin users.
     """
-    # Check if the idea to be deleted exists
-    idea_to_delete = await db.ideas.find_one({"_id": ObjectId(idea_id)})
+    idea_to_delete = await crud_ideas.delete_idea(idea_id, projection={**CELL_FIELDS, **STATS_FIELDS, **TEXT_PROJECTION})
     if idea_to_delete is None:
         raise HTTPException(status_code=404, detail="Idea not found")
+    await update_idea_stats(removed=[idea_to_delete])
+    await update_search_terms(removed=[idea_to_delete])
 
-    # Delete the idea and all votes associated with it
-    await db.ideas.delete_one({"_id": ObjectId(idea_id)})
-    await db.votes.delete_many({"idea_id": idea_id})
+    vote_counter_buffer.forget(idea_id)
+    await response_cache.invalidate(idea_tag(idea_id), comments_tag(idea_id), IDEA_LISTS)
+    publish_idea_deleted(idea_id, idea_to_delete.get("category"))
+    # Votes, comments and map counters are cleaned up by a background job
+    idea_to_delete["id"] = str(idea_to_delete.pop("_id"))
+    await job_queue.enqueue("delete_idea_content", {"idea": idea_to_delete}, key=f"delete_idea_content:{idea_id}")
 
     return {"status": "success"}
 
@@ -81,15 +202,63 @@ async def update_idea_status(idea_id: str, new_status: IdeaStatus, current_user:
     """
     Update the status of an idea (Admin Only).
     """
-    idea_to_update = await db.ideas.find_one({"_id": ObjectId(idea_id)})
+    changed_at = datetime.utcnow()
+    idea_to_update = await crud_ideas.set_status(idea_id, new_status, changed_at)
     if idea_to_update is None:
         raise HTTPException(status_code=404, detail="Idea not found")
-    
-    await db.ideas.update_one(
-        {"_id": ObjectId(idea_id)},
-        {"$set": {"status": new_status.value}}
-    )
-    
-    updated_idea = await db.ideas.find_one({"_id": ObjectId(idea_id)})
+
+    updated_idea = crud_ideas.with_status(idea_to_update, new_status, changed_at)
+    await update_idea_cells(removed=[idea_to_update], added=[updated_idea])
+    await update_idea_stats(removed=[idea_to_update], added=[updated_idea])
+    await response_cache.invalidate(idea_tag(idea_id), IDEA_LISTS)
+    mark_ideas_changed(idea_id)
     updated_idea["id"] = str(updated_idea["_id"])
     return updated_idea
+
+
+@router.get("/stats", response_model=IdeaStats, summary="Idea counts and time to resolve (Admin Only)")
+async def read_stats(
+    days: int = Query(30, ge=1, le=366, description="Days of new-idea counts to include"),
+    weeks: int = Query(12, ge=1, le=104, description="Weeks of new-idea counts to include"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Dashboard figures, read from pre-aggregated counters.
+    Accessible only by admin users.
+    """
+    return await read_idea_stats(days, weeks)
+
+@router.post("/stats/rebuild", status_code=status.HTTP_202_ACCEPTED, summary="Recompute the dashboard counters (Admin Only)")
+async def rebuild_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    Recount the dashboard figures from the ideas collection in a background job.
+    """
+    await job_queue.enqueue("rebuild_idea_stats", {})
+    return {"status": "accepted"}
+
+@router.get("/indexes", summary="Registered indexes and the query plans they serve (Admin Only)")
+async def read_index_report(current_user: User = Depends(get_current_admin_user)):
+    """
+    Which registered indexes exist, and the explain() summary of every
+    registered query shape; `collection_scans` counts the shapes that would
+    read their whole collection.
+    """
+    return await index_registry.report()
+
+@router.post("/indexes/reconcile", status_code=status.HTTP_202_ACCEPTED, summary="Create missing registered indexes (Admin Only)")
+async def reconcile_indexes(current_user: User = Depends(get_current_admin_user)):
+    """
+    Build the registered indexes that do not exist yet in a background job;
+    the report lists any that could not be built.
+    """
+    await job_queue.enqueue("reconcile_indexes", {})
+    return {"status": "accepted"}
+
+@router.post("/votes/reconcile", status_code=status.HTTP_202_ACCEPTED, summary="Recompute idea vote counters (Admin Only)")
+async def reconcile_votes(current_user: User = Depends(get_current_admin_user)):
+    """
+    Rebuild upvotes/downvotes/vote_score of every idea from the votes
+    collection in a background job.
+    """
+    await job_queue.enqueue("reconcile_votes", {})
+    return {"status": "accepted"}
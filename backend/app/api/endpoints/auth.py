@@ -3,7 +3,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta, datetime
 from jose import jwt
 from app.core.config import settings
-from app.core.database import db
+from app.crud import crud_users
 from app.models.user import UserCreate, User, UserInDB
 from app.api.deps import get_password_hash, authenticate_user
 from typing import Optional
@@ -44,22 +44,19 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
 @router.post("/register", response_model=User)
 async def register_user(user: UserCreate):
-    existing_user = await db.users.find_one({"email": user.email})
-    if existing_user:
+    # Checked before hashing, so repeated attempts on a taken email cost no bcrypt work
+    if await crud_users.get_user_by_email(user.email, {"_id": 1}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    hashed_password = get_password_hash(user.password)
-    user_data = user.model_dump()
-    user_data.pop("password")
-    user_data["hashed_password"] = hashed_password
-    user_data["created_at"] = datetime.utcnow()
-    user_data["is_admin"] = False
-    
-    result = await db.users.insert_one(user_data)
-    created_user = await db.users.find_one({"_id": result.inserted_id})
-    created_user["id"] = str(created_user["_id"])
-    
+    hashed_password = await get_password_hash(user.password)
+    # The unique index on email rejects an account registered in the meantime
+    created_user = await crud_users.create_user(crud_users.new_user_document(user, hashed_password))
+    if created_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+
     return User(**created_user)
\ No newline at end of file
@@ -1,12 +1,17 @@
 # Import FastAPI's APIRouter and create a basic router for comments endpoints
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Optional
 from datetime import datetime
 from app.models.comment import CommentCreate, Comment
 from app.models.user import User
 from app.core.database import db
 from app.api.deps import get_current_user
+from app.api.pagination import NEXT_CURSOR_HEADER, SortMode, paginate
+from app.core.response_cache import COMMENTS, comments_tag, idea_tag, ranking_tag, response_cache
+from app.core.serialization import mongo_projection
+from app.crud import crud_comments
+from app.services.idea_events import publish_comment_created
 
 router = APIRouter()
 
@@ -20,25 +25,36 @@ async def create_comment(
 ):
 	if not idea_id:
 		raise HTTPException(status_code=400, detail="Missing idea_id in path.")
-	comment_data = comment.model_dump()
-	comment_data["idea_id"] = idea_id
-	comment_data["user_id"] = str(current_user.id)
-	comment_data["user_name"] = current_user.full_name
-	comment_data["created_at"] = datetime.utcnow()
-
-	result = await db.comments.insert_one(comment_data)
-	created_comment = await db.comments.find_one({"_id": result.inserted_id})
-	created_comment["id"] = str(created_comment["_id"])
+
+	# Bumping the idea's comment counter (and hot score) doubles as the existence check
+	created_comment = await crud_comments.create_comment(crud_comments.new_comment_document(comment, idea_id, current_user))
+	if created_comment is None:
+		raise HTTPException(status_code=404, detail="Idea not found")
+
+	await response_cache.invalidate(comments_tag(idea_id), idea_tag(idea_id), ranking_tag(SortMode.HOT.value))
+	publish_comment_created(created_comment)
 	return Comment(**created_comment)
 
 # GET endpoint to fetch all comments for an idea
 @router.get("/", response_model=List[Comment])
-async def get_comments_for_idea(idea_id: str = None):
+async def get_comments_for_idea(
+	request: Request,
+	response: Response,
+	idea_id: str = None,
+	limit: int = Query(50, ge=1, le=200),
+	cursor: Optional[str] = None,
+	sort: SortMode = SortMode.OLDEST
+):
 	if not idea_id:
 		raise HTTPException(status_code=400, detail="Missing idea_id in path.")
-	comments = []
-	cursor = db.comments.find({"idea_id": idea_id}).sort("created_at", 1)
-	async for doc in cursor:
-		doc["id"] = str(doc["_id"])
-		comments.append(Comment(**doc))
-	return comments
+
+	async def build():
+		docs = await paginate(
+			db.comments, {"idea_id": idea_id}, sort, cursor, limit, response,
+			projection=mongo_projection(Comment),
+			allowed=(SortMode.OLDEST, SortMode.NEWEST)
+		)
+		return docs, [COMMENTS, comments_tag(idea_id)]
+
+	return await response_cache.serve(request, response, List[Comment], build, headers=(NEXT_CURSOR_HEADER,))
+
@@ -1,68 +1,288 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from typing import Dict, List, Optional
 from bson import ObjectId
 from datetime import datetime
 
-import httpx
-from app.models.idea import IdeaCreate, Idea, IdeaUpdate, IdeaStatus
+from app.models.comment import Comment
+from app.models.idea import MAX_COMMENT_PREVIEWS, IdeaCreate, Idea, IdeaCard, IdeaUpdate, IdeaStatus, IdeaCategory, IdeaNearby, IdeaCluster, IdeaSearchResult, IdeaSimilar
 from app.models.user import User
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_optional_user, optional_oauth2_scheme
 from app.core.database import db # Correctly import the global db client
+from app.api.pagination import NEXT_CURSOR_HEADER, SortMode, decode_keyset, encode_keyset, paginate
+from app.core.geo import parse_bbox, bbox_polygon, bbox_center
+from app.core.indexes import GEO_INDEX, TEXT_INDEX, Index, index_registry
+from app.core.response_cache import IDEA_LISTS, IDEAS, comment_preview_tags, idea_list_tags, idea_tag, response_cache
+from app.core.serialization import json_response, mongo_projection, private_json_response
+from app.crud import crud_comments, crud_ideas, crud_votes
+from app.services.geocoding import geocoder
+from app.services.clusters import read_clusters, update_idea_cells, zoom_to_precision
+from app.services.tasks import enqueue_geocode
+from app.services.search import expand_query, search_filters, search_pipeline, update_search_terms, TEXT_FIELDS
+from app.services.dedupe import find_similar
+from app.services.stats import update_idea_stats
+from app.services.idea_events import mark_ideas_changed, publish_idea_created
+from app.services.votes import VOTE_TYPES, IdeaNotFound, cast_vote, retract_vote
 
 router = APIRouter()
 
+# Ids accepted by one /votes/me lookup; a page of ideas is at most 100
+MAX_VOTE_LOOKUP = 100
+
+def _require_index(index: Index):
+    # $geoNear and $text fail without their index, which on a large existing
+    # database is still being built in the background for a while
+    if not index_registry.ready(index):
+        raise HTTPException(
+            status_code=503,
+            detail="This query is unavailable until its index has been built",
+            headers={"Retry-After": "30"},
+        )
+
 
 
 
 @router.post("/", response_model=Idea)
 async def create_idea(
-    idea: IdeaCreate, # This model now includes latitude and longitude
+    idea: IdeaCreate,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    merge_duplicate: bool = Query(False, description="Upvote a matching open report instead of creating a new one"),
     current_user: User = Depends(get_current_user)
 ):
-    idea_data = idea.model_dump()
-    # New: Geocode the location string to get coordinates
-    coordinates = await get_coordinates(idea_data["location"])
-    if coordinates:
-        idea_data["latitude"] = coordinates["latitude"]
-        idea_data["longitude"] = coordinates["longitude"]
-    else:
-        # If geocoding fails, set coordinates to None
-        idea_data["latitude"] = None
-        idea_data["longitude"] = None
-        
-    idea_data["creator_id"] = str(current_user.id)
-    idea_data["creator_name"] = current_user.full_name
-    idea_data["created_at"] = datetime.utcnow()
-    idea_data["status"] = IdeaStatus.READ
-    idea_data["vote_score"] = 0
-
-    result = await db.ideas.insert_one(idea_data)
-    created_idea = await db.ideas.find_one({"_id": result.inserted_id})
-    created_idea["id"] = str(created_idea["_id"])
-
-    return Idea(**created_idea)
-
-@router.get("/", response_model=List[Idea])
+    if merge_duplicate:
+        # Only coordinates that are already at hand; the check must not wait on geocoding
+        point = {"latitude": idea.latitude, "longitude": idea.longitude}
+        if idea.latitude is None or idea.longitude is None:
+            point = geocoder.peek(idea.location) or {"latitude": None, "longitude": None}
+        similar = await find_similar(idea.title, idea.description, point["latitude"], point["longitude"], limit=1)
+        if similar:
+            existing = similar[0]
+            existing_id = str(existing["_id"])
+            try:
+                previous = await cast_vote(existing_id, str(current_user.id), "upvote")
+            except IdeaNotFound:
+                # Deleted since it was matched; the new report is stored after all
+                pass
+            else:
+                if previous != "upvote":
+                    # Reflect the vote just cast in the returned idea
+                    existing = await crud_ideas.get_idea(existing_id) or existing
+                response.headers["X-Duplicate-Of"] = existing_id
+                existing["id"] = existing_id
+                return Idea(**existing)
+
+    # Coordinates are filled in by the geocode_idea job once the response is sent
+    idea_data = await crud_ideas.create_idea(crud_ideas.new_idea_document(idea, current_user))
+    await update_idea_stats(added=[idea_data])
+    await response_cache.invalidate(IDEA_LISTS)
+    publish_idea_created(idea_data)
+    background_tasks.add_task(enqueue_geocode, idea_data["id"], idea_data["location"])
+    background_tasks.add_task(update_search_terms, added=[idea_data])
+
+    return Idea(**idea_data)
+
+@router.get("/", response_model=List[IdeaCard])
 async def read_ideas(
-    skip: int = 0,
-    limit: int = 10
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: SortMode = SortMode.NEWEST,
+    category: Optional[IdeaCategory] = None,
+    idea_status: Optional[IdeaStatus] = Query(None, alias="status"),
+    comments: int = Query(0, ge=0, le=MAX_COMMENT_PREVIEWS, description="Embed this many of each idea's latest comments"),
+    include_my_vote: bool = Query(False, description="Add the signed-in user's vote on each idea as `my_vote`"),
+    skip: int = Query(0, ge=0, deprecated=True),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """
+    List ideas page by page. Pass the `X-Next-Cursor` header of a response
+    as `cursor` to fetch the following page; `sort=hot` ranks by trending.
+    """
+    async def build():
+        query = _idea_filters(category, idea_status)
+        docs = await paginate(db.ideas, query, sort, cursor, limit, response, projection=mongo_projection(Idea), skip=skip)
+        tags = idea_list_tags(docs, sort.value)
+        if comments:
+            await crud_comments.embed_latest_comments(docs, comments, mongo_projection(Comment))
+            tags += comment_preview_tags(docs)
+        return docs, tags
+
+    model = List[IdeaCard] if comments or include_my_vote else List[Idea]
+    if include_my_vote:
+        # Vote state differs per user, so these pages skip the shared response cache
+        current_user = await get_optional_user(token)
+        docs, _ = await build()
+        if current_user is not None:
+            await crud_votes.embed_user_votes(docs, str(current_user.id))
+        return private_json_response(model, docs, response, headers=(NEXT_CURSOR_HEADER,))
+    return await response_cache.serve(request, response, model, build, headers=(NEXT_CURSOR_HEADER,))
+
+def _idea_filters(category: Optional[IdeaCategory], idea_status: Optional[IdeaStatus]) -> dict:
+    query = {}
+    if category:
+        query["category"] = category.value
+    if idea_status:
+        query["status"] = idea_status.value
+    return query
+
+async def _geo_near(latitude: float, longitude: float, query: dict, limit: int, max_distance: Optional[float] = None):
+    _require_index(GEO_INDEX)
+    # $geoNear walks the 2dsphere index outwards from the center, so results
+    # come back sorted by distance without scanning the collection.
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [longitude, latitude]},
+        "key": "geo",
+        "distanceField": "distance",
+        "spherical": True,
+        "query": query,
+    }
+    if max_distance is not None:
+        geo_near["maxDistance"] = max_distance
+
+    pipeline = [{"$geoNear": geo_near}, {"$limit": limit}, {"$project": mongo_projection(IdeaNearby)}]
+    docs = await db.ideas.aggregate(pipeline).to_list(length=limit)
+    return json_response(List[IdeaNearby], docs)
+
+@router.get("/nearby", response_model=List[IdeaNearby])
+async def read_nearby_ideas(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, le=50000, description="Search radius in meters"),
+    category: Optional[IdeaCategory] = None,
+    idea_status: Optional[IdeaStatus] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Ideas within `radius` meters of a point, closest first.
+    """
+    query = _idea_filters(category, idea_status)
+    return await _geo_near(lat, lng, query, limit, max_distance=radius)
+
+@router.get("/bbox", response_model=List[IdeaNearby])
+async def read_ideas_in_bbox(
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    category: Optional[IdeaCategory] = None,
+    idea_status: Optional[IdeaStatus] = Query(None, alias="status"),
+    limit: int = Query(200, ge=1, le=1000)
+):
+    """
+    Ideas inside the map viewport, sorted by distance from its center.
+    """
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = _idea_filters(category, idea_status)
+    query["geo"] = {"$geoWithin": {"$geometry": bbox_polygon(box)}}
+    center_lat, center_lng = bbox_center(box)
+    return await _geo_near(center_lat, center_lng, query, limit)
+
+@router.get("/clusters", response_model=List[IdeaCluster])
+async def read_idea_clusters(
+    zoom: int = Query(..., ge=0, le=22),
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat")
+):
+    """
+    Per-cell idea counts for the visible map area, read from the
+    pre-aggregated cell counters instead of the ideas themselves.
+    """
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await read_clusters(zoom_to_precision(zoom), box)
+
+@router.get("/search", response_model=List[IdeaSearchResult])
+async def search_ideas(
+    response: Response,
+    q: str = Query(..., min_length=2, max_length=200),
+    category: Optional[IdeaCategory] = None,
+    idea_status: Optional[IdeaStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Search ideas by title, description and location, most relevant first.
+    Partial and slightly misspelled words are expanded before matching.
+    """
+    _require_index(TEXT_INDEX)
+    terms = await expand_query(q)
+    if not terms:
+        return []
+
+    filters = search_filters(
+        category.value if category else None,
+        idea_status.value if idea_status else None,
+        created_from,
+        created_to,
+    )
+    after = decode_keyset(cursor, "relevance") if cursor else None
+
+    results = []
+    async for doc in db.ideas.aggregate(search_pipeline(terms, filters, after, limit)):
+        doc["id"] = str(doc["_id"])
+        results.append(IdeaSearchResult(**doc))
+    if len(results) == limit:
+        last = results[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_keyset("relevance", last.score, last.id)
+    return results
+
+@router.get("/votes/me", response_model=Dict[str, Optional[str]])
+async def read_my_votes(
+    ids: List[str] = Query(..., description="Idea ids, repeated or comma separated"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    The current user's vote ("upvote", "downvote" or null) on each of the
+    given ideas, resolved with a single query.
+    """
+    idea_ids = list(dict.fromkeys(i for value in ids for i in value.split(",") if i))
+    if len(idea_ids) > MAX_VOTE_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_VOTE_LOOKUP} ids per request")
+    votes = await crud_votes.get_user_votes(str(current_user.id), idea_ids)
+    return private_json_response(Dict[str, Optional[str]], {idea_id: votes.get(idea_id) for idea_id in idea_ids})
+
+@router.get("/similar", response_model=List[IdeaSimilar])
+async def read_similar_ideas(
+    title: str = Query(..., min_length=1, max_length=200),
+    description: str = Query("", max_length=2000),
+    location: Optional[str] = Query(None, max_length=200),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(5, ge=1, le=20)
 ):
+    """
+    Open reports that look like the one about to be submitted, best match first.
+    """
+    if (lat is None or lng is None) and location:
+        # Also warms the geocoding cache for the create_idea call that usually follows
+        coordinates = await geocoder.geocode(location)
+        if coordinates:
+            lat, lng = coordinates["latitude"], coordinates["longitude"]
+
     ideas = []
-    cursor = db.ideas.find().skip(skip).limit(limit)
-    async for doc in cursor:
+    for doc in await find_similar(title, description, lat, lng, limit=limit):
         doc["id"] = str(doc["_id"])
-        ideas.append(Idea(**doc))
+        ideas.append(IdeaSimilar(**doc))
     return ideas
 
 @router.get("/{idea_id}", response_model=Idea)
 async def read_idea(
-    idea_id: str
+    idea_id: str,
+    request: Request,
+    response: Response
 ):
-    idea = await db.ideas.find_one({"_id": ObjectId(idea_id)})
-    if idea is None:
-        raise HTTPException(status_code=404, detail="Idea not found")
-    idea["id"] = str(idea["_id"])
-    return Idea(**idea)
+    async def build():
+        idea = await crud_ideas.get_idea(idea_id, mongo_projection(Idea))
+        if idea is None:
+            raise HTTPException(status_code=404, detail="Idea not found")
+        return idea, [IDEAS, idea_tag(idea_id)]
+
+    return await response_cache.serve(request, response, Idea, build)
 
 @router.post("/{idea_id}/vote")
 async def vote_on_idea(
@@ -70,85 +290,69 @@ async def vote_on_idea(
     vote_type: str,
     current_user: User = Depends(get_current_user)
 ):
-    if vote_type not in ["upvote", "downvote"]:
+    if vote_type not in VOTE_TYPES:
         raise HTTPException(status_code=400, detail="Invalid vote type")
+    if not ObjectId.is_valid(idea_id):
+        raise HTTPException(status_code=404, detail="Idea not found")
 
-    existing_vote = await db.votes.find_one({
-        "idea_id": idea_id,
-        "user_id": current_user.id
-    })
-
-    vote_change = 1 if vote_type == "upvote" else -1
-
-    if existing_vote:
-        old_vote = 1 if existing_vote["vote_type"] == "upvote" else -1
-        if old_vote != vote_change:
-            await db.votes.update_one(
-                {"_id": existing_vote["_id"]},
-                {"$set": {"vote_type": vote_type}}
-            )
-            await db.ideas.update_one(
-                {"_id": ObjectId(idea_id)},
-                {"$inc": {"vote_score": vote_change - old_vote}}
-            )
-    else:
-        await db.votes.insert_one({
-            "idea_id": idea_id,
-            "user_id": current_user.id,
-            "vote_type": vote_type,
-            "created_at": datetime.utcnow()
-        })
-        await db.ideas.update_one(
-            {"_id": ObjectId(idea_id)},
-            {"$inc": {"vote_score": vote_change}}
-        )
+    try:
+        await cast_vote(idea_id, str(current_user.id), vote_type)
+    except IdeaNotFound:
+        raise HTTPException(status_code=404, detail="Idea not found")
 
     return {"status": "success", "message": f"Successfully {vote_type}d"}
 
-@router.patch("/{idea_id}", response_model=Idea)
-async def update_idea(
+@router.delete("/{idea_id}/vote")
+async def remove_vote(
     idea_id: str,
-    idea_update: IdeaUpdate,
     current_user: User = Depends(get_current_user)
 ):
-    idea = await db.ideas.find_one({"_id": ObjectId(idea_id)})
-    if not idea:
+    if not ObjectId.is_valid(idea_id):
         raise HTTPException(status_code=404, detail="Idea not found")
 
-    if str(idea["creator_id"]) != str(current_user.id):
-        raise HTTPException(status_code=403, detail="Not authorized to edit this idea")
+    previous = await retract_vote(idea_id, str(current_user.id))
+    if previous is None:
+        raise HTTPException(status_code=404, detail="No vote to remove")
 
+    return {"status": "success", "message": "Vote removed"}
+
+@router.patch("/{idea_id}", response_model=Idea)
+async def update_idea(
+    idea_id: str,
+    idea_update: IdeaUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
     update_data = {k: v for k, v in idea_update.model_dump(exclude_unset=True).items()}
-    await db.ideas.update_one({"_id": ObjectId(idea_id)}, {"$set": update_data})
+    changed_at = datetime.utcnow()
+    # Ownership is part of the update filter; only a miss needs a second look to pick 404 or 403
+    idea = await crud_ideas.update_idea(idea_id, str(current_user.id), update_data, changed_at) if update_data else None
+    if idea is None:
+        existing = await crud_ideas.get_idea(idea_id)
+        if existing is None:
+            raise HTTPException(status_code=404, detail="Idea not found")
+        if str(existing["creator_id"]) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="Not authorized to edit this idea")
+        idea = existing
 
-    updated_idea = await db.ideas.find_one({"_id": ObjectId(idea_id)})
+    updated_idea = {**idea, **update_data}
+    if update_data.get("status") is not None:
+        updated_idea = crud_ideas.with_status(updated_idea, IdeaStatus(update_data["status"]), changed_at)
+    if "category" in update_data or "status" in update_data:
+        await update_idea_cells(removed=[idea], added=[updated_idea])
+        await update_idea_stats(removed=[idea], added=[updated_idea])
+        await response_cache.invalidate(idea_tag(idea_id), IDEA_LISTS)
+    else:
+        await response_cache.invalidate(idea_tag(idea_id))
+    mark_ideas_changed(idea_id)
+    if "title" in update_data or "description" in update_data:
+        background_tasks.add_task(crud_ideas.set_signature, idea_id, updated_idea["title"], updated_idea["description"])
+    if any(field in update_data for field in TEXT_FIELDS):
+        background_tasks.add_task(update_search_terms, removed=[idea], added=[updated_idea])
     updated_idea["id"] = str(updated_idea["_id"])
     return Idea(**updated_idea)
 
 
 # Helper function to get coordinates from a location string
 async def get_coordinates(location: str):
-    base_url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        "q": location,
-        "format": "json",
-        "limit": 1
-    }
-    
-    headers = {
-        "User-Agent": "CivicIdeaPlatform/1.0 (your-email@example.com)"
-    }
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(base_url, params=params, headers=headers)
-            data = response.json()
-            if data and len(data) > 0:
-                return {
-                    "latitude": float(data[0]["lat"]),
-                    "longitude": float(data[0]["lon"])
-                }
-            return None
-    except httpx.RequestError as e:
-        print(f"An error occurred while geocoding: {e}")
-        return None
\ No newline at end of file
+    return await geocoder.geocode(location)
@@ -0,0 +1,118 @@
+# app/api/endpoints/realtime.py
+#
+# Push channel for idea updates, as a WebSocket or as Server-Sent Events for
+# clients behind proxies that do not pass WebSockets. Both take the initial
+# topics as a comma separated `topics` parameter:
+#
+#   idea:<id>          counters, status and comments of one idea
+#   category:<name>    every change to ideas of a category
+#   ideas              every new idea
+#   bbox:<min_lng>,<min_lat>,<max_lng>,<max_lat>   changes to ideas on a map area
+#
+# A WebSocket client can change its topics later by sending
+# {"action": "subscribe" | "unsubscribe", "topic": "..."}.
+
+import asyncio
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.realtime import Subscriber, realtime_hub
+
+router = APIRouter()
+
+TOPICS_DESCRIPTION = "Comma separated: idea:<id>, category:<name>, ideas, bbox:<min_lng>,<min_lat>,<max_lng>,<max_lat>"
+
+
+def _split_topics(topics: Optional[str]) -> List[str]:
+    # bbox coordinates contain commas too, so split on the topic prefixes
+    topics = topics or ""
+    parts: List[str] = []
+    for part in topics.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if parts and parts[-1].startswith("bbox:") and parts[-1].count(",") < 3:
+            parts[-1] += "," + part
+        else:
+            parts.append(part)
+    return parts
+
+
+def _connect(topics: Optional[str]) -> Subscriber:
+    subscriber = realtime_hub.connect()
+    try:
+        for topic in _split_topics(topics):
+            realtime_hub.subscribe(subscriber, topic)
+    except ValueError:
+        realtime_hub.disconnect(subscriber)
+        raise
+    return subscriber
+
+
+@router.websocket("/ws")
+async def realtime_websocket(websocket: WebSocket, topics: Optional[str] = Query(None, description=TOPICS_DESCRIPTION)):
+    try:
+        subscriber = _connect(topics)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await websocket.accept()
+
+    async def send_events():
+        while True:
+            event = await subscriber.queue.get()
+            await websocket.send_text(event.data)
+
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                topic = message["topic"]
+                if message.get("action") == "unsubscribe":
+                    realtime_hub.unsubscribe(subscriber, topic)
+                else:
+                    realtime_hub.subscribe(subscriber, topic)
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_text(json.dumps({"type": "error", "detail": str(e)}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        realtime_hub.disconnect(subscriber)
+
+
+@router.get("/events")
+async def realtime_events(request: Request, topics: str = Query(..., description=TOPICS_DESCRIPTION)):
+    """
+    Server-Sent Events stream of the subscribed topics. A comment line is
+    sent when nothing happened for a while so proxies keep the stream open.
+    """
+    try:
+        subscriber = _connect(topics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.REALTIME_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event.type}\ndata: {event.data}\n\n"
+        finally:
+            realtime_hub.disconnect(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # No caching, and no buffering in nginx-style proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Optional
 from app.models.user import User
-from app.models.idea import Idea
-from app.api.deps import get_current_user
+from app.models.comment import Comment
+from app.models.idea import MAX_COMMENT_PREVIEWS, Idea, IdeaCard
+from app.api.deps import get_current_user, get_optional_user, optional_oauth2_scheme
+from app.api.pagination import NEXT_CURSOR_HEADER, SortMode, paginate
 from app.core.database import db
+from app.core.response_cache import comment_preview_tags, idea_list_tags, response_cache
+from app.core.serialization import json_response, mongo_projection, private_json_response
+from app.crud import crud_comments, crud_users, crud_votes
 
 router = APIRouter()
 
@@ -14,17 +18,41 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 @router.get("/{user_id}", response_model=User)
 async def read_user(user_id: str):
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await crud_users.get_user(user_id, mongo_projection(User))
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user["id"] = str(user["_id"])
-    return User(**user)
+    return json_response(User, user)
 
-@router.get("/{user_id}/ideas", response_model=List[Idea])
-async def get_user_ideas(user_id: str):
-    ideas = []
-    cursor = db.ideas.find({"creator_id": user_id}).sort("created_at", -1)
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        ideas.append(Idea(**doc))
-    return ideas
\ No newline at end of file
+@router.get("/{user_id}/ideas", response_model=List[IdeaCard])
+async def get_user_ideas(
+    user_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: SortMode = SortMode.NEWEST,
+    comments: int = Query(0, ge=0, le=MAX_COMMENT_PREVIEWS, description="Embed this many of each idea's latest comments"),
+    include_my_vote: bool = Query(False, description="Add the signed-in user's vote on each idea as `my_vote`"),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    async def build():
+        docs = await paginate(
+            db.ideas, {"creator_id": user_id}, sort, cursor, limit, response,
+            projection=mongo_projection(Idea),
+            allowed=(SortMode.NEWEST, SortMode.OLDEST, SortMode.TOP)
+        )
+        tags = idea_list_tags(docs, sort.value)
+        if comments:
+            await crud_comments.embed_latest_comments(docs, comments, mongo_projection(Comment))
+            tags += comment_preview_tags(docs)
+        return docs, tags
+
+    model = List[IdeaCard] if comments or include_my_vote else List[Idea]
+    if include_my_vote:
+        # Vote state differs per user, so these pages skip the shared response cache
+        current_user = await get_optional_user(token)
+        docs, _ = await build()
+        if current_user is not None:
+            await crud_votes.embed_user_votes(docs, str(current_user.id))
+        return private_json_response(model, docs, response, headers=(NEXT_CURSOR_HEADER,))
+    return await response_cache.serve(request, response, model, build, headers=(NEXT_CURSOR_HEADER,))
@@ -0,0 +1,125 @@
+# app/api/pagination.py
+#
+# Keyset (cursor) pagination shared by the list endpoints. A page is fetched
+# with a range condition on the sort key plus `_id` as a tie breaker, so every
+# page is a single index range scan no matter how deep the client has paged.
+
+import base64
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response
+
+from app.crud.base import record
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class SortMode(str, Enum):
+    NEWEST = "newest"
+    OLDEST = "oldest"
+    TOP = "top"
+    HOT = "hot"
+
+
+# sort mode -> (field, direction); `_id` always follows in the same direction
+SORT_KEYS = {
+    SortMode.NEWEST: ("created_at", -1),
+    SortMode.OLDEST: ("created_at", 1),
+    SortMode.TOP: ("vote_score", -1),
+    SortMode.HOT: ("hot_score", -1),
+}
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"d": value.isoformat()}
+    return {"v": value}
+
+
+def _decode_value(value: dict):
+    if "d" in value:
+        return datetime.fromisoformat(value["d"])
+    return value["v"]
+
+
+def encode_keyset(sort: str, value, doc_id) -> str:
+    payload = {"s": sort, "k": _encode_value(value), "id": str(doc_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_keyset(cursor: str, sort: str) -> Tuple[object, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload["s"] != sort:
+            raise ValueError("cursor was issued for a different sort")
+        return _decode_value(payload["k"]), ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_cursor(sort: SortMode, doc: dict) -> str:
+    field, _ = SORT_KEYS[sort]
+    return encode_keyset(sort.value, doc.get(field), doc["_id"])
+
+
+def decode_cursor(cursor: str, sort: SortMode) -> Tuple[object, ObjectId]:
+    return decode_keyset(cursor, sort.value)
+
+
+def keyset_query(query: dict, sort: SortMode, cursor: Optional[str]) -> Tuple[dict, List[tuple]]:
+    """
+    Return the filter and sort specification for the page after `cursor`.
+    """
+    field, direction = SORT_KEYS[sort]
+    sort_spec = [(field, direction), ("_id", direction)]
+    if not cursor:
+        return query, sort_spec
+
+    value, last_id = decode_cursor(cursor, sort)
+    op = "$lt" if direction < 0 else "$gt"
+    after = {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: last_id}},
+    ]}
+    return ({"$and": [query, after]} if query else after), sort_spec
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort: SortMode,
+    cursor: Optional[str],
+    limit: int,
+    response: Response,
+    projection: Optional[dict] = None,
+    allowed: Iterable[SortMode] = tuple(SortMode),
+    skip: int = 0,
+) -> List[dict]:
+    """
+    Fetch one page of raw documents and advertise the cursor of the next page
+    in the `X-Next-Cursor` response header (absent on the last page).
+    """
+    if sort not in allowed:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort '{sort.value}' for this listing")
+
+    page_query, sort_spec = keyset_query(query, sort, cursor)
+    field, _ = SORT_KEYS[sort]
+    if projection and field not in projection and all(value != 0 for value in projection.values()):
+        # An inclusive projection still has to return the key the next cursor is built from
+        projection = {**projection, field: 1}
+    find = collection.find(page_query, projection).sort(sort_spec)
+    if skip:
+        # Legacy offset paging; still walks every skipped document
+        find = find.skip(skip)
+    record(collection, "find")
+    docs = await find.limit(limit).to_list(length=limit)
+    if len(docs) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, docs[-1])
+    return docs
@@ -5,9 +5,104 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Simple Civic Innovation API"
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     MONGODB_NAME: str = os.getenv("MONGODB_NAME", "civic_innovation_simple")
+    # Connection pool of each worker process; 0 leaves a timeout unset
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+    MONGODB_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", 0))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 0))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 10000))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 10000))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 0))
+    # primary, primaryPreferred, secondary, secondaryPreferred or nearest
+    MONGODB_READ_PREFERENCE: str = os.getenv("MONGODB_READ_PREFERENCE", "primary")
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+    # Instrumentation: slow request / Mongo command log thresholds, Server-Timing
+    # response headers, and an optional bearer token guarding /api/metrics
+    SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", 500))
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", 100))
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # Decoded token / authenticated principal caches. Principals are also
+    # evicted on change, the short TTL covers edits made outside the app
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+    AUTH_PRINCIPAL_TTL_SECONDS: float = float(os.getenv("AUTH_PRINCIPAL_TTL_SECONDS", 10))
+    AUTH_PRINCIPAL_CACHE_SIZE: int = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", 10000))
+
+    # bcrypt operations allowed to run at once (each one occupies a CPU core)
+    PASSWORD_HASH_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_CONCURRENCY", min(4, os.cpu_count() or 1)))
+
+    # Cached JSON responses of the public read endpoints (ETag / If-None-Match)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 5000))
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 60))
+    # 0 makes browsers revalidate every poll (cheap: a 304 from the cache)
+    RESPONSE_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("RESPONSE_CACHE_MAX_AGE_SECONDS", 0))
+    # Share the cache between worker processes through Redis (needs the `redis` package)
+    RESPONSE_CACHE_REDIS_URL: str = os.getenv("RESPONSE_CACHE_REDIS_URL", "")
+
+    # Write-behind buffering of idea vote counters (off by default)
+    VOTE_WRITE_BEHIND: bool = os.getenv("VOTE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    VOTE_FLUSH_INTERVAL_MS: int = int(os.getenv("VOTE_FLUSH_INTERVAL_MS", 200))
+    VOTE_FLUSH_MAX_PENDING: int = int(os.getenv("VOTE_FLUSH_MAX_PENDING", 500))
+
+    # "Hot" ranking: (votes + weight * comments) / (age_hours + 2) ** gravity
+    HOT_COMMENT_WEIGHT: float = float(os.getenv("HOT_COMMENT_WEIGHT", 0.5))
+    HOT_GRAVITY: float = float(os.getenv("HOT_GRAVITY", 1.5))
+    HOT_WINDOW_DAYS: int = int(os.getenv("HOT_WINDOW_DAYS", 30))
+    HOT_REDECAY_INTERVAL_SECONDS: int = int(os.getenv("HOT_REDECAY_INTERVAL_SECONDS", 600))
+
+    # Push channel (WebSocket / SSE): idea updates are coalesced per interval,
+    # each connection buffers at most REALTIME_QUEUE_SIZE events
+    REALTIME_COALESCE_MS: int = int(os.getenv("REALTIME_COALESCE_MS", 1000))
+    REALTIME_QUEUE_SIZE: int = int(os.getenv("REALTIME_QUEUE_SIZE", 100))
+    REALTIME_MAX_TOPICS: int = int(os.getenv("REALTIME_MAX_TOPICS", 50))
+    REALTIME_HEARTBEAT_SECONDS: float = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", 15))
+    # Redis channel sharing events between worker processes (needs the `redis` package)
+    REALTIME_REDIS_URL: str = os.getenv("REALTIME_REDIS_URL", "")
+
+    # Admin dashboard counters are recounted from `ideas` this often to correct drift
+    STATS_REBUILD_INTERVAL_SECONDS: int = int(os.getenv("STATS_REBUILD_INTERVAL_SECONDS", 6 * 3600))
+    # Same for the term frequencies of the search vocabulary
+    SEARCH_TERMS_REBUILD_INTERVAL_SECONDS: int = int(os.getenv("SEARCH_TERMS_REBUILD_INTERVAL_SECONDS", 24 * 3600))
+
+    # Near-duplicate report detection
+    DEDUPE_RADIUS_M: float = float(os.getenv("DEDUPE_RADIUS_M", 150))
+    DEDUPE_SIMILARITY: float = float(os.getenv("DEDUPE_SIMILARITY", 0.5))
+    DEDUPE_TEXT_ONLY_SIMILARITY: float = float(os.getenv("DEDUPE_TEXT_ONLY_SIMILARITY", 0.8))
+    DEDUPE_MAX_CANDIDATES: int = int(os.getenv("DEDUPE_MAX_CANDIDATES", 50))
+
+    # Geocoding (Nominatim compatible /search endpoint)
+    GEOCODER_URL: str = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+    GEOCODER_USER_AGENT: str = os.getenv("GEOCODER_USER_AGENT", "CivicIdeaPlatform/1.0 (your-email@example.com)")
+    GEOCODER_MIN_INTERVAL_SECONDS: float = float(os.getenv("GEOCODER_MIN_INTERVAL_SECONDS", 1.0))
+    GEOCODER_TIMEOUT_SECONDS: float = float(os.getenv("GEOCODER_TIMEOUT_SECONDS", 10.0))
+    GEOCODE_CACHE_TTL_SECONDS: int = int(os.getenv("GEOCODE_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+    GEOCODE_NEGATIVE_CACHE_TTL_SECONDS: int = int(os.getenv("GEOCODE_NEGATIVE_CACHE_TTL_SECONDS", 24 * 3600))
+    GEOCODE_LRU_SIZE: int = int(os.getenv("GEOCODE_LRU_SIZE", 10000))
+
+    # Background job queue
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 4))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", 60))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1.0))
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+
+    # Production server (serve.py)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", 8000))
+    # More than one needs the shared Redis channels, see serve.py
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", 1))
+    # "uvloop"/"httptools" need those packages; "asyncio"/"h11" are the pure Python fallbacks
+    SERVER_LOOP: str = os.getenv("SERVER_LOOP", "uvloop")
+    SERVER_HTTP: str = os.getenv("SERVER_HTTP", "httptools")
+    # Time given to in-flight requests on shutdown before connections are closed
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", 30))
+    SERVER_KEEPALIVE_SECONDS: int = int(os.getenv("SERVER_KEEPALIVE_SECONDS", 5))
     
     class Config:
         env_file = ".env"
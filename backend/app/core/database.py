@@ -1,33 +1,79 @@
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from app.core.config import settings
+from app.core.metrics import mongo_listener
 
-client = AsyncIOMotorClient(settings.MONGODB_URL)
-db = client[settings.MONGODB_NAME]
+# Created by connect_db_client() in each process rather than at import time:
+# a client (and its pool and monitor threads) must not cross a fork, and a
+# pre-forking server imports the app before starting its workers
+client: Optional[AsyncIOMotorClient] = None
+_database: Optional[AsyncIOMotorDatabase] = None
+
+
+def connect_db_client() -> AsyncIOMotorClient:
+    """
+    The client of this process, created on first use.
+    """
+    global client, _database
+    if client is None:
+        client = AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            event_listeners=[mongo_listener],
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS or None,
+            waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS or None,
+            connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS or None,
+            readPreference=settings.MONGODB_READ_PREFERENCE,
+        )
+        _database = client[settings.MONGODB_NAME]
+    return client
+
+
+def close_db_client():
+    global client, _database
+    if client is not None:
+        client.close()
+    client, _database = None, None
+
+
+class _Database:
+    """
+    Module level stand-in for this process' database, so `db` can be
+    imported everywhere before any client exists.
+    """
+
+    def __getattr__(self, name: str):
+        connect_db_client()
+        return getattr(_database, name)
+
+    def __getitem__(self, name: str):
+        connect_db_client()
+        return _database[name]
+
+
+db = _Database()
 
 async def startup_db_client():
-    global client, db
-
-    
-    # Create collections if they don't exist
-    collections = await db.list_collection_names()
-    if "users" not in collections:
-        await db.create_collection("users")
-        await db.users.create_index("email", unique=True)
-    
-    if "ideas" not in collections:
-        await db.create_collection("ideas")
-    
-    if "votes" not in collections:
-        await db.create_collection("votes")
-        await db.votes.create_index([("idea_id", 1), ("user_id", 1)], unique=True)
+    # Every worker opens its own connection pool
+    connect_db_client()
+
+    # Unique constraints must exist before requests are served; the other
+    # indexes are built in the background
+    from app.core.indexes import index_registry
+    await index_registry.ensure_required()
+
+    # Data of older databases is migrated by jobs, see app/services/migrations.py
 
 
 async def shutdown_db_client():
-    global client
-    if client:
-        client.close()
+    # Buffered vote counters must reach the database before the client goes away
+    from app.services.votes import vote_counter_buffer
+    await vote_counter_buffer.stop()
+    close_db_client()
 
 def get_db():
-    global db
     return db        
\ No newline at end of file
@@ -0,0 +1,116 @@
+from typing import Optional, Tuple
+
+# (min_lng, min_lat, max_lng, max_lat), the same order GeoJSON uses for bboxes
+BBox = Tuple[float, float, float, float]
+
+
+def to_geo_point(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    """
+    Build the GeoJSON point stored on an idea, or None when it has no coordinates.
+    """
+    if latitude is None or longitude is None:
+        return None
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def parse_bbox(value: str) -> BBox:
+    """
+    Parse a "min_lng,min_lat,max_lng,max_lat" string into a bounding box.
+    Raises ValueError on malformed input.
+    """
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be 'min_lng,min_lat,max_lng,max_lat'")
+    min_lng, min_lat, max_lng, max_lat = (float(p) for p in parts)
+    if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise ValueError("bbox longitudes must be between -180 and 180")
+    if not (-90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox latitudes must be between -90 and 90 with min < max")
+    if min_lng >= max_lng:
+        raise ValueError("bbox min_lng must be smaller than max_lng")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_polygon(bbox: BBox) -> dict:
+    """
+    GeoJSON polygon (counter-clockwise ring) covering the bounding box.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return {
+        "type": "Polygon",
+        "coordinates": [[
+            [min_lng, min_lat],
+            [max_lng, min_lat],
+            [max_lng, max_lat],
+            [min_lng, max_lat],
+            [min_lng, min_lat],
+        ]],
+    }
+
+
+def bbox_center(bbox: BBox) -> Tuple[float, float]:
+    """
+    Return the (latitude, longitude) center of the bounding box.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = 8) -> str:
+    """
+    Standard base32 geohash of a point.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """
+    Return the (latitude, longitude) center of a geohash cell.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
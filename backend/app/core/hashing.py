@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop.
+
+    A bcrypt hash or verify takes a few hundred milliseconds of CPU; called
+    inline from an async handler it freezes every other request on the worker.
+    Here the work runs on a dedicated thread pool (bcrypt releases the GIL) and
+    at most `max_concurrency` operations run at once; the rest wait in line,
+    which shows up as `waiting` in `stats()`.
+    """
+
+    def __init__(self, context: CryptContext, max_concurrency: int):
+        self.context = context
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="password-hash")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.rehashed = 0
+
+    async def _run(self, fn, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password; the second item is a fresh hash when the stored one
+        uses a scheme or cost the context now marks as deprecated.
+        """
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "active": self.active,
+            "completed": self.completed,
+            "rehashed": self.rehashed,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher(
+    CryptContext(schemes=["bcrypt"], deprecated="auto"),
+    max_concurrency=settings.PASSWORD_HASH_CONCURRENCY,
+)
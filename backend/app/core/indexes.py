@@ -0,0 +1,324 @@
+# app/core/indexes.py
+#
+# Every index the queries of the app rely on, declared in one place, and
+# the query shapes they exist for. At startup the registry is reconciled
+# against the database, so databases that predate an index get it too:
+# `required` indexes (the unique constraints the write paths depend on) are
+# built before the app serves requests, and startup fails if one cannot be;
+# the others are built in the background. Queries that fail outright without
+# their index ($geoNear, $text) check `ready()` and answer 503 until it
+# exists, so a large database does not hold up startup. The report
+# (GET /api/admin/indexes, or `python -m app.core.indexes --check` in CI
+# against a seeded database) runs explain() on each query shape and flags
+# collection scans.
+#
+# A new query that filters or sorts on other fields gets its index and its
+# shape added here.
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.database import db
+from app.core.geo import bbox_polygon
+
+logger = logging.getLogger(__name__)
+
+
+class Index(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, Any]]
+    options: Dict[str, Any] = {}
+    # Built before the app serves requests
+    required: bool = False
+
+    @property
+    def name(self) -> str:
+        return IndexModel(self.keys, **self.options).document["name"]
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+# Map queries ($geoNear / $geoWithin) need a 2dsphere index on the GeoJSON point
+GEO_INDEX = Index("ideas", [("geo", "2dsphere")])
+# Full-text search: one weighted text index
+TEXT_INDEX = Index("ideas", [("title", "text"), ("location", "text"), ("description", "text")], {
+    "weights": {"title": 10, "location": 5, "description": 1},
+    "name": "ideas_text",
+})
+
+INDEXES = [
+    # Registration relies on this index to reject a second account for an email
+    Index("users", [("email", 1)], {"unique": True}, required=True),
+    Index("users", [("created_at", -1), ("_id", -1)]),
+
+    # Keyset pagination: every sort mode is an index range scan
+    Index("ideas", [("created_at", -1), ("_id", -1)]),
+    Index("ideas", [("vote_score", -1), ("_id", -1)]),
+    Index("ideas", [("creator_id", 1), ("created_at", -1), ("_id", -1)]),
+    Index("ideas", [("creator_id", 1), ("vote_score", -1), ("_id", -1)]),
+    # sort=hot, optionally narrowed by category or status
+    Index("ideas", [("hot_score", -1), ("_id", -1)]),
+    Index("ideas", [("category", 1), ("hot_score", -1), ("_id", -1)]),
+    Index("ideas", [("status", 1), ("hot_score", -1), ("_id", -1)]),
+    GEO_INDEX,
+    TEXT_INDEX,
+    # Near-duplicate detection looks candidates up by LSH band
+    Index("ideas", [("lsh_bands", 1)]),
+    # Ideas still waiting for geocoding, re-enqueued at startup
+    Index("ideas", [("geocode_pending", 1)], {"partialFilterExpression": {"geocode_pending": True}}),
+
+    # One vote per user and idea; the prefix also serves an idea's votes
+    Index("votes", [("idea_id", 1), ("user_id", 1)], {"unique": True}, required=True),
+    # A user's votes on a page of ideas: user_id equality plus an $in on idea_id
+    Index("votes", [("user_id", 1), ("idea_id", 1)]),
+
+    Index("comments", [("idea_id", 1), ("created_at", 1), ("_id", 1)]),
+    # A user's comments, removed with their account
+    Index("comments", [("user_id", 1)]),
+
+    # Query expansion vocabulary
+    Index("search_terms", [("deletes", 1)]),
+    # Persistent geocoding cache; Mongo drops entries once expires_at has passed
+    Index("geocode_cache", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+
+    # Background jobs: claim queries plus expiry of finished jobs
+    Index("jobs", [("status", 1), ("run_at", 1)]),
+    Index("jobs", [("status", 1), ("locked_until", 1)]),
+    Index("jobs", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+
+    # Admin dashboard counters
+    Index("idea_stats", [("kind", 1), ("key", 1)]),
+    # Map cluster counters, one document per geohash cell
+    Index("idea_cells", [("precision", 1), ("center", "2dsphere")]),
+]
+
+_SOME_ID = "000000000000000000000000"
+_SOME_TIME = datetime(2024, 1, 1)
+_SOME_AREA = bbox_polygon((-74.05, 40.68, -73.9, 40.82))
+
+QUERY_SHAPES = [
+    QueryShape("users by email", "users", {"email": "someone@example.com"}),
+    QueryShape("users newest first", "users", {}, [("created_at", -1), ("_id", -1)]),
+    QueryShape("ideas newest first", "ideas", {}, [("created_at", -1), ("_id", -1)]),
+    QueryShape("ideas top voted", "ideas", {}, [("vote_score", -1), ("_id", -1)]),
+    QueryShape("ideas hot", "ideas", {}, [("hot_score", -1), ("_id", -1)]),
+    QueryShape("ideas hot by category", "ideas", {"category": "waste"}, [("hot_score", -1), ("_id", -1)]),
+    QueryShape("ideas hot by status", "ideas", {"status": "read"}, [("hot_score", -1), ("_id", -1)]),
+    QueryShape("ideas of a user", "ideas", {"creator_id": _SOME_ID}, [("created_at", -1), ("_id", -1)]),
+    QueryShape("ideas of a user top voted", "ideas", {"creator_id": _SOME_ID}, [("vote_score", -1), ("_id", -1)]),
+    QueryShape("ideas in an area", "ideas", {"geo": {"$geoWithin": {"$geometry": _SOME_AREA}}}),
+    QueryShape("ideas text search", "ideas", {"$text": {"$search": "park bench"}}),
+    QueryShape("duplicate candidates", "ideas", {"lsh_bands": {"$in": ["0:0"]}, "status": {"$ne": "resolved"}}),
+    QueryShape("ideas pending geocoding", "ideas", {"geocode_pending": True}),
+    QueryShape("vote of a user on an idea", "votes", {"idea_id": _SOME_ID, "user_id": _SOME_ID}),
+    QueryShape("votes of a user on a page", "votes", {"user_id": _SOME_ID, "idea_id": {"$in": [_SOME_ID]}}),
+    QueryShape("votes of ideas", "votes", {"idea_id": {"$in": [_SOME_ID]}}),
+    QueryShape("votes of a user", "votes", {"user_id": _SOME_ID}),
+    QueryShape("comments of an idea", "comments", {"idea_id": _SOME_ID}, [("created_at", 1), ("_id", 1)]),
+    QueryShape("comments of ideas", "comments", {"idea_id": {"$in": [_SOME_ID]}}),
+    QueryShape("comments of a user", "comments", {"user_id": _SOME_ID}),
+    QueryShape("search vocabulary lookup", "search_terms", {"deletes": {"$in": ["park"]}}),
+    QueryShape("job claim", "jobs", {"$or": [
+        {"status": "pending", "run_at": {"$lte": _SOME_TIME}},
+        {"status": "running", "locked_until": {"$lt": _SOME_TIME}},
+    ]}, [("run_at", 1)]),
+    QueryShape("dashboard counters", "idea_stats", {"kind": "day", "key": {"$gte": "2024-01-01"}}),
+    QueryShape("map clusters", "idea_cells", {"precision": 5, "center": {"$geoWithin": {"$geometry": _SOME_AREA}}}),
+]
+
+
+def _plan_stages(plan: dict) -> List[dict]:
+    stages = [plan]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", ()):
+        stages += _plan_stages(child)
+    return stages
+
+
+class IndexRegistry:
+    def __init__(self, indexes: List[Index], queries: List[QueryShape]):
+        self.indexes = indexes
+        self.queries = queries
+        self._task: Optional[asyncio.Task] = None
+        self.created: List[str] = []
+        self.failed: Dict[str, str] = {}
+        # "<collection>.<name>" of the registered indexes known to exist
+        self.present: Set[str] = set()
+        self.reconciled = False
+
+    def ready(self, index: Index) -> bool:
+        return f"{index.collection}.{index.name}" in self.present
+
+    async def refresh(self):
+        """
+        Note which registered indexes exist already; one listing per collection.
+        """
+        for collection in dict.fromkeys(index.collection for index in self.indexes):
+            existing = await db[collection].index_information()
+            self.present.update(f"{collection}.{name}" for name in existing)
+
+    async def reconcile(self, required: Optional[bool] = None) -> dict:
+        """
+        Create the registered indexes that do not exist yet, only the
+        required or only the other ones if `required` is given. Indexes are
+        matched by name; one that cannot be built (duplicate keys under a
+        unique index, a conflicting definition under the same name) is
+        logged and reported, the others are still created.
+        """
+        indexes = [index for index in self.indexes if required is None or index.required == required]
+        created, failed = [], {}
+        for collection in dict.fromkeys(index.collection for index in indexes):
+            existing = await db[collection].index_information()
+            self.present.update(f"{collection}.{name}" for name in existing)
+            for index in indexes:
+                if index.collection != collection or index.name in existing:
+                    continue
+                name = f"{collection}.{index.name}"
+                try:
+                    await db[collection].create_index(index.keys, **index.options)
+                except OperationFailure as e:
+                    logger.error("Could not create index %s: %s", name, e)
+                    failed[name] = str(e)
+                else:
+                    logger.info("Created index %s", name)
+                    created.append(name)
+                    self.present.add(name)
+                    self.failed.pop(name, None)
+        self.created += created
+        self.failed.update(failed)
+        if not required:
+            self.reconciled = True
+        return {"created": created, "failed": failed}
+
+    async def ensure_required(self):
+        """
+        Build the missing required indexes; cheap on empty collections.
+        Raises RuntimeError if one of them cannot be built, as the app
+        would then accept duplicate users or votes.
+        """
+        await self.refresh()
+        result = await self.reconcile(required=True)
+        if result["failed"]:
+            raise RuntimeError(f"Required indexes could not be built: {result['failed']}")
+
+    async def _reconcile_in_background(self, refresh_interval: float = 60):
+        try:
+            await self.reconcile(required=False)
+        except Exception:
+            logger.exception("Reconciling indexes failed")
+        # One that failed here can still appear, built by a reconcile_indexes job or by hand
+        while not all(self.ready(index) for index in self.indexes):
+            await asyncio.sleep(refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Listing indexes failed")
+
+    async def start(self):
+        """
+        Build the other indexes without holding up startup; on a large
+        collection that can take minutes and does not block reads or writes.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile_in_background())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def explain(self, shape: QueryShape) -> dict:
+        cursor = db[shape.collection].find(shape.filter).limit(1)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        planner = (await cursor.explain())["queryPlanner"]
+        winning = planner["winningPlan"]
+        # Plans of the slot based engine are nested one level deeper
+        stages = _plan_stages(winning.get("queryPlan", winning))
+        return {
+            "name": shape.name,
+            "collection": shape.collection,
+            "stages": [stage["stage"] for stage in stages],
+            "indexes": sorted({stage["indexName"] for stage in stages if "indexName" in stage}),
+            "collection_scan": any(stage["stage"] == "COLLSCAN" for stage in stages),
+            "in_memory_sort": any(stage["stage"] == "SORT" for stage in stages),
+        }
+
+    async def report(self) -> dict:
+        """
+        Which registered indexes exist and how each query shape is planned.
+        """
+        existing = {}
+        for collection in dict.fromkeys(index.collection for index in self.indexes):
+            existing[collection] = await db[collection].index_information()
+        indexes = [
+            {
+                "collection": index.collection,
+                "name": index.name,
+                "keys": [[field, direction] for field, direction in index.keys],
+                "required": index.required,
+                "present": index.name in existing[index.collection],
+            }
+            for index in self.indexes
+        ]
+        queries = [await self.explain(shape) for shape in self.queries]
+        return {
+            "indexes": indexes,
+            "queries": queries,
+            "missing_indexes": sum(not index["present"] for index in indexes),
+            "collection_scans": sum(query["collection_scan"] for query in queries),
+            "failed": self.failed,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "registered": len(self.indexes),
+            "present": sum(self.ready(index) for index in self.indexes),
+            "reconciled": self.reconciled,
+            "created": len(self.created),
+            "failed": len(self.failed),
+        }
+
+
+index_registry = IndexRegistry(INDEXES, QUERY_SHAPES)
+
+
+async def _main(args) -> int:
+    from app.core.database import close_db_client
+
+    try:
+        if args.reconcile:
+            print(json.dumps(await index_registry.reconcile(), indent=2), file=sys.stderr)
+        report = await index_registry.report()
+    finally:
+        close_db_client()
+    print(json.dumps(report, indent=2))
+    if args.check and (report["missing_indexes"] or report["collection_scans"]):
+        print(
+            f"{report['missing_indexes']} missing indexes, {report['collection_scans']} collection scans",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index usage report of the registered query shapes")
+    parser.add_argument("--reconcile", action="store_true", help="create missing indexes first")
+    parser.add_argument("--check", action="store_true", help="exit 1 on missing indexes or collection scans")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,264 @@
+# app/core/jobs.py
+#
+# Durable background jobs stored in the `jobs` collection and executed by an
+# in-process pool of async workers. Work that does not have to finish before
+# the HTTP response (geocoding, delete cascades) is enqueued here; a job that
+# was running when the process died is picked up again once its lease expires.
+# A running job renews its lease while the handler works, so a long rebuild
+# is not claimed a second time, and every claim carries its own token: only
+# the claim that still holds the lease can finish, retry or fail the job.
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    def __init__(
+        self,
+        workers: int,
+        max_attempts: int,
+        lease_seconds: float,
+        poll_interval: float,
+        retention_seconds: float,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._handlers: Dict[str, JobHandler] = {}
+        self._failure_handlers: Dict[str, JobHandler] = {}
+        self._schedules: List[tuple] = []
+        self._tasks: List[asyncio.Task] = []
+        self._schedule_tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def register(self, job_type: str, on_failure: Optional[JobHandler] = None):
+        """
+        Decorator registering the handler for a job type. `on_failure` runs
+        once with the same payload when the job has exhausted its attempts.
+        """
+        def decorator(handler: JobHandler) -> JobHandler:
+            self._handlers[job_type] = handler
+            if on_failure is not None:
+                self._failure_handlers[job_type] = on_failure
+            return handler
+        return decorator
+
+    def schedule_every(self, job_type: str, interval: float, payload: Optional[dict] = None):
+        """
+        Enqueue `job_type` once every `interval` seconds while the queue runs.
+        The time slot is part of the job key, so several processes running the
+        same schedule still produce a single job per slot.
+
+        Raises ValueError unless `interval` is positive.
+        """
+        if not interval > 0:
+            raise ValueError(f"Interval of scheduled job {job_type!r} must be positive, got {interval!r}")
+        self._schedules.append((job_type, interval, payload or {}))
+
+    async def enqueue(self, job_type: str, payload: dict, key: Optional[str] = None, delay: float = 0):
+        """
+        Persist a job. With a `key`, enqueueing the same key again is a no-op
+        for as long as the earlier job is retained.
+        """
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "payload": payload,
+            "status": PENDING,
+            "attempts": 0,
+            "run_at": now + timedelta(seconds=delay),
+            "created_at": now,
+        }
+        if key is None:
+            await db.jobs.insert_one(job)
+        else:
+            await db.jobs.update_one({"_id": key}, {"$setOnInsert": job}, upsert=True)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(n)) for n in range(self.workers)]
+        self._schedule_tasks = [
+            asyncio.create_task(self._schedule(job_type, interval, payload))
+            for job_type, interval, payload in self._schedules
+        ]
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Let running jobs finish for up to `timeout` seconds; anything still
+        running after that is cancelled and retried after its lease expires.
+        """
+        if not self._tasks:
+            return
+        for task in self._schedule_tasks:
+            task.cancel()
+        await asyncio.gather(*self._schedule_tasks, return_exceptions=True)
+        self._schedule_tasks = []
+
+        self._stopping = True
+        self._wakeup.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _schedule(self, job_type: str, interval: float, payload: dict):
+        while True:
+            slot = int(time.time() // interval)
+            try:
+                await self.enqueue(job_type, payload, key=f"{job_type}:{slot}")
+            except Exception:
+                logger.exception("Could not schedule job %s", job_type)
+            await asyncio.sleep((slot + 1) * interval - time.time())
+
+    async def _work(self, n: int):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Job worker %d could not claim a job", n)
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "run_at": {"$lte": now}},
+                # Lease expired: the worker running it died or was cancelled
+                {"status": RUNNING, "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "locked_until": now + timedelta(seconds=self.lease_seconds),
+                    "lease": ObjectId(),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _held(self, job: dict) -> dict:
+        # Matches the job only while this claim still holds its lease
+        return {"_id": job["_id"], "lease": job["lease"]}
+
+    async def _heartbeat(self, job: dict):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await db.jobs.update_one(
+                    self._held(job),
+                    {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}},
+                )
+            except Exception:
+                logger.exception("Could not renew the lease of job %s (%s)", job["_id"], job["type"])
+                continue
+            if not result.matched_count:
+                logger.warning("Job %s (%s) lost its lease to another worker", job["_id"], job["type"])
+                return
+
+    async def _run(self, job: dict):
+        handler = self._handlers.get(job["type"])
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job type {job['type']!r}")
+            await handler(job["payload"])
+        except Exception as e:
+            heartbeat.cancel()
+            await self._failed(job, e)
+            return
+        finally:
+            heartbeat.cancel()
+        result = await db.jobs.update_one(
+            self._held(job),
+            {"$set": {
+                "status": DONE,
+                "finished_at": datetime.utcnow(),
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.retention_seconds),
+            }, "$unset": {"locked_until": "", "lease": ""}},
+        )
+        if not result.matched_count:
+            logger.warning("Job %s (%s) finished after losing its lease", job["_id"], job["type"])
+
+    async def _failed(self, job: dict, error: Exception):
+        now = datetime.utcnow()
+        if job["attempts"] < self.max_attempts:
+            delay = min(self.backoff_base ** job["attempts"], self.backoff_max) * random.uniform(0.8, 1.2)
+            logger.warning("Job %s (%s) failed, retrying in %.1fs: %s", job["_id"], job["type"], delay, error)
+            await db.jobs.update_one(
+                self._held(job),
+                {"$set": {"status": PENDING, "run_at": now + timedelta(seconds=delay), "last_error": repr(error)},
+                 "$unset": {"locked_until": "", "lease": ""}},
+            )
+            return
+
+        result = await db.jobs.update_one(
+            self._held(job),
+            {"$set": {
+                "status": FAILED,
+                "last_error": repr(error),
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=self.retention_seconds),
+            }, "$unset": {"locked_until": "", "lease": ""}},
+        )
+        if not result.matched_count:
+            # Another claim runs the job now and decides its outcome
+            logger.warning("Job %s (%s) failed after losing its lease: %s", job["_id"], job["type"], error)
+            return
+        logger.error("Job %s (%s) failed permanently: %s", job["_id"], job["type"], error)
+        on_failure = self._failure_handlers.get(job["type"])
+        if on_failure is not None:
+            try:
+                await on_failure(job["payload"])
+            except Exception:
+                logger.exception("Failure handler of job %s (%s) raised", job["_id"], job["type"])
+
+
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    retention_seconds=settings.JOB_RETENTION_SECONDS,
+)
@@ -0,0 +1,320 @@
+# app/core/metrics.py
+#
+# In-process request metrics, exported in the Prometheus text format by
+# GET /api/metrics:
+#
+# - MetricsMiddleware times every request per route template and, through a
+#   context variable, collects what the request spent in MongoDB (reported
+#   by MongoCommandListener) and in outbound HTTP calls (outbound()).
+# - Requests and Mongo commands above a threshold go to the "app.slow" log.
+# - Optionally each response carries a Server-Timing header with the same
+#   breakdown, which browsers show in their network panel.
+#
+# Motor runs pymongo on a thread pool but copies the caller's context into
+# it, so the listener sees the context variable of the request that issued
+# the command. Counters are shared with those threads, hence the locks.
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import settings
+
+slow_log = logging.getLogger("app.slow")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class HistogramFamily:
+    """
+    Histograms of one metric, one per label combination.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            histogram = self._histograms.get(label_values)
+            if histogram is None:
+                histogram = self._histograms[label_values] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, histogram in sorted(self._histograms.items()):
+                lines.extend(histogram.render(self.name, _labels(self.label_names, label_values)))
+        return lines
+
+
+class CounterFamily:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.label_names, label_values)}}} {value}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class RequestStats:
+    """
+    What one request spent outside its own code, filled in as it runs.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_commands = 0
+        self.db_seconds = 0.0
+        self.http_calls = 0
+        self.http_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_db(self, seconds: float):
+        with self._lock:
+            self.db_commands += 1
+            self.db_seconds += seconds
+
+    def add_http(self, seconds: float):
+        with self._lock:
+            self.http_calls += 1
+            self.http_seconds += seconds
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+request_duration = HistogramFamily(
+    "http_request_duration_seconds", "Time to serve a request.", ("method", "route", "status"))
+request_db_seconds = HistogramFamily(
+    "http_request_db_seconds", "Time a request spent waiting on MongoDB.", ("method", "route"))
+request_db_commands = HistogramFamily(
+    "http_request_db_commands", "MongoDB commands issued per request.", ("method", "route"), buckets=COUNT_BUCKETS)
+mongo_duration = HistogramFamily(
+    "mongodb_command_duration_seconds", "MongoDB command round trips.", ("command", "collection"))
+mongo_failures = CounterFamily(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error.", ("command",))
+outbound_duration = HistogramFamily(
+    "http_client_request_duration_seconds", "Outbound HTTP calls, until the response is read.", ("target", "outcome"))
+
+# name -> callable returning a (possibly nested) dict of numbers, exported as gauges
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collect: Callable[[], dict]):
+    _collectors[name] = collect
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    # Commands that only keep the connection alive
+    IGNORED = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+    def __init__(self, slow_seconds: float):
+        self.slow_seconds = slow_seconds
+        self._collections: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finished(self, event) -> Optional[Tuple[str, float]]:
+        if event.command_name in self.IGNORED:
+            return None
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "")
+        seconds = event.duration_micros / 1e6
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.add_db(seconds)
+        return collection, seconds
+
+    def succeeded(self, event):
+        finished = self._finished(event)
+        if finished is None:
+            return
+        collection, seconds = finished
+        mongo_duration.observe(seconds, event.command_name, collection)
+        if seconds >= self.slow_seconds:
+            slow_log.warning("Slow MongoDB %s on %s: %.1f ms", event.command_name, collection or event.database_name, seconds * 1000)
+
+    def failed(self, event):
+        finished = self._finished(event)
+        if finished is None:
+            return
+        collection, seconds = finished
+        mongo_duration.observe(seconds, event.command_name, collection)
+        mongo_failures.inc(event.command_name)
+
+
+mongo_listener = MongoCommandListener(slow_seconds=settings.SLOW_QUERY_MS / 1000)
+
+
+@contextmanager
+def outbound(target: str) -> Iterator[dict]:
+    """
+    Time an outbound HTTP call. Set `outcome` in the yielded dict (e.g. to
+    the status code); an exception records its class name instead.
+    """
+    info = {"outcome": "ok"}
+    started = time.perf_counter()
+    try:
+        yield info
+    except Exception as e:
+        info["outcome"] = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        outbound_duration.observe(seconds, target, str(info["outcome"]))
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.add_http(seconds)
+
+
+def _server_timing(stats: RequestStats) -> bytes:
+    total = (time.perf_counter() - stats.started) * 1000
+    parts = [f"app;dur={total:.1f}", f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_commands} commands"']
+    if stats.http_calls:
+        parts.append(f'http;dur={stats.http_seconds * 1000:.1f};desc="{stats.http_calls} calls"')
+    return ", ".join(parts).encode()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware, so streaming responses pass through untouched.
+    Requests under `long_lived_paths` (event streams) stay open by design
+    and are never logged as slow.
+    """
+
+    def __init__(self, app, server_timing: bool = False, slow_seconds: float = 0.5, long_lived_paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.server_timing = server_timing
+        self.slow_seconds = slow_seconds
+        self.long_lived_paths = long_lived_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            seconds = time.perf_counter() - stats.started
+            # The router leaves the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            request_duration.observe(seconds, method, template, str(status["code"]))
+            request_db_seconds.observe(stats.db_seconds, method, template)
+            request_db_commands.observe(stats.db_commands, method, template)
+            if seconds >= self.slow_seconds and not scope["path"].startswith(self.long_lived_paths):
+                slow_log.warning(
+                    "Slow request %s %s -> %s: %.1f ms (db: %d commands, %.1f ms; http: %d calls, %.1f ms)",
+                    method, scope["path"], status["code"], seconds * 1000,
+                    stats.db_commands, stats.db_seconds * 1000, stats.http_calls, stats.http_seconds * 1000,
+                )
+
+
+def _flatten(prefix: str, values: dict) -> List[Tuple[str, float]]:
+    flat = []
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            flat.extend(_flatten(name, value))
+        elif isinstance(value, (bool, int, float)):
+            flat.append((name, float(value)))
+    return flat
+
+
+def render() -> str:
+    lines: List[str] = []
+    for family in (request_duration, request_db_seconds, request_db_commands, mongo_duration, mongo_failures, outbound_duration):
+        lines.extend(family.render())
+    for collector_name, collect in sorted(_collectors.items()):
+        for name, value in _flatten(collector_name, collect()):
+            name = "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
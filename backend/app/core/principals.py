@@ -0,0 +1,130 @@
+# app/core/principals.py
+#
+# Cache of authenticated users keyed by token subject (email), so most
+# authenticated requests need no database query. An entry carries the
+# user's is_admin flag and the fact that the account exists, so:
+#
+# - entries live only AUTH_PRINCIPAL_TTL_SECONDS, which bounds how long a
+#   change made outside the app (is_admin edited in the database) goes unseen;
+# - the app evicts a user when it deletes them, and code that changes
+#   is_admin has to call evict() as well. With REALTIME_REDIS_URL the
+#   eviction is broadcast over a Redis channel that every worker process
+#   listens on; without it there is only one worker (see serve.py) and the
+#   local eviction is enough.
+#
+# A lookup that was already in flight when an eviction arrived does not
+# store its (possibly stale) result.
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: float, redis_url: str = "", channel: str = "principal-evictions"):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.channel = channel
+        self._redis = None
+        if redis_url:
+            try:
+                from redis import asyncio as aioredis
+            except ImportError as e:
+                raise RuntimeError("REALTIME_REDIS_URL is set but the 'redis' package is not installed") from e
+            self._redis = aioredis.from_url(redis_url)
+        # Bumped by every eviction; a load that started before one is not cached
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.evictions = 0
+        self.relay_errors = 0
+
+    async def get_or_load(self, email: str, load: Callable[[], Awaitable[Optional[T]]]) -> Optional[T]:
+        """
+        The cached principal for `email`, else `load()`'s result, which is
+        cached unless it is None.
+        """
+        principal = self._cache.get(email)
+        if principal is not MISSING:
+            return principal
+        generation = self._generation
+        principal = await load()
+        if principal is not None and generation == self._generation:
+            self._cache.set(email, principal)
+        return principal
+
+    def _evict_local(self, email: str):
+        self._generation += 1
+        self.evictions += 1
+        self._cache.pop(email)
+
+    async def evict(self, email: str):
+        """
+        Drop the principal in every worker; call whenever a user is deleted
+        or their admin flag changes.
+        """
+        self._evict_local(email)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(self.channel, email)
+        except Exception:
+            # The other workers still drop it once the TTL runs out
+            self.relay_errors += 1
+            logger.exception("Broadcasting the eviction of a cached principal failed")
+
+    async def _listen_once(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    data = message["data"]
+                    self._evict_local(data.decode() if isinstance(data, bytes) else data)
+        finally:
+            await pubsub.aclose()
+
+    async def _listen(self):
+        while True:
+            try:
+                await self._listen_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.relay_errors += 1
+                logger.exception("Principal eviction channel lost, reconnecting")
+                # Evictions sent while disconnected were missed
+                self._cache.clear()
+                await asyncio.sleep(1)
+
+    async def start(self):
+        if self._redis is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "evictions": self.evictions,
+            "shared": self._redis is not None,
+            "relay_errors": self.relay_errors,
+        }
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.AUTH_PRINCIPAL_TTL_SECONDS,
+    redis_url=settings.REALTIME_REDIS_URL,
+)
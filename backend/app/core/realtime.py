@@ -0,0 +1,324 @@
+# app/core/realtime.py
+#
+# In-process publish/subscribe hub behind the WebSocket and SSE endpoints.
+# A subscriber follows topics ("idea:<id>", "category:<name>", "ideas" for
+# every new idea) and map areas ("bbox:<min_lng>,<min_lat>,<max_lng>,<max_lat>").
+#
+# - Events are serialized once and fanned out to every interested
+#   subscriber, each exactly once however many of its topics match.
+# - Changes that arrive in bursts (votes) are not published directly: the
+#   writer marks the key dirty and once per `coalesce_interval` the hub loads
+#   the current state of every dirty key in one call and publishes that, so a
+#   viral idea costs one event per interval instead of one per vote.
+# - Every subscriber has a bounded queue. A consumer that cannot keep up
+#   loses its oldest events (they are state snapshots, newer ones supersede
+#   them) instead of growing memory without limit.
+#
+# With several worker processes, REALTIME_REDIS_URL routes every published
+# event through a Redis channel that the hub of each worker listens on, so a
+# client hears about changes made through any worker. A key marked dirty in
+# several workers is published by one of them per interval: each round a
+# worker claims its keys with a Redis lock that expires after the interval,
+# and keeps the ones claimed elsewhere dirty for its next round. Without the
+# relay the hub only sees the writes of its own process, which is why
+# serve.py refuses to start more than one worker unless it is configured.
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.geo import BBox, parse_bbox
+
+logger = logging.getLogger(__name__)
+
+
+class Event(NamedTuple):
+    type: str
+    # JSON text of the whole event, shared by every subscriber
+    data: str
+    topics: Tuple[str, ...]
+    # (latitude, longitude) matched against bbox subscriptions
+    point: Optional[Tuple[float, float]] = None
+
+
+def make_event(event_type: str, payload: dict, topics: Iterable[str], point: Optional[Tuple[float, float]] = None) -> Event:
+    data = json.dumps({"type": event_type, **payload}, separators=(",", ":"), default=str)
+    return Event(event_type, data, tuple(topics), point)
+
+
+def _inside(bbox: BBox, point: Tuple[float, float]) -> bool:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    latitude, longitude = point
+    return min_lat <= latitude <= max_lat and min_lng <= longitude <= max_lng
+
+
+class Subscriber:
+    def __init__(self, queue_size: int, max_topics: int):
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=queue_size)
+        self.max_topics = max_topics
+        self.topics: Set[str] = set()
+        self.bboxes: Dict[str, BBox] = {}
+        self.dropped = 0
+
+    def offer(self, event: Event) -> bool:
+        """
+        Queue an event without waiting; returns False if an older one had to go.
+        """
+        dropped = False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            dropped = True
+        self.queue.put_nowait(event)
+        return not dropped
+
+
+class RedisRelay:
+    """
+    Carries events between the hubs of all worker processes over a Redis
+    pub/sub channel. Needs the optional `redis` package.
+    """
+
+    def __init__(self, url: str, channel: str = "realtime-events"):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("REALTIME_REDIS_URL is set but the 'redis' package is not installed") from e
+        self._redis = aioredis.from_url(url)
+        self.channel = channel
+
+    async def claim(self, keys: List[str], ttl: float) -> List[str]:
+        """
+        The keys no other worker has claimed in the last `ttl` seconds, now
+        claimed by this one; one pipelined SET NX per key.
+        """
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(f"{self.channel}:publisher:{key}", 1, nx=True, px=max(1, int(ttl * 1000)))
+            claimed = await pipe.execute()
+        return [key for key, won in zip(keys, claimed) if won]
+
+    async def send(self, event: Event):
+        await self._redis.publish(self.channel, json.dumps([event.type, event.data, event.topics, event.point]))
+
+    async def listen(self, deliver: Callable[[Event], None]):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                event_type, data, topics, point = json.loads(message["data"])
+                deliver(Event(event_type, data, tuple(topics), tuple(point) if point else None))
+        finally:
+            await pubsub.aclose()
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class RealtimeHub:
+    def __init__(self, coalesce_interval: float, queue_size: int, max_topics: int, relay: Optional[RedisRelay] = None):
+        self.coalesce_interval = coalesce_interval
+        self.queue_size = queue_size
+        self.max_topics = max_topics
+        self.relay = relay
+        self._subscribers: Set[Subscriber] = set()
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self._area_subscribers: Set[Subscriber] = set()
+        self._dirty: Set[str] = set()
+        self._loader: Optional[Callable[[List[str]], Awaitable[List[Event]]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.postponed = 0
+        self.load_errors = 0
+        self.relay_errors = 0
+
+    def set_loader(self, loader: Callable[[List[str]], Awaitable[List[Event]]]):
+        """
+        `loader(keys)` returns the events describing the current state of the
+        keys marked dirty since the last round.
+        """
+        self._loader = loader
+
+    def connect(self) -> Subscriber:
+        subscriber = Subscriber(self.queue_size, self.max_topics)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        self._area_subscribers.discard(subscriber)
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+        subscriber.topics.clear()
+        subscriber.bboxes.clear()
+
+    def subscribe(self, subscriber: Subscriber, topic: str):
+        """
+        Raises ValueError for a malformed topic or past the subscription limit.
+        """
+        if topic in subscriber.topics or topic in subscriber.bboxes:
+            return
+        if len(subscriber.topics) + len(subscriber.bboxes) >= subscriber.max_topics:
+            raise ValueError(f"at most {subscriber.max_topics} subscriptions per connection")
+        kind, _, value = topic.partition(":")
+        if kind == "bbox":
+            subscriber.bboxes[topic] = parse_bbox(value)
+            self._area_subscribers.add(subscriber)
+        elif (kind in ("idea", "category") and value) or topic == "ideas":
+            subscriber.topics.add(topic)
+            self._topics.setdefault(topic, set()).add(subscriber)
+        else:
+            raise ValueError(f"unknown topic '{topic}'")
+
+    def unsubscribe(self, subscriber: Subscriber, topic: str):
+        if subscriber.bboxes.pop(topic, None) is not None:
+            if not subscriber.bboxes:
+                self._area_subscribers.discard(subscriber)
+            return
+        if topic in subscriber.topics:
+            subscriber.topics.discard(topic)
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, event: Event):
+        if self.relay is None:
+            self._deliver(event)
+            return
+        # Delivered locally too once it comes back from the channel
+        task = asyncio.create_task(self._send(event))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, event: Event):
+        try:
+            await self.relay.send(event)
+        except Exception:
+            self.relay_errors += 1
+            logger.exception("Relaying a realtime event failed")
+            # At least the subscribers of this process get it
+            self._deliver(event)
+
+    def _deliver(self, event: Event):
+        recipients: Set[Subscriber] = set()
+        for topic in event.topics:
+            recipients.update(self._topics.get(topic, ()))
+        if event.point is not None:
+            for subscriber in self._area_subscribers:
+                if subscriber not in recipients and any(_inside(bbox, event.point) for bbox in subscriber.bboxes.values()):
+                    recipients.add(subscriber)
+        self.published += 1
+        for subscriber in recipients:
+            if not subscriber.offer(event):
+                self.dropped += 1
+            self.delivered += 1
+
+    def mark(self, *keys: str):
+        """
+        Note that the state behind `keys` changed; published with the next round.
+        """
+        if not self._subscribers and self.relay is None:
+            # Nobody is listening, so there is nothing to load or send
+            return
+        before = len(self._dirty)
+        self._dirty.update(keys)
+        self.coalesced += len(keys) - (len(self._dirty) - before)
+
+    async def flush(self):
+        if not self._dirty or self._loader is None:
+            return
+        keys, self._dirty = list(self._dirty), set()
+        if self.relay is not None:
+            try:
+                claimed = await self.relay.claim(keys, self.coalesce_interval)
+            except Exception:
+                # Publishing twice beats not publishing
+                self.relay_errors += 1
+                logger.exception("Claiming %d realtime updates failed", len(keys))
+            else:
+                # Published by another worker this round; its load may predate
+                # the change seen here, so they are published here next round
+                postponed = set(keys).difference(claimed)
+                self._dirty.update(postponed)
+                self.postponed += len(postponed)
+                keys = claimed
+                if not keys:
+                    return
+        try:
+            events = await self._loader(keys)
+        except Exception:
+            self.load_errors += 1
+            logger.exception("Loading %d realtime updates failed", len(keys))
+            return
+        for event in events:
+            self.publish(event)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.coalesce_interval)
+            await self.flush()
+
+    async def _listen(self):
+        while True:
+            try:
+                await self.relay.listen(self._deliver)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.relay_errors += 1
+                logger.exception("Realtime relay connection lost, reconnecting")
+                await asyncio.sleep(1)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        if self.relay is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, self._listener) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *self._sending, return_exceptions=True)
+        self._task = self._listener = None
+        if self.relay is not None:
+            await self.relay.close()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "topics": len(self._topics),
+            "area_subscribers": len(self._area_subscribers),
+            "pending": len(self._dirty),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "postponed": self.postponed,
+            "load_errors": self.load_errors,
+            "relay": self.relay is not None,
+            "relay_errors": self.relay_errors,
+        }
+
+
+realtime_hub = RealtimeHub(
+    coalesce_interval=settings.REALTIME_COALESCE_MS / 1000,
+    queue_size=settings.REALTIME_QUEUE_SIZE,
+    max_topics=settings.REALTIME_MAX_TOPICS,
+    relay=RedisRelay(settings.REALTIME_REDIS_URL) if settings.REALTIME_REDIS_URL else None,
+)
@@ -0,0 +1,390 @@
+# app/core/response_cache.py
+#
+# Cache of rendered JSON responses for the public read endpoints. An entry
+# holds the serialized body, its strong ETag and the headers that go with it
+# (e.g. X-Next-Cursor), so an unchanged poll is answered without touching
+# Mongo or pydantic: a 304 when the client's If-None-Match matches, otherwise
+# the stored bytes.
+#
+# Entries carry tags ("idea:<id>", "comments:<id>", ...). Writes invalidate
+# exactly the tags they affect; TTL only bounds what invalidation can miss,
+# such as writes made by another worker process with the in-memory backend.
+
+import hashlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+from app.core.serialization import render_json
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class ResponseCacheBackend(ABC):
+    """
+    Storage for cached responses. `watermark()` is taken before a response
+    is built from the database; `set()` refuses to store it if one of its
+    tags was invalidated after that point, so a read racing a write never
+    caches the pre-write state.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        ...
+
+    @abstractmethod
+    async def watermark(self) -> int:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, entry: CachedResponse, tags: Iterable[str], ttl: float, since: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(ResponseCacheBackend):
+    """
+    Bounded LRU in the worker process, with a tag -> keys index for
+    invalidation. Not shared between processes.
+    """
+
+    def __init__(self, maxsize: int, tag_history: int = 10000):
+        self.maxsize = maxsize
+        self.tag_history = tag_history
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse, Tuple[str, ...]]]" = OrderedDict()
+        self._tag_keys: Dict[str, Set[str]] = {}
+        self._seq = 0
+        # tag -> sequence number of its latest invalidation, oldest first
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten_seq = 0
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def watermark(self) -> int:
+        return self._seq
+
+    async def set(self, key: str, entry: CachedResponse, tags: Iterable[str], ttl: float, since: int) -> bool:
+        tags = tuple(set(tags))
+        for tag in tags:
+            # A tag that fell out of the history may have been invalidated as late as _forgotten_seq
+            if self._invalidated.get(tag, self._forgotten_seq) > since:
+                return False
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl, entry, tags)
+        for tag in tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+        return True
+
+    async def invalidate(self, tags: Iterable[str]):
+        self._seq += 1
+        for tag in tags:
+            for key in list(self._tag_keys.get(tag, ())):
+                self._drop(key)
+            self._invalidated[tag] = self._seq
+            self._invalidated.move_to_end(tag)
+        while len(self._invalidated) > self.tag_history:
+            _, seq = self._invalidated.popitem(last=False)
+            self._forgotten_seq = max(self._forgotten_seq, seq)
+
+    async def clear(self):
+        self._seq += 1
+        self._forgotten_seq = self._seq
+        self._entries.clear()
+        self._tag_keys.clear()
+        self._invalidated.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "tags": len(self._tag_keys)}
+
+
+# The watermark check and the write of a new entry run as one script, and so
+# does an invalidation, so an invalidation can never fall between the check
+# and the write and miss the entry. Entry keys are passed along within the
+# tag sets rather than as KEYS, which rules out Redis Cluster.
+_REDIS_SET = """
+local tags = tonumber(ARGV[6])
+for i = 1, tags do
+    local seq = redis.call('GET', KEYS[1 + i])
+    if seq and tonumber(seq) > tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], 'body', ARGV[3], 'etag', ARGV[4], 'headers', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+for i = 1, tags do
+    redis.call('SADD', KEYS[1 + tags + i], KEYS[1])
+    redis.call('EXPIRE', KEYS[1 + tags + i], ARGV[2])
+end
+return 1
+"""
+
+_REDIS_INVALIDATE = """
+local tags = tonumber(ARGV[1])
+local seq = redis.call('INCR', KEYS[1])
+for i = 1, tags do
+    for _, entry_key in ipairs(redis.call('SMEMBERS', KEYS[1 + i])) do
+        redis.call('DEL', entry_key)
+    end
+    redis.call('DEL', KEYS[1 + i])
+    redis.call('SET', KEYS[1 + tags + i], seq, 'EX', ARGV[2])
+end
+return seq
+"""
+
+
+class RedisBackend(ResponseCacheBackend):
+    """
+    Cache shared by every worker process, so an invalidation made by one is
+    seen by all. Needs the optional `redis` package.
+    """
+
+    def __init__(self, url: str, prefix: str = "response-cache:", tag_history_seconds: int = 3600):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_REDIS_URL is set but the 'redis' package is not installed") from e
+        self._redis = aioredis.from_url(url)
+        self._set_script = self._redis.register_script(_REDIS_SET)
+        self._invalidate_script = self._redis.register_script(_REDIS_INVALIDATE)
+        self.prefix = prefix
+        self.tag_history_seconds = tag_history_seconds
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.prefix}{kind}:{name}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        data = await self._redis.hgetall(self._key("entry", key))
+        if not data:
+            return None
+        return CachedResponse(data[b"body"], data[b"etag"].decode(), json.loads(data[b"headers"]))
+
+    async def watermark(self) -> int:
+        return int(await self._redis.get(self._key("seq", "")) or 0)
+
+    async def set(self, key: str, entry: CachedResponse, tags: Iterable[str], ttl: float, since: int) -> bool:
+        tags = list(set(tags))
+        keys = [self._key("entry", key)]
+        keys += [self._key("invalidated", tag) for tag in tags]
+        keys += [self._key("tag", tag) for tag in tags]
+        args = [since, max(int(ttl), 1), entry.body, entry.etag, json.dumps(entry.headers), len(tags)]
+        return bool(await self._set_script(keys=keys, args=args))
+
+    async def invalidate(self, tags: Iterable[str]):
+        tags = list(set(tags))
+        keys = [self._key("seq", "")]
+        keys += [self._key("tag", tag) for tag in tags]
+        keys += [self._key("invalidated", tag) for tag in tags]
+        await self._invalidate_script(keys=keys, args=[len(tags), self.tag_history_seconds])
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=f"{self.prefix}*"):
+            await self._redis.delete(key)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses weak comparison
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, backend: ResponseCacheBackend, enabled: bool, ttl: float, max_age: int):
+        self.backend = backend
+        self.enabled = enabled
+        self.ttl = ttl
+        self.cache_control = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stores = 0
+        self.skipped_stores = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(request: Request) -> str:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}"
+
+    def _respond(self, request: Request, entry: CachedResponse) -> Response:
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": self.cache_control}
+        if _matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    async def serve(
+        self,
+        request: Request,
+        response: Response,
+        model: Any,
+        build: Callable[[], Awaitable[Tuple[Any, List[str]]]],
+        headers: Iterable[str] = (),
+    ) -> Response:
+        """
+        Answer from the cache, or run `build()` - which returns the content
+        (raw documents or models, rendered as `model`) and its tags - and
+        cache the result. The
+        listed `headers`, if `build()` set them on `response`, are cached
+        and replayed with the body.
+        """
+        key = self.key(request)
+        since = None
+        if self.enabled:
+            try:
+                entry = await self.backend.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return self._respond(request, entry)
+                since = await self.backend.watermark()
+            except Exception:
+                self.errors += 1
+                logger.exception("Response cache lookup failed")
+            self.misses += 1
+
+        content, tags = await build()
+        body = render_json(model, content)
+        entry = CachedResponse(body, _etag(body), {name: response.headers[name] for name in headers if name in response.headers})
+
+        if since is not None:
+            try:
+                if await self.backend.set(key, entry, tags, self.ttl, since):
+                    self.stores += 1
+                else:
+                    self.skipped_stores += 1
+            except Exception:
+                self.errors += 1
+                logger.exception("Response cache store failed")
+        return self._respond(request, entry)
+
+    async def invalidate(self, *tags: str):
+        if not self.enabled or not tags:
+            return
+        self.invalidations += 1
+        try:
+            await self.backend.invalidate(tags)
+        except Exception:
+            self.errors += 1
+            logger.exception("Response cache invalidation failed for %s", tags)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "stores": self.stores,
+            "skipped_stores": self.skipped_stores,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+
+# Tags. Every cached idea response carries IDEAS, and every idea listing also
+# IDEA_LISTS (membership: creates, deletes, status/category changes), the tag
+# of its sort order (ranking changes) and the tag of each idea on the page.
+IDEAS = "ideas"
+IDEA_LISTS = "ideas:lists"
+COMMENTS = "comments"
+
+
+def idea_tag(idea_id) -> str:
+    return f"idea:{idea_id}"
+
+
+def ranking_tag(sort: str) -> str:
+    return f"ideas:rank:{sort}"
+
+
+def comments_tag(idea_id) -> str:
+    return f"comments:{idea_id}"
+
+
+def idea_list_tags(docs: Iterable[dict], sort: str) -> List[str]:
+    return [IDEAS, IDEA_LISTS, ranking_tag(sort)] + [idea_tag(doc["_id"]) for doc in docs]
+
+
+def comment_preview_tags(docs: Iterable[dict]) -> List[str]:
+    # Listings that embed each idea's latest comments
+    return [COMMENTS] + [comments_tag(doc["_id"]) for doc in docs]
+
+
+def _make_backend() -> ResponseCacheBackend:
+    if settings.RESPONSE_CACHE_REDIS_URL:
+        return RedisBackend(settings.RESPONSE_CACHE_REDIS_URL)
+    return MemoryBackend(maxsize=settings.RESPONSE_CACHE_SIZE)
+
+
+response_cache = ResponseCache(
+    _make_backend(),
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_age=settings.RESPONSE_CACHE_MAX_AGE_SECONDS,
+)
@@ -0,0 +1,62 @@
+# app/core/serialization.py
+#
+# Fast path from raw Mongo documents to JSON bytes. The usual route - copy
+# `_id` into `id`, build a model per document, let FastAPI validate the
+# result again against `response_model` and encode it - validates every page
+# twice and goes through Python dicts in between. Here Mongo projects only
+# the model's fields (with `id` already converted by $toString), a cached
+# TypeAdapter validates the documents once and dumps them straight to JSON.
+# An endpoint returning the resulting Response keeps its `response_model`
+# for the OpenAPI schema; FastAPI skips validation for Response objects.
+
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def mongo_projection(model: Type[BaseModel], *extra: str) -> dict:
+    """
+    Projection returning exactly the fields of `model`, with `id` computed
+    from `_id` by the server. Usable with find() and as a $project stage.
+    """
+    projection = {name: 1 for name in model.model_fields if name != "id"}
+    projection["id"] = {"$toString": "$_id"}
+    for name in extra:
+        projection[name] = 1
+    return projection
+
+
+def render_json(model: Any, content: Any) -> bytes:
+    """
+    Validate raw documents (or model instances) as `model` and dump them to JSON.
+    """
+    type_adapter = adapter(model)
+    return type_adapter.dump_json(type_adapter.validate_python(content))
+
+
+def json_response(model: Any, content: Any, response: Optional[Response] = None, headers: Iterable[str] = ()) -> Response:
+    """
+    JSON response for `content` rendered as `model`. The named `headers`
+    (e.g. X-Next-Cursor) are carried over from the endpoint's injected
+    `response`, which FastAPI ignores once a Response is returned.
+    """
+    carried = {}
+    if response is not None:
+        carried = {name: response.headers[name] for name in headers if name in response.headers}
+    return Response(content=render_json(model, content), media_type="application/json", headers=carried)
+
+
+def private_json_response(model: Any, content: Any, response: Optional[Response] = None, headers: Iterable[str] = ()) -> Response:
+    """
+    json_response for content that differs per user, kept out of shared caches.
+    """
+    rendered = json_response(model, content, response, headers)
+    rendered.headers["Cache-Control"] = "private, no-store"
+    return rendered
@@ -0,0 +1,63 @@
+# app/crud/base.py
+#
+# Shared plumbing of the data-access modules. Every crud function records
+# the round trips it makes, per process and for the code running inside
+# count_queries(), so a handler, a test or a benchmark can check what a call
+# cost in queries.
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator, List, Optional
+
+from bson import ObjectId
+
+
+class QueryCounter:
+    def __init__(self):
+        self.total = 0
+        self.operations: Counter = Counter()
+
+
+_current: ContextVar[Optional[QueryCounter]] = ContextVar("crud_query_counter", default=None)
+
+# Process-wide round trips per "collection.operation"
+query_totals: Counter = Counter()
+
+
+def record(collection, operation: str):
+    name = f"{collection.name}.{operation}"
+    query_totals[name] += 1
+    counter = _current.get()
+    if counter is not None:
+        counter.total += 1
+        counter.operations[name] += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count the crud round trips made inside the block, including those of
+    tasks it starts (they inherit the context).
+    """
+    counter = QueryCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+def object_id(value) -> Optional[ObjectId]:
+    """
+    The ObjectId for an id taken from a request, or None if it cannot be one.
+    """
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+
+def object_ids(values: Iterable) -> List[ObjectId]:
+    return [oid for oid in (object_id(value) for value in values) if oid is not None]
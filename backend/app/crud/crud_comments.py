@@ -0,0 +1,93 @@
+# app/crud/crud_comments.py
+#
+# Data access for comments.
+
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from app.core.database import db
+from app.crud.base import object_id, object_ids, record
+from app.models.comment import CommentCreate
+from app.models.user import User
+from app.services.ranking import counters_update
+
+
+def new_comment_document(comment: CommentCreate, idea_id: str, author: User, created_at: Optional[datetime] = None) -> dict:
+    document = comment.model_dump()
+    document["idea_id"] = idea_id
+    document["user_id"] = str(author.id)
+    document["user_name"] = author.full_name
+    document["created_at"] = created_at or datetime.utcnow()
+    return document
+
+
+async def get_latest_comments(idea_ids: Iterable[str], per_idea: int, projection: dict) -> Dict[str, List[dict]]:
+    """
+    The newest `per_idea` comments of each idea, newest first, in one round
+    trip: a $lookup per idea that walks the (idea_id, created_at) index
+    backwards and stops after `per_idea` entries.
+    """
+    oids = object_ids(idea_ids)
+    if not oids or per_idea <= 0:
+        return {}
+    pipeline = [
+        {"$match": {"_id": {"$in": oids}}},
+        {"$project": {"_id": 1}},
+        {"$lookup": {
+            "from": "comments",
+            "let": {"idea_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$idea_id", "$$idea_id"]}}},
+                {"$sort": {"created_at": -1, "_id": -1}},
+                {"$limit": per_idea},
+                {"$project": projection},
+            ],
+            "as": "comments",
+        }},
+    ]
+    record(db.ideas, "aggregate")
+    docs = await db.ideas.aggregate(pipeline).to_list(length=None)
+    return {str(doc["_id"]): doc["comments"] for doc in docs}
+
+
+async def embed_latest_comments(ideas: List[dict], per_idea: int, projection: dict):
+    """
+    Add `latest_comments` to a page of idea documents, one query for the whole page.
+    """
+    latest = await get_latest_comments([idea["_id"] for idea in ideas], per_idea, projection)
+    for idea in ideas:
+        idea["latest_comments"] = latest.get(str(idea["_id"]), [])
+
+
+async def create_comment(document: dict) -> Optional[dict]:
+    """
+    Insert the comment and bump its idea's comment_count (which doubles as
+    the existence check). Both writes go out concurrently, so the caller
+    waits one round trip; if the idea turns out not to exist the comment is
+    removed again and None is returned.
+    """
+    idea_oid = object_id(document["idea_id"])
+    if idea_oid is None:
+        return None
+    record(db.comments, "insert_one")
+    record(db.ideas, "update_one")
+    inserted, counted = await asyncio.gather(
+        db.comments.insert_one(document),
+        db.ideas.update_one({"_id": idea_oid}, counters_update({"comment_count": 1})),
+        return_exceptions=True,
+    )
+    if isinstance(inserted, BaseException):
+        if not isinstance(counted, BaseException) and counted.matched_count:
+            record(db.ideas, "update_one")
+            await db.ideas.update_one({"_id": idea_oid}, counters_update({"comment_count": -1}))
+        raise inserted
+    if isinstance(counted, BaseException) or counted.matched_count == 0:
+        record(db.comments, "delete_one")
+        await db.comments.delete_one({"_id": inserted.inserted_id})
+        if isinstance(counted, BaseException):
+            raise counted
+        return None
+
+    document["id"] = str(inserted.inserted_id)
+    return document
@@ -1 +1,204 @@
-    
\ No newline at end of file
+# app/crud/crud_ideas.py
+#
+# Data access for ideas. Writes return what the handler needs from the same
+# round trip (find_one_and_* with the document before the change), so no
+# handler has to read an idea back after writing it.
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.database import db
+from app.crud.base import object_id, object_ids, record
+from app.models.idea import IdeaCreate, IdeaStatus
+from app.models.user import User
+from app.services.dedupe import signature
+from app.services.ranking import counters_update
+
+
+def new_idea_document(idea: IdeaCreate, creator: User, created_at: Optional[datetime] = None) -> dict:
+    """
+    The document stored for a new idea. Coordinates are filled in later by
+    the geocode_idea job.
+    """
+    document = idea.model_dump()
+    document["latitude"] = None
+    document["longitude"] = None
+    document["geocode_pending"] = True
+    document.update(signature(idea.title, idea.description) or {})
+
+    document["creator_id"] = str(creator.id)
+    document["creator_name"] = creator.full_name
+    document["created_at"] = created_at or datetime.utcnow()
+    document["status"] = IdeaStatus.READ.value
+    document["vote_score"] = 0
+    document["upvotes"] = 0
+    document["downvotes"] = 0
+    document["comment_count"] = 0
+    document["hot_score"] = 0.0
+    return document
+
+
+async def create_idea(document: dict) -> dict:
+    """
+    Insert the document and return it with its `id`.
+    """
+    record(db.ideas, "insert_one")
+    result = await db.ideas.insert_one(document)
+    document["id"] = str(result.inserted_id)
+    return document
+
+
+async def get_idea(idea_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+    oid = object_id(idea_id)
+    if oid is None:
+        return None
+    record(db.ideas, "find_one")
+    return await db.ideas.find_one({"_id": oid}, projection)
+
+
+async def get_ideas(idea_ids: Iterable[str], projection: Optional[dict] = None) -> Dict[str, dict]:
+    """
+    Several ideas in one query, keyed by id; missing ones are left out.
+    """
+    oids = object_ids(set(idea_ids))
+    if not oids:
+        return {}
+    record(db.ideas, "find")
+    docs = await db.ideas.find({"_id": {"$in": oids}}, projection).to_list(length=len(oids))
+    return {str(doc["_id"]): doc for doc in docs}
+
+
+async def update_idea(idea_id: str, creator_id: str, changes: dict, changed_at: datetime) -> Optional[dict]:
+    """
+    Apply `changes` if the idea exists and belongs to `creator_id`. Returns
+    the idea as it was before the change, or None when nothing matched.
+    A status change stamps or clears resolved_at like set_status().
+    """
+    oid = object_id(idea_id)
+    if oid is None:
+        return None
+    update = {"$set": changes}
+    if changes.get("status") is not None:
+        # Pipeline stages read "$..." strings as field paths, so the other values go in as literals
+        others = {field: {"$literal": value} for field, value in changes.items() if field != "status"}
+        update = ([{"$set": others}] if others else []) + _status_update(IdeaStatus(changes["status"]), changed_at)
+    record(db.ideas, "find_one_and_update")
+    return await db.ideas.find_one_and_update(
+        {"_id": oid, "creator_id": creator_id},
+        update,
+        return_document=ReturnDocument.BEFORE,
+    )
+
+
+async def set_status(idea_id: str, status: IdeaStatus, changed_at: datetime) -> Optional[dict]:
+    """
+    Change the status; returns the idea as it was before, or None if it does not exist.
+    Resolving stamps `resolved_at` unless it is already set; any other status clears it.
+    """
+    oid = object_id(idea_id)
+    if oid is None:
+        return None
+    record(db.ideas, "find_one_and_update")
+    return await db.ideas.find_one_and_update({"_id": oid}, _status_update(status, changed_at), return_document=ReturnDocument.BEFORE)
+
+
+async def set_status_many(idea_ids: Iterable, status: IdeaStatus, changed_at: datetime) -> int:
+    """
+    set_status() for many ideas in one update_many; ideas already in
+    `status` are left alone. Returns how many changed.
+    """
+    oids = object_ids(idea_ids)
+    if not oids:
+        return 0
+    record(db.ideas, "update_many")
+    result = await db.ideas.update_many({"_id": {"$in": oids}, "status": {"$ne": status.value}}, _status_update(status, changed_at))
+    return result.modified_count
+
+
+def _status_update(status: IdeaStatus, changed_at: datetime) -> list:
+    if status == IdeaStatus.RESOLVED:
+        return [{"$set": {"status": status.value, "resolved_at": {"$ifNull": ["$resolved_at", changed_at]}}}]
+    return [{"$set": {"status": status.value}}, {"$unset": "resolved_at"}]
+
+
+def with_status(before: dict, status: IdeaStatus, changed_at: datetime) -> dict:
+    """
+    The idea as set_status() left it, given the document it returned.
+    """
+    after = {**before, "status": status.value}
+    if status == IdeaStatus.RESOLVED:
+        after["resolved_at"] = before.get("resolved_at") or changed_at
+    else:
+        after.pop("resolved_at", None)
+    return after
+
+
+async def set_signature(idea_id: str, title: str, description: str):
+    """
+    Store the duplicate-detection signature for this text, unless the idea
+    has been edited again in the meantime.
+    """
+    sig = signature(title, description)
+    if sig is None:
+        return
+    record(db.ideas, "update_one")
+    await db.ideas.update_one({"_id": object_id(idea_id), "title": title, "description": description}, {"$set": sig})
+
+
+async def apply_counters(idea_id: str, inc: dict) -> bool:
+    """
+    Add `inc` to the idea's counters and refresh its hot score; False when the idea does not exist.
+    """
+    oid = object_id(idea_id)
+    if oid is None:
+        return False
+    record(db.ideas, "update_one")
+    result = await db.ideas.update_one({"_id": oid}, counters_update(inc))
+    return result.matched_count == 1
+
+
+async def find_ideas(query: dict, projection: Optional[dict] = None, limit: int = 0) -> List[dict]:
+    record(db.ideas, "find")
+    return await db.ideas.find(query, projection).limit(limit).to_list(length=limit or None)
+
+
+async def claim_ideas(idea_ids: Iterable, claim: ObjectId) -> int:
+    """
+    Mark many ideas with `claim` in one update_many, so a later
+    delete_ideas() can be limited to them. A newer claim replaces an older
+    one. Returns how many were marked.
+    """
+    oids = object_ids(idea_ids)
+    if not oids:
+        return 0
+    record(db.ideas, "update_many")
+    result = await db.ideas.update_many({"_id": {"$in": oids}}, {"$set": {"claim": claim}})
+    return result.matched_count
+
+
+async def delete_ideas(idea_ids: Iterable, claim: Optional[ObjectId] = None) -> int:
+    """
+    Delete many ideas in one round trip, with a `claim` only those still
+    carrying it; their votes and comments are left to the caller. Returns
+    how many were deleted.
+    """
+    oids = object_ids(idea_ids)
+    if not oids:
+        return 0
+    query = {"_id": {"$in": oids}}
+    if claim is not None:
+        query["claim"] = claim
+    record(db.ideas, "delete_many")
+    result = await db.ideas.delete_many(query)
+    return result.deleted_count
+
+
+async def delete_idea(idea_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+    oid = object_id(idea_id)
+    if oid is None:
+        return None
+    record(db.ideas, "find_one_and_delete")
+    return await db.ideas.find_one_and_delete({"_id": oid}, projection=projection)
@@ -0,0 +1,76 @@
+# app/crud/crud_users.py
+#
+# Data access for users. Registration relies on the unique index on `email`
+# instead of checking for an existing account first.
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import db
+from app.crud.base import object_id, object_ids, record
+from app.models.user import UserCreate
+
+
+def new_user_document(user: UserCreate, hashed_password: str, created_at: Optional[datetime] = None) -> dict:
+    document = user.model_dump(exclude={"password"})
+    document["hashed_password"] = hashed_password
+    document["created_at"] = created_at or datetime.utcnow()
+    document["is_admin"] = False
+    return document
+
+
+async def create_user(document: dict) -> Optional[dict]:
+    """
+    Insert the user and return the document with its `id`, or None if the
+    email is already registered.
+    """
+    record(db.users, "insert_one")
+    try:
+        result = await db.users.insert_one(document)
+    except DuplicateKeyError:
+        return None
+    document["id"] = str(result.inserted_id)
+    return document
+
+
+async def get_user(user_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+    oid = object_id(user_id)
+    if oid is None:
+        return None
+    record(db.users, "find_one")
+    return await db.users.find_one({"_id": oid}, projection)
+
+
+async def get_user_by_email(email: str, projection: Optional[dict] = None) -> Optional[dict]:
+    record(db.users, "find_one")
+    return await db.users.find_one({"email": email}, projection)
+
+
+async def get_users(user_ids: Iterable[str], projection: Optional[dict] = None) -> Dict[str, dict]:
+    """
+    Several users in one query, keyed by id; missing ones are left out.
+    """
+    oids = object_ids(set(user_ids))
+    if not oids:
+        return {}
+    record(db.users, "find")
+    docs = await db.users.find({"_id": {"$in": oids}}, projection).to_list(length=len(oids))
+    return {str(doc["_id"]): doc for doc in docs}
+
+
+async def set_password_hash(user_id: str, hashed_password: str):
+    record(db.users, "update_one")
+    await db.users.update_one({"_id": object_id(user_id)}, {"$set": {"hashed_password": hashed_password}})
+
+
+async def delete_user(user_id: str) -> Optional[dict]:
+    """
+    Delete the user; returns its email, or None if there was no such user.
+    """
+    oid = object_id(user_id)
+    if oid is None:
+        return None
+    record(db.users, "find_one_and_delete")
+    return await db.users.find_one_and_delete({"_id": oid}, projection={"email": 1})
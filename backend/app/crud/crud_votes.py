@@ -0,0 +1,68 @@
+# app/crud/crud_votes.py
+#
+# Data access for votes; one document per (idea_id, user_id). The counter
+# bookkeeping built on top of these lives in app/services/votes.py.
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.core.database import db
+from app.crud.base import record
+
+
+async def upsert_vote(idea_id: str, user_id: str, vote_type: str) -> Optional[dict]:
+    """
+    Set the user's vote and return the previous one ({"vote_type": ...}), or None if they had not voted.
+    """
+    now = datetime.utcnow()
+    record(db.votes, "find_one_and_update")
+    return await db.votes.find_one_and_update(
+        {"idea_id": idea_id, "user_id": user_id},
+        {"$set": {"vote_type": vote_type, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+        projection={"vote_type": 1, "_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+
+
+async def restore_vote(idea_id: str, user_id: str, previous_type: Optional[str]):
+    """
+    Put a vote back to `previous_type` (None removes it).
+    """
+    if previous_type is None:
+        record(db.votes, "delete_one")
+        await db.votes.delete_one({"idea_id": idea_id, "user_id": user_id})
+    else:
+        record(db.votes, "update_one")
+        await db.votes.update_one({"idea_id": idea_id, "user_id": user_id}, {"$set": {"vote_type": previous_type}})
+
+
+async def delete_vote(idea_id: str, user_id: str) -> Optional[dict]:
+    record(db.votes, "find_one_and_delete")
+    return await db.votes.find_one_and_delete(
+        {"idea_id": idea_id, "user_id": user_id},
+        projection={"vote_type": 1, "_id": 0},
+    )
+
+
+async def embed_user_votes(ideas: List[dict], user_id: str):
+    """
+    Add the user's `my_vote` to a page of idea documents, one query for the whole page.
+    """
+    votes = await get_user_votes(user_id, [str(idea["_id"]) for idea in ideas])
+    for idea in ideas:
+        idea["my_vote"] = votes.get(str(idea["_id"]))
+
+
+async def get_user_votes(user_id: str, idea_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    The user's votes on the given ideas in one query, as idea_id -> vote_type.
+    """
+    idea_ids = list(set(idea_ids))
+    if not idea_ids:
+        return {}
+    record(db.votes, "find")
+    cursor = db.votes.find({"user_id": user_id, "idea_id": {"$in": idea_ids}}, {"idea_id": 1, "vote_type": 1, "_id": 0})
+    return {vote["idea_id"]: vote["vote_type"] async for vote in cursor}
@@ -1,5 +1,7 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -7,7 +9,20 @@ load_dotenv()
 
 from app.core.config import settings
 from app.core.database import startup_db_client, shutdown_db_client
-from app.api.endpoints import users, ideas, auth, admin, comments
+from app.core import metrics
+from app.core.hashing import password_hasher
+from app.core.indexes import index_registry
+from app.core.jobs import job_queue
+from app.core.principals import principal_cache
+from app.core.realtime import realtime_hub
+from app.core.response_cache import response_cache
+from app.services.geocoding import geocoder
+from app.services.migrations import enqueue_pending_migrations
+from app.services.tasks import recover_pending_geocodes
+from app.services.votes import vote_counter_buffer
+from app.api.deps import auth_cache_stats
+from app.api.endpoints import users, ideas, auth, admin, comments, realtime
+from app.crud.base import query_totals
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -17,9 +32,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Duplicate-Of", "Server-Timing"],
+)
+# Outermost, so the timings include CORS handling
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    server_timing=settings.SERVER_TIMING,
+    slow_seconds=settings.SLOW_REQUEST_MS / 1000,
+    long_lived_paths=("/api/realtime/",),
 )
 
+metrics.register_collector("response_cache", response_cache.stats)
+metrics.register_collector("password_hasher", password_hasher.stats)
+metrics.register_collector("vote_buffer", vote_counter_buffer.stats)
+metrics.register_collector("auth_cache", auth_cache_stats)
+metrics.register_collector("geocoder", geocoder.stats)
+metrics.register_collector("crud_queries", lambda: dict(query_totals))
+metrics.register_collector("realtime", realtime_hub.stats)
+metrics.register_collector("indexes", index_registry.stats)
+
 app.add_event_handler("startup", startup_db_client)
+app.add_event_handler("startup", index_registry.start)
+app.add_event_handler("startup", job_queue.start)
+app.add_event_handler("startup", recover_pending_geocodes)
+app.add_event_handler("startup", enqueue_pending_migrations)
+app.add_event_handler("startup", vote_counter_buffer.start)
+app.add_event_handler("startup", realtime_hub.start)
+app.add_event_handler("startup", principal_cache.start)
+app.add_event_handler("shutdown", realtime_hub.stop)
+app.add_event_handler("shutdown", principal_cache.stop)
+app.add_event_handler("shutdown", index_registry.stop)
+app.add_event_handler("shutdown", job_queue.stop)
+app.add_event_handler("shutdown", geocoder.close)
+app.add_event_handler("shutdown", password_hasher.shutdown)
+app.add_event_handler("shutdown", response_cache.close)
 app.add_event_handler("shutdown", shutdown_db_client)
 
 # Include routers
@@ -28,8 +74,16 @@ app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(ideas.router, prefix="/api/ideas", tags=["ideas"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(comments.router, prefix="/api/ideas/{idea_id}/comments", tags=["comments"])
+app.include_router(realtime.router, prefix="/api/realtime", tags=["realtime"])
 
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+# Prometheus scrape endpoint
+@app.get("/api/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics(authorization: Optional[str] = Header(None)):
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -1,9 +1,11 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
 
+from app.models.comment import Comment
+
 class IdeaCategory(str, Enum):
     WASTE = "waste"
     POTHOLES = "potholes"  
@@ -27,14 +29,6 @@ class IdeaBase(BaseModel):
 class IdeaCreate(IdeaBase):
     pass
 
-class IdeaUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
-    category: Optional[IdeaCategory] = None
-    location: str = ""
-    status: Optional[str] = None
-
-
 # Move IdeaStatus outside the Idea class
 class IdeaStatus(str, Enum):
     OPEN = "OPEN"
@@ -43,6 +37,13 @@ class IdeaStatus(str, Enum):
     WORK_IN_PROGRESS = "work_in_progress"
     RESOLVED = "resolved"
 
+class IdeaUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[IdeaCategory] = None
+    location: str = ""
+    status: Optional[IdeaStatus] = None
+
 class Idea(IdeaBase):
     title: str = Field(..., min_length=5, max_length=200)
     description: str = Field(..., min_length=10, max_length=2000)
@@ -53,9 +54,14 @@ class Idea(IdeaBase):
     creator_name: str
     status: IdeaStatus = IdeaStatus.READ
     vote_score: int = 0
+    upvotes: int = 0
+    downvotes: int = 0
+    comment_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    # True until the background geocoding job has resolved `location`
+    geocode_pending: bool = False
 
     class Config:
         populate_by_name = True
@@ -70,9 +76,79 @@ class Idea(IdeaBase):
                 "creator_name": "John Doe",
                 "status": "read",
                 "vote_score": 0,
+                "upvotes": 0,
+                "downvotes": 0,
+                "comment_count": 0,
                 "created_at": "2023-01-01T00:00:00",
                 "latitude": 40.785091,
                 "longitude": -73.968285
             }
         }
 
+# Most comments a listing embeds per idea
+MAX_COMMENT_PREVIEWS = 5
+
+class IdeaCard(Idea):
+    # Newest first; only filled when the listing was asked for comment previews
+    latest_comments: List[Comment] = []
+    # "upvote", "downvote" or None; only filled with include_my_vote
+    my_vote: Optional[str] = None
+
+class IdeaNearby(Idea):
+    # Distance in meters from the point the query was centered on
+    distance: float
+
+class IdeaSearchResult(Idea):
+    # Text index relevance; higher is better
+    score: float
+
+class IdeaSimilar(Idea):
+    # Estimated share of words in common (0-1) and distance in meters, if both are located
+    similarity: float
+    distance: Optional[float] = None
+
+class IdeaCluster(BaseModel):
+    cell: str
+    count: int
+    # Centroid of the ideas in the cell
+    latitude: float
+    longitude: float
+    categories: Dict[str, int] = {}
+    statuses: Dict[str, int] = {}
+
+class IdeaStats(BaseModel):
+    total: int
+    by_category: Dict[str, int] = {}
+    by_status: Dict[str, int] = {}
+    # New ideas per day ("2024-05-01") and ISO week ("2024-W18"), oldest first
+    by_day: Dict[str, int] = {}
+    by_week: Dict[str, int] = {}
+    resolved: int
+    # Estimated from a histogram of creation-to-resolution times
+    median_hours_to_resolve: Optional[float] = None
+
+# Most ideas one bulk moderation request touches
+MAX_BULK_IDEAS = 1000
+
+class IdeaFilter(BaseModel):
+    category: Optional[IdeaCategory] = None
+    status: Optional[IdeaStatus] = None
+    creator_id: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class BulkIdeaSelection(BaseModel):
+    # Either explicit ids or a filter; a filter matching more than
+    # MAX_BULK_IDEAS ideas is applied to the first ones only
+    ids: Optional[List[str]] = Field(None, max_length=MAX_BULK_IDEAS)
+    filter: Optional[IdeaFilter] = None
+
+class BulkStatusUpdate(BulkIdeaSelection):
+    status: IdeaStatus
+
+class BulkResult(BaseModel):
+    # Outcome per idea id: "updated", "unchanged", "deleted", "not_found" or "invalid_id"
+    results: Dict[str, str]
+    counts: Dict[str, int]
+    # The filter matched more ideas than one request handles; send it again for the rest
+    truncated: bool = False
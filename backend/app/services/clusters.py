@@ -0,0 +1,208 @@
+# app/services/clusters.py
+#
+# Per-cell idea counters for the zoomed-out map. Every idea with coordinates
+# contributes to one geohash cell per precision level; the counters are kept up
+# to date by the write endpoints so reading clusters never touches `ideas`.
+
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+from app.core.database import db
+from app.core.geo import BBox, bbox_polygon, geohash_center, geohash_encode
+
+# Precision of the geohash stored on each idea; coarser cells are its prefixes
+GEOHASH_PRECISION = 8
+CLUSTER_PRECISIONS = range(1, GEOHASH_PRECISION + 1)
+
+
+def idea_geohash(doc: dict) -> Optional[str]:
+    """
+    Geohash of an idea document, computed from its coordinates if not stored yet.
+    """
+    if doc.get("geohash"):
+        return doc["geohash"]
+    if doc.get("latitude") is None or doc.get("longitude") is None:
+        return None
+    return geohash_encode(doc["latitude"], doc["longitude"], GEOHASH_PRECISION)
+
+
+def zoom_to_precision(zoom: int) -> int:
+    """
+    Pick the geohash precision whose cells are a fraction of a map tile at `zoom`.
+    """
+    if zoom <= 2:
+        return 1
+    if zoom <= 4:
+        return 2
+    if zoom <= 7:
+        return 3
+    if zoom <= 9:
+        return 4
+    if zoom <= 12:
+        return 5
+    if zoom <= 14:
+        return 6
+    if zoom <= 16:
+        return 7
+    return 8
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+def _accumulate(deltas: dict, doc: dict, sign: int):
+    geohash = idea_geohash(doc)
+    if geohash is None:
+        return
+    category = _enum_value(doc.get("category"))
+    status = _enum_value(doc.get("status"))
+    for precision in CLUSTER_PRECISIONS:
+        inc = deltas[geohash[:precision]]
+        inc["count"] += sign
+        inc["lat_sum"] += sign * doc["latitude"]
+        inc["lng_sum"] += sign * doc["longitude"]
+        if category:
+            inc[f"categories.{category}"] += sign
+        if status:
+            inc[f"statuses.{status}"] += sign
+
+
+async def update_idea_cells(removed: Iterable[dict] = (), added: Iterable[dict] = ()):
+    """
+    Apply idea removals/additions to the cell counters in a single bulk_write.
+
+    Passing the same idea as removed (old version) and added (new version)
+    moves its category/status counts without touching the totals.
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+    for doc in removed:
+        _accumulate(deltas, doc, -1)
+    for doc in added:
+        _accumulate(deltas, doc, 1)
+
+    operations = []
+    for cell, inc in deltas.items():
+        inc = {field: value for field, value in inc.items() if value}
+        if not inc:
+            continue
+        for field, value in inc.items():
+            if field != "lat_sum" and field != "lng_sum":
+                inc[field] = int(value)
+        center_lat, center_lng = geohash_center(cell)
+        operations.append(UpdateOne(
+            {"_id": cell},
+            {
+                "$inc": inc,
+                "$setOnInsert": {
+                    "precision": len(cell),
+                    "center": {"type": "Point", "coordinates": [center_lng, center_lat]},
+                },
+            },
+            upsert=True,
+        ))
+    if operations:
+        await db.idea_cells.bulk_write(operations, ordered=False)
+
+
+async def read_clusters(precision: int, bbox: BBox) -> List[dict]:
+    """
+    Non-empty cells of the given precision whose center lies inside `bbox`.
+    """
+    cursor = db.idea_cells.find({
+        "precision": precision,
+        "center": {"$geoWithin": {"$geometry": bbox_polygon(bbox)}},
+        "count": {"$gt": 0},
+    })
+    clusters = []
+    async for cell in cursor:
+        count = cell["count"]
+        clusters.append({
+            "cell": cell["_id"],
+            "count": count,
+            "latitude": cell["lat_sum"] / count,
+            "longitude": cell["lng_sum"] / count,
+            "categories": {k: v for k, v in cell.get("categories", {}).items() if v > 0},
+            "statuses": {k: v for k, v in cell.get("statuses", {}).items() if v > 0},
+        })
+    return clusters
+
+
+async def rebuild_idea_cells():
+    """
+    Recompute every cell from the ideas collection.
+
+    Only needed to seed the counters for an existing database or to correct
+    drift; regular writes keep the cells current incrementally.
+    """
+    # Older ideas were stored without a geohash
+    operations = []
+    cursor = db.ideas.find(
+        {"geohash": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}},
+        {"latitude": 1, "longitude": 1},
+    )
+    async for doc in cursor:
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"geohash": idea_geohash(doc)}}))
+        if len(operations) >= 1000:
+            await db.ideas.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.ideas.bulk_write(operations, ordered=False)
+
+    # Overwrite cells in place rather than emptying the collection, so the
+    # map never reads a half-rebuilt state
+    rebuilt = set()
+    for precision in CLUSTER_PRECISIONS:
+        pipeline = [
+            {"$match": {"geohash": {"$type": "string"}}},
+            {"$group": {
+                "_id": {
+                    "cell": {"$substrCP": ["$geohash", 0, precision]},
+                    "category": "$category",
+                    "status": "$status",
+                },
+                "count": {"$sum": 1},
+                "lat_sum": {"$sum": "$latitude"},
+                "lng_sum": {"$sum": "$longitude"},
+            }},
+        ]
+        cells = defaultdict(lambda: defaultdict(float))
+        async for group in db.ideas.aggregate(pipeline):
+            key = group["_id"]
+            inc = cells[key["cell"]]
+            inc["count"] += group["count"]
+            inc["lat_sum"] += group["lat_sum"]
+            inc["lng_sum"] += group["lng_sum"]
+            inc[f"categories.{key['category']}"] += group["count"]
+            inc[f"statuses.{key['status']}"] += group["count"]
+
+        operations = []
+        for cell, inc in cells.items():
+            center_lat, center_lng = geohash_center(cell)
+            document = {
+                "precision": precision,
+                "center": {"type": "Point", "coordinates": [center_lng, center_lat]},
+                "categories": {},
+                "statuses": {},
+            }
+            for field, value in inc.items():
+                if "." in field:
+                    group, name = field.split(".", 1)
+                    document[group][name] = int(value)
+                elif field == "count":
+                    document[field] = int(value)
+                else:
+                    document[field] = value
+            rebuilt.add(cell)
+            operations.append(UpdateOne({"_id": cell}, {"$set": document}, upsert=True))
+        for start in range(0, len(operations), 1000):
+            await db.idea_cells.bulk_write(operations[start:start + 1000], ordered=False)
+
+    operations = []
+    async for doc in db.idea_cells.find({}, {"_id": 1}):
+        if doc["_id"] not in rebuilt:
+            operations.append(DeleteOne({"_id": doc["_id"]}))
+    for start in range(0, len(operations), 1000):
+        await db.idea_cells.bulk_write(operations[start:start + 1000], ordered=False)
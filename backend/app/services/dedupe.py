@@ -0,0 +1,145 @@
+# app/services/dedupe.py
+#
+# Near-duplicate detection for new reports. Each idea stores a MinHash
+# signature of the words in its title and description, and the signature cut
+# into LSH bands. Two reports sharing any band are candidates; the multikey
+# index on `lsh_bands` makes finding them an indexed lookup instead of a scan.
+# Candidates are then confirmed by estimated Jaccard similarity and, when both
+# reports have coordinates, by distance.
+
+import hashlib
+import math
+import random
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.search import tokenize
+
+# 16 bands of 3 rows: pairs at 0.5 similarity share a band ~88% of the time, at 0.1 under 2%
+NUM_PERMUTATIONS = 48
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+STOP_WORDS = {
+    "the", "and", "for", "near", "with", "this", "that", "there", "from", "have", "has",
+    "are", "was", "were", "not", "but", "our", "its", "very", "please", "on", "in", "at",
+    "of", "to", "is", "it", "a", "an", "by", "be", "we", "so",
+}
+
+EARTH_RADIUS_M = 6378100
+
+
+def _shingles(title: str, description: str) -> set:
+    words = set()
+    for token in tokenize(f"{title} {description}"):
+        if token in STOP_WORDS:
+            continue
+        # Cheap plural folding so "potholes" and "pothole" count as the same word
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        words.add(token)
+    return words
+
+
+def _hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") & _PRIME
+
+
+def signature(title: str, description: str) -> Optional[dict]:
+    """
+    MinHash signature and LSH band keys for a report, or None if it has no usable words.
+    """
+    hashes = [_hash(s) for s in _shingles(title, description)]
+    if not hashes:
+        return None
+    minhash = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    bands = []
+    for band in range(BANDS):
+        rows = minhash[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr(rows).encode(), digest_size=6).hexdigest()
+        bands.append(f"{band}:{digest}")
+    return {"minhash": minhash, "lsh_bands": bands}
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    h = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+async def find_similar(
+    title: str,
+    description: str,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    limit: int = 5,
+) -> List[dict]:
+    """
+    Open ideas that look like the same report, best match first. Each
+    returned document carries `similarity` and, when known, `distance`.
+    """
+    sig = signature(title, description)
+    if sig is None:
+        return []
+
+    query = {"lsh_bands": {"$in": sig["lsh_bands"]}, "status": {"$ne": "resolved"}}
+    has_point = latitude is not None and longitude is not None
+    if has_point:
+        radius = settings.DEDUPE_RADIUS_M / EARTH_RADIUS_M
+        query["$or"] = [
+            {"geo": {"$geoWithin": {"$centerSphere": [[longitude, latitude], radius]}}},
+            # Ideas still waiting for geocoding are matched on text alone
+            {"geo": {"$exists": False}},
+        ]
+
+    matches = []
+    async for doc in db.ideas.find(query).limit(settings.DEDUPE_MAX_CANDIDATES):
+        score = similarity(sig["minhash"], doc.get("minhash"))
+        distance = None
+        if has_point and doc.get("latitude") is not None and doc.get("longitude") is not None:
+            distance = distance_m(latitude, longitude, doc["latitude"], doc["longitude"])
+        # Without a distance to confirm it, the text has to match much more closely
+        threshold = settings.DEDUPE_SIMILARITY if distance is not None else settings.DEDUPE_TEXT_ONLY_SIMILARITY
+        if score < threshold:
+            continue
+        doc["similarity"] = score
+        doc["distance"] = distance
+        matches.append(doc)
+
+    matches.sort(key=lambda d: (-d["similarity"], d["distance"] if d["distance"] is not None else math.inf))
+    return matches[:limit]
+
+
+async def backfill_signatures(batch_size: int = 500):
+    """
+    Compute signatures for ideas stored before duplicate detection existed.
+    """
+    operations = []
+    cursor = db.ideas.find({"minhash": {"$exists": False}}, {"title": 1, "description": 1}).batch_size(batch_size)
+    async for idea in cursor:
+        sig = signature(idea.get("title", ""), idea.get("description", ""))
+        if sig is None:
+            continue
+        operations.append(UpdateOne({"_id": idea["_id"]}, {"$set": sig}))
+        if len(operations) >= batch_size:
+            await db.ideas.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.ideas.bulk_write(operations, ordered=False)
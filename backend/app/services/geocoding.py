@@ -0,0 +1,210 @@
+# app/services/geocoding.py
+#
+# Geocoding of free-text locations through Nominatim (or any service speaking
+# its /search API). Lookups go through an in-process LRU, then the persistent
+# `geocode_cache` collection, and only then over the network, using a single
+# pooled HTTP client that honours Nominatim's one-request-per-second policy.
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.core.database import db
+from app.core.metrics import outbound
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_location(location: str) -> str:
+    """
+    Cache key for a location string: case and whitespace insensitive.
+    """
+    return " ".join(location.lower().split()).strip(" ,.;")
+
+
+class RateLimiter:
+    """
+    Spaces calls at least `min_interval` seconds apart.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._last + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+
+
+class GeocodingService:
+    def __init__(
+        self,
+        base_url: str,
+        user_agent: str,
+        cache_ttl: float,
+        negative_cache_ttl: float,
+        lru_size: int,
+        min_interval: float,
+        timeout: float,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.user_agent = user_agent
+        self.cache_ttl = cache_ttl
+        self.negative_cache_ttl = negative_cache_ttl
+        self.timeout = timeout
+        self.transport = transport
+        self.rate_limiter = RateLimiter(min_interval)
+        # normalized location -> coordinates dict, or None for "not found"
+        self.lru = TTLCache(maxsize=lru_size, ttl=cache_ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.upstream_requests = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": self.user_agent},
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def geocode(self, location: str, strict: bool = False) -> Optional[dict]:
+        """
+        Return {"latitude", "longitude"} for a location, or None if it cannot be resolved.
+
+        Transport and upstream errors are logged and reported as None unless
+        `strict` is set, in which case they propagate so the caller can retry.
+        """
+        key = normalize_location(location or "")
+        if not key:
+            return None
+
+        cached = self.lru.get(key)
+        if cached is not MISSING:
+            return cached
+
+        try:
+            return await self._single_flight(key)
+        except (httpx.HTTPError, ValueError) as e:
+            if strict:
+                raise
+            logger.warning("Geocoding %r failed: %s", key, e)
+            return None
+
+    def stats(self) -> dict:
+        return {"upstream_requests": self.upstream_requests, "inflight": len(self._inflight), "lru": self.lru.stats()}
+
+    def peek(self, location: str) -> Optional[dict]:
+        """
+        In-process cache lookup only; never waits on the database or the network.
+        """
+        cached = self.lru.get(normalize_location(location or ""))
+        return None if cached is MISSING else cached
+
+    async def _single_flight(self, key: str) -> Optional[dict]:
+        # Concurrent lookups of the same string share one resolution
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._resolve(key)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; make sure the exception is marked as retrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _resolve(self, key: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        stored = await db.geocode_cache.find_one({"_id": key, "expires_at": {"$gt": now}})
+        if stored is not None:
+            result = self._result(stored)
+            self.lru.set(key, result, ttl=(stored["expires_at"] - now).total_seconds())
+            return result
+
+        # Transient failures raise out of here and are not cached
+        result = await self._fetch(key)
+        ttl = self.cache_ttl if result else self.negative_cache_ttl
+        self.lru.set(key, result, ttl=ttl)
+        await db.geocode_cache.update_one(
+            {"_id": key},
+            {"$set": {
+                "found": result is not None,
+                "latitude": result["latitude"] if result else None,
+                "longitude": result["longitude"] if result else None,
+                "expires_at": now + timedelta(seconds=ttl),
+            }},
+            upsert=True,
+        )
+        return result
+
+    async def _fetch(self, key: str) -> Optional[dict]:
+        await self.rate_limiter.wait()
+        self.upstream_requests += 1
+        with outbound("geocoder") as call:
+            response = await self.client.get(self.base_url, params={"q": key, "format": "json", "limit": 1})
+            call["outcome"] = response.status_code
+        response.raise_for_status()
+        return self._parse(response.json())
+
+    @staticmethod
+    def _parse(data) -> Optional[dict]:
+        """
+        Coordinates of the first match in a /search response body. Raises
+        ValueError if the body is not a list of places with coordinates.
+        """
+        if not isinstance(data, list):
+            raise ValueError(f"Unexpected geocoder response: {type(data).__name__}")
+        if not data:
+            return None
+        try:
+            latitude, longitude = float(data[0]["lat"]), float(data[0]["lon"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Unexpected geocoder result: {data[0]!r:.200}") from e
+        # Also rejects nan
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f"Geocoder returned coordinates out of range: {latitude}, {longitude}")
+        return {"latitude": latitude, "longitude": longitude}
+
+    @staticmethod
+    def _result(stored: dict) -> Optional[dict]:
+        if not stored.get("found"):
+            return None
+        return {"latitude": stored["latitude"], "longitude": stored["longitude"]}
+
+
+geocoder = GeocodingService(
+    base_url=settings.GEOCODER_URL,
+    user_agent=settings.GEOCODER_USER_AGENT,
+    cache_ttl=settings.GEOCODE_CACHE_TTL_SECONDS,
+    negative_cache_ttl=settings.GEOCODE_NEGATIVE_CACHE_TTL_SECONDS,
+    lru_size=settings.GEOCODE_LRU_SIZE,
+    # Each worker process spaces its own requests, so together they stay within the interval
+    min_interval=settings.GEOCODER_MIN_INTERVAL_SECONDS * max(settings.SERVER_WORKERS, 1),
+    timeout=settings.GEOCODER_TIMEOUT_SECONDS,
+)
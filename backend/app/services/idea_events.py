@@ -0,0 +1,51 @@
+# app/services/idea_events.py
+#
+# What the write paths tell the realtime hub. New ideas and comments are
+# published as they happen; counter and status changes only mark the idea,
+# and the hub reloads all marked ideas with one query per interval.
+
+from typing import List
+
+from app.core.realtime import Event, make_event, realtime_hub
+from app.core.serialization import adapter, mongo_projection
+from app.crud import crud_ideas
+from app.models.comment import Comment
+from app.models.idea import Idea
+
+
+def _idea_event(event_type: str, doc: dict) -> Event:
+    idea = adapter(Idea).validate_python(doc)
+    point = None
+    if idea.latitude is not None and idea.longitude is not None:
+        point = (idea.latitude, idea.longitude)
+    topics = (f"idea:{idea.id}", f"category:{idea.category.value}")
+    if event_type == "idea.created":
+        topics += ("ideas",)
+    return make_event(event_type, {"idea": idea.model_dump(mode="json")}, topics, point)
+
+
+def publish_idea_created(doc: dict):
+    realtime_hub.publish(_idea_event("idea.created", doc))
+
+
+def publish_comment_created(doc: dict):
+    comment = adapter(Comment).validate_python(doc)
+    realtime_hub.publish(make_event("comment.created", {"comment": comment.model_dump(mode="json")}, (f"idea:{comment.idea_id}",)))
+    # The idea's comment_count moved too
+    realtime_hub.mark(comment.idea_id)
+
+
+def publish_idea_deleted(idea_id: str, category: str):
+    realtime_hub.publish(make_event("idea.deleted", {"idea_id": idea_id}, (f"idea:{idea_id}", f"category:{category}")))
+
+
+def mark_ideas_changed(*idea_ids: str):
+    realtime_hub.mark(*idea_ids)
+
+
+async def load_idea_updates(idea_ids: List[str]) -> List[Event]:
+    docs = await crud_ideas.get_ideas(idea_ids, mongo_projection(Idea))
+    return [_idea_event("idea.updated", doc) for doc in docs.values()]
+
+
+realtime_hub.set_loader(load_idea_updates)
@@ -0,0 +1,67 @@
+# app/services/migrations.py
+#
+# One-off data migrations for databases that predate a feature. They scan
+# the ideas collection, so they run as background jobs rather than in the
+# startup of every worker, and each runs once per database: a finished
+# migration leaves a marker in `migrations`, and startup only enqueues the
+# ones without one. A database without ideas has nothing to migrate, so its
+# migrations are marked done straight away.
+
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+
+from app.core.database import db
+from app.core.jobs import job_queue
+from app.services.clusters import rebuild_idea_cells
+from app.services.dedupe import backfill_signatures
+from app.services.search import rebuild_search_terms
+from app.services.stats import rebuild_idea_stats
+
+
+async def backfill_geo_points():
+    """
+    Ideas created before the GeoJSON point existed only have latitude/longitude.
+    """
+    await db.ideas.update_many(
+        {
+            "geo": {"$exists": False},
+            "latitude": {"$type": "number"},
+            "longitude": {"$type": "number"},
+        },
+        [{"$set": {"geo": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+    )
+
+
+MIGRATIONS: Dict[str, Callable[[], Awaitable[None]]] = {
+    "geo_points": backfill_geo_points,
+    # Query expansion vocabulary
+    "search_terms": rebuild_search_terms,
+    # Near-duplicate detection signatures
+    "dedupe_signatures": backfill_signatures,
+    # Admin dashboard counters
+    "idea_stats": rebuild_idea_stats,
+    # Map cluster counters
+    "idea_cells": rebuild_idea_cells,
+}
+
+
+async def _mark_done(name: str):
+    await db.migrations.update_one({"_id": name}, {"$set": {"done_at": datetime.utcnow()}}, upsert=True)
+
+
+async def enqueue_pending_migrations():
+    done = {doc["_id"] async for doc in db.migrations.find({}, {"_id": 1})}
+    pending = [name for name in MIGRATIONS if name not in done]
+    if not pending:
+        return
+    if await db.ideas.estimated_document_count() == 0:
+        for name in pending:
+            await _mark_done(name)
+        return
+    for name in pending:
+        await job_queue.enqueue("run_migration", {"name": name}, key=f"migration:{name}")
+
+
+async def run_migration(name: str):
+    await MIGRATIONS[name]()
+    await _mark_done(name)
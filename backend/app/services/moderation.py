@@ -0,0 +1,163 @@
+# app/services/moderation.py
+#
+# Bulk status changes and deletions behind the admin moderation endpoints.
+# Ideas are picked by id or by filter, and however many there are a pass
+# costs one find, one update_many (a deletion also claims the ideas and reads
+# them back before its delete_many) and one bulk_write per counter
+# collection; the votes and comments of deleted ideas go in one delete_many
+# each from a background job.
+#
+# The counters are moved from the documents read before the write, so an
+# idea changed by someone else in between can leave them slightly off until
+# the periodic rebuilds correct them. A deletion that loses ideas to another
+# one while it runs cannot tell which ones it deleted, and has the counters
+# rebuilt instead of moving them.
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.core.jobs import job_queue
+from app.core.response_cache import IDEA_LISTS, comments_tag, idea_tag, response_cache
+from app.crud import crud_ideas
+from app.models.idea import MAX_BULK_IDEAS, BulkIdeaSelection, IdeaFilter, IdeaStatus
+from app.services.clusters import update_idea_cells
+from app.services.idea_events import mark_ideas_changed, publish_idea_deleted
+from app.services.search import TEXT_FIELDS, TEXT_PROJECTION, update_search_terms
+from app.services.stats import STATS_FIELDS, update_idea_stats
+from app.services.tasks import CELL_FIELDS
+from app.services.votes import vote_counter_buffer
+
+logger = logging.getLogger(__name__)
+
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+DELETED = "deleted"
+NOT_FOUND = "not_found"
+INVALID_ID = "invalid_id"
+
+
+def filter_query(idea_filter: IdeaFilter) -> dict:
+    query = {}
+    if idea_filter.category:
+        query["category"] = idea_filter.category.value
+    if idea_filter.status:
+        query["status"] = idea_filter.status.value
+    if idea_filter.creator_id:
+        query["creator_id"] = idea_filter.creator_id
+    created = {}
+    if idea_filter.created_from:
+        created["$gte"] = idea_filter.created_from
+    if idea_filter.created_to:
+        created["$lt"] = idea_filter.created_to
+    if created:
+        query["created_at"] = created
+    return query
+
+
+async def _select(selection: BulkIdeaSelection, exclude_status: Optional[IdeaStatus] = None) -> Tuple[List[dict], Dict[str, str], bool]:
+    """
+    The selected ideas (with the counter fields), the results already known
+    (ids that are malformed or match nothing) and whether a filter matched
+    more than MAX_BULK_IDEAS ideas.
+
+    Raises ValueError unless exactly one of ids and a non-empty filter is given.
+    """
+    if (selection.ids is None) == (selection.filter is None):
+        raise ValueError("Give either ids or a filter")
+    projection = {**CELL_FIELDS, **STATS_FIELDS}
+
+    if selection.ids is not None:
+        results = {}
+        for idea_id in selection.ids:
+            results[idea_id] = NOT_FOUND if ObjectId.is_valid(idea_id) else INVALID_ID
+        oids = [ObjectId(idea_id) for idea_id, result in results.items() if result == NOT_FOUND]
+        ideas = await crud_ideas.find_ideas({"_id": {"$in": oids}}, projection) if oids else []
+        return ideas, results, False
+
+    query = filter_query(selection.filter)
+    if not query:
+        raise ValueError("The filter must have at least one condition")
+    if exclude_status is not None and "status" not in query:
+        # Ideas already done are skipped, so repeating a truncated pass reaches the rest
+        query["status"] = {"$ne": exclude_status.value}
+    ideas = await crud_ideas.find_ideas(query, projection, limit=MAX_BULK_IDEAS + 1)
+    return ideas[:MAX_BULK_IDEAS], {}, len(ideas) > MAX_BULK_IDEAS
+
+
+async def bulk_set_status(selection: BulkIdeaSelection, status: IdeaStatus) -> Tuple[Dict[str, str], bool]:
+    """
+    Move the selected ideas to `status`. Returns the outcome per id and
+    whether the filter was truncated.
+    """
+    changed_at = datetime.utcnow()
+    ideas, results, truncated = await _select(selection, exclude_status=status)
+
+    changed = [idea for idea in ideas if idea.get("status") != status.value]
+    for idea in ideas:
+        results[str(idea["_id"])] = UNCHANGED
+    if changed:
+        await crud_ideas.set_status_many([idea["_id"] for idea in changed], status, changed_at)
+        updated = [crud_ideas.with_status(idea, status, changed_at) for idea in changed]
+        await update_idea_cells(removed=changed, added=updated)
+        await update_idea_stats(removed=changed, added=updated)
+
+        idea_ids = [str(idea["_id"]) for idea in changed]
+        await response_cache.invalidate(IDEA_LISTS, *[idea_tag(idea_id) for idea_id in idea_ids])
+        mark_ideas_changed(*idea_ids)
+        for idea_id in idea_ids:
+            results[idea_id] = UPDATED
+    return results, truncated
+
+
+async def bulk_delete(selection: BulkIdeaSelection) -> Tuple[Dict[str, str], bool]:
+    """
+    Delete the selected ideas. Their votes, comments and map counters are
+    cleaned up by a background job. Returns the outcome per id and whether
+    the filter was truncated.
+    """
+    ideas, results, truncated = await _select(selection)
+    if not ideas:
+        return results, truncated
+
+    # Ideas deleted by someone else since the find are not claimed, and ones
+    # deleted or claimed by someone else after the claim are not deleted here
+    claim = ObjectId()
+    oids = [idea["_id"] for idea in ideas]
+    await crud_ideas.claim_ideas(oids, claim)
+    projection = {**CELL_FIELDS, **STATS_FIELDS, **TEXT_PROJECTION}
+    ideas = await crud_ideas.find_ideas({"_id": {"$in": oids}, "claim": claim}, projection)
+    if not ideas:
+        return results, truncated
+    idea_ids = [str(idea["_id"]) for idea in ideas]
+    deleted = await crud_ideas.delete_ideas(idea_ids, claim=claim)
+    # The ideas this pass did not delete were deleted, or claimed for
+    # deletion, by someone else who moves their counters; which ones those
+    # are cannot be told, so the counters are rebuilt
+    exact = deleted == len(ideas)
+    if exact:
+        await update_idea_stats(removed=ideas)
+        await update_search_terms(removed=ideas)
+    else:
+        logger.warning("Bulk delete lost %d of %d ideas to another deletion, rebuilding counters", len(ideas) - deleted, len(ideas))
+        for job_type in ("rebuild_idea_stats", "rebuild_search_terms", "rebuild_idea_cells"):
+            await job_queue.enqueue(job_type, {})
+
+    tags = [IDEA_LISTS]
+    for idea_id, idea in zip(idea_ids, ideas):
+        vote_counter_buffer.forget(idea_id)
+        publish_idea_deleted(idea_id, idea.get("category"))
+        tags += [idea_tag(idea_id), comments_tag(idea_id)]
+        results[idea_id] = DELETED
+    await response_cache.invalidate(*tags)
+
+    for idea_id, idea in zip(idea_ids, ideas):
+        idea["id"] = idea_id
+        del idea["_id"]
+        # The cleanup job only needs the counter fields
+        for field in TEXT_FIELDS:
+            idea.pop(field, None)
+    await job_queue.enqueue("delete_ideas_content", {"ideas": ideas, "counters": exact})
+    return results, truncated
@@ -0,0 +1,86 @@
+# app/services/ranking.py
+#
+# "Hot" ranking of ideas. Each idea stores a `hot_score`:
+#
+#     (vote_score + HOT_COMMENT_WEIGHT * comment_count) / (age_hours + 2) ** HOT_GRAVITY
+#
+# It is recomputed server side, in the same update that changes the vote or
+# comment counters, and re-decayed for recent ideas by a periodic bulk update,
+# so the hot feed is a plain index range scan on `hot_score`.
+
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.response_cache import IDEAS, idea_tag, ranking_tag, response_cache
+
+
+def hot_score_expr() -> dict:
+    """
+    Aggregation expression computing an idea's hot score at $$NOW.
+    """
+    points = {"$add": [
+        {"$ifNull": ["$vote_score", 0]},
+        {"$multiply": [settings.HOT_COMMENT_WEIGHT, {"$ifNull": ["$comment_count", 0]}]},
+    ]}
+    age_hours = {"$divide": [{"$subtract": ["$$NOW", "$created_at"]}, 3600 * 1000]}
+    return {"$divide": [points, {"$pow": [{"$add": [{"$max": [age_hours, 0]}, 2]}, settings.HOT_GRAVITY]}]}
+
+
+def counters_update(inc: dict) -> list:
+    """
+    Pipeline update equivalent to {"$inc": inc} that also refreshes hot_score.
+    """
+    return [
+        {"$set": {field: {"$add": [{"$ifNull": [f"${field}", 0]}, value]} for field, value in inc.items()}},
+        {"$set": {"hot_score": hot_score_expr()}},
+    ]
+
+
+async def redecay_hot_scores():
+    """
+    Recompute hot_score for ideas still young enough for their rank to move,
+    plus any idea that has never been scored. Older scores are already close
+    to zero and stay where they are.
+    """
+    window_start = datetime.utcnow() - timedelta(days=settings.HOT_WINDOW_DAYS)
+    await db.ideas.update_many(
+        {"$or": [{"created_at": {"$gte": window_start}}, {"hot_score": {"$exists": False}}]},
+        [{"$set": {"hot_score": hot_score_expr()}}],
+    )
+    await response_cache.invalidate(ranking_tag("hot"))
+
+
+async def reconcile_comment_counts(idea_ids: Optional[Iterable[str]] = None):
+    """
+    Recompute comment_count (and hot_score) from the comments collection.
+    """
+    match = {}
+    if idea_ids is not None:
+        match = {"_id": {"$in": [ObjectId(idea_id) for idea_id in idea_ids]}}
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {"vote_score": 1, "created_at": 1}},
+        {"$lookup": {
+            "from": "comments",
+            "let": {"idea_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$idea_id", "$$idea_id"]}}},
+                {"$count": "n"},
+            ],
+            "as": "tally",
+        }},
+        {"$set": {"comment_count": {"$ifNull": [{"$first": "$tally.n"}, 0]}}},
+        {"$set": {"hot_score": hot_score_expr()}},
+        {"$project": {"comment_count": 1, "hot_score": 1}},
+        {"$merge": {"into": "ideas", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+    await db.ideas.aggregate(pipeline).to_list(length=None)
+    if idea_ids is None:
+        await response_cache.invalidate(IDEAS)
+    else:
+        await response_cache.invalidate(*[idea_tag(idea_id) for idea_id in idea_ids], ranking_tag("hot"))
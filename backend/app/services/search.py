@@ -0,0 +1,190 @@
+# app/services/search.py
+#
+# Full-text search over ideas. Ranking comes from a weighted Mongo text index
+# on title, location and description. Because the text index only matches
+# whole (stemmed) words, query words are first expanded against the
+# `search_terms` vocabulary: every word that appears in an idea, stored with
+# its single-character deletions. That makes "Mah" find "Mahatma" (prefix)
+# and "Gandi" find "Gandhi" (one edit), using indexed lookups only. Each
+# term counts the ideas containing it (df); writes apply the difference
+# between an idea's old and new words, and terms no idea uses any more are
+# dropped.
+
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from pymongo import DeleteOne, UpdateOne
+
+from app.core.database import db
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Shorter words are matched exactly; typo expansion on them is mostly noise
+MIN_FUZZY_LENGTH = 4
+MIN_PREFIX_LENGTH = 3
+MAX_EXPANSIONS_PER_WORD = 8
+
+TEXT_FIELDS = ("title", "description", "location")
+# Fields of an idea document the vocabulary depends on
+TEXT_PROJECTION = {field: 1 for field in TEXT_FIELDS}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall((text or "").lower()) if len(token) >= 2]
+
+
+def deletions(term: str) -> Set[str]:
+    """
+    Every string obtained by removing one character from `term`.
+    """
+    if len(term) < MIN_FUZZY_LENGTH:
+        return set()
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def idea_terms(doc: dict) -> Set[str]:
+    terms = set()
+    for field in TEXT_FIELDS:
+        terms.update(tokenize(doc.get(field) or ""))
+    return terms
+
+
+async def _apply_term_deltas(deltas: Counter):
+    operations = [
+        UpdateOne(
+            {"_id": term},
+            {"$setOnInsert": {"deletes": sorted(deletions(term))}, "$inc": {"df": delta}},
+            upsert=True,
+        )
+        for term, delta in deltas.items()
+        if delta
+    ]
+    if not operations:
+        return
+    await db.search_terms.bulk_write(operations, ordered=False)
+    decremented = [term for term, delta in deltas.items() if delta < 0]
+    if decremented:
+        await db.search_terms.delete_many({"_id": {"$in": decremented}, "df": {"$lte": 0}})
+
+
+async def update_search_terms(removed: Iterable[dict] = (), added: Iterable[dict] = ()):
+    """
+    Apply idea removals/additions to the vocabulary in a single bulk_write.
+    Documents need the TEXT_FIELDS; pass the old and new version of an
+    edited idea.
+    """
+    deltas: Counter = Counter()
+    for doc in removed:
+        deltas.subtract(idea_terms(doc))
+    for doc in added:
+        deltas.update(idea_terms(doc))
+    await _apply_term_deltas(deltas)
+
+
+async def rebuild_search_terms(batch_size: int = 1000):
+    """
+    Recount the vocabulary from every idea; seeds an existing database and
+    periodically corrects drift from concurrent edits.
+    """
+    df: Counter = Counter()
+    async for idea in db.ideas.find({}, TEXT_PROJECTION).batch_size(batch_size):
+        df.update(idea_terms(idea))
+
+    # Overwrite counts in place rather than emptying the collection, so
+    # query expansion never reads a half-rebuilt vocabulary
+    operations = [
+        UpdateOne(
+            {"_id": term},
+            {"$setOnInsert": {"deletes": sorted(deletions(term))}, "$set": {"df": count}},
+            upsert=True,
+        )
+        for term, count in df.items()
+    ]
+    async for doc in db.search_terms.find({}, {"_id": 1}):
+        if doc["_id"] not in df:
+            operations.append(DeleteOne({"_id": doc["_id"]}))
+    for start in range(0, len(operations), batch_size):
+        await db.search_terms.bulk_write(operations[start:start + batch_size], ordered=False)
+
+
+def _matches(word: str, term: str, term_deletes: Set[str]) -> bool:
+    if term.startswith(word) and len(word) >= MIN_PREFIX_LENGTH:
+        return True
+    word_deletes = deletions(word)
+    return word in term_deletes or term in word_deletes or bool(word_deletes & term_deletes)
+
+
+async def expand_query(q: str) -> List[str]:
+    """
+    The query words plus vocabulary words that extend them or are one edit away,
+    resolved with a single query on `search_terms`.
+    """
+    words = list(dict.fromkeys(tokenize(q)))
+    if not words:
+        return []
+
+    conditions = []
+    for word in words:
+        word_deletes = sorted(deletions(word))
+        if len(word) >= MIN_PREFIX_LENGTH:
+            conditions.append({"_id": {"$gte": word, "$lt": word + "\uffff"}})
+        if word_deletes:
+            conditions.append({"_id": {"$in": word_deletes}})
+            conditions.append({"deletes": {"$in": [word] + word_deletes}})
+
+    expanded = {word: [word] for word in words}
+    if conditions:
+        cursor = db.search_terms.find({"$or": conditions}, {"deletes": 1, "df": 1}).sort("df", -1).limit(
+            MAX_EXPANSIONS_PER_WORD * len(words) * 4
+        )
+        async for term in cursor:
+            term_deletes = set(term.get("deletes", []))
+            for word in words:
+                if term["_id"] != word and len(expanded[word]) <= MAX_EXPANSIONS_PER_WORD and _matches(word, term["_id"], term_deletes):
+                    expanded[word].append(term["_id"])
+
+    return list(dict.fromkeys(term for terms in expanded.values() for term in terms))
+
+
+def search_filters(
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> dict:
+    query = {}
+    if category:
+        query["category"] = category
+    if status:
+        query["status"] = status
+    created = {}
+    if created_from:
+        created["$gte"] = created_from
+    if created_to:
+        created["$lt"] = created_to
+    if created:
+        query["created_at"] = created
+    return query
+
+
+def search_pipeline(terms: List[str], filters: dict, after: Optional[tuple], limit: int) -> list:
+    """
+    Aggregation returning one page of ideas ordered by relevance, then `_id`.
+    `after` is the (score, _id) of the last result of the previous page.
+    """
+    pipeline = [
+        {"$match": {"$text": {"$search": " ".join(terms)}, **filters}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if after is not None:
+        score, last_id = after
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "_id": {"$lt": last_id}},
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit},
+    ]
+    return pipeline
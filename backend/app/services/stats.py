@@ -0,0 +1,202 @@
+# app/services/stats.py
+#
+# Counters behind GET /api/admin/stats. Each document of `idea_stats` counts
+# the ideas sharing one value of a dimension - "category:waste",
+# "status:resolved", "day:2024-05-01", "week:2024-W18" or "total" - and
+# "resolve_hours:<n>" documents form a histogram of how long resolved ideas
+# took, from which the median is estimated. Like the map cell counters, the
+# write endpoints keep them current with deltas, so the dashboard reads a few
+# hundred small documents however many ideas there are; a periodic rebuild
+# from `ideas` corrects any drift.
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+from app.core.database import db
+
+# Fields of an idea document the counters depend on
+STATS_FIELDS = {"category": 1, "status": 1, "created_at": 1, "resolved_at": 1}
+
+RESOLVED = "resolved"
+# Lower bounds (hours) of the time-to-resolve buckets; the last one is open ended
+RESOLVE_BUCKET_HOURS = (0, 1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 240, 336, 504, 720, 1440, 2160, 4320, 8760)
+
+DAY_FORMAT = "%Y-%m-%d"
+# ISO year and week, the same as $dateToString's "%G-W%V"
+WEEK_FORMAT = "%G-W%V"
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+def resolve_hours(doc: dict) -> Optional[float]:
+    """
+    Hours from creation to resolution of a resolved idea, else None.
+    """
+    if _enum_value(doc.get("status")) != RESOLVED:
+        return None
+    resolved_at, created_at = doc.get("resolved_at"), doc.get("created_at")
+    if not isinstance(resolved_at, datetime) or not isinstance(created_at, datetime):
+        return None
+    return max(0.0, (resolved_at - created_at).total_seconds() / 3600)
+
+
+def resolve_bucket(hours: float):
+    return RESOLVE_BUCKET_HOURS[bisect_right(RESOLVE_BUCKET_HOURS, hours) - 1]
+
+
+def _stat_keys(doc: dict) -> List[tuple]:
+    keys = [("total", "all")]
+    category = _enum_value(doc.get("category"))
+    if category:
+        keys.append(("category", category))
+    status = _enum_value(doc.get("status"))
+    if status:
+        keys.append(("status", status))
+    created_at = doc.get("created_at")
+    if isinstance(created_at, datetime):
+        keys.append(("day", created_at.strftime(DAY_FORMAT)))
+        keys.append(("week", created_at.strftime(WEEK_FORMAT)))
+    hours = resolve_hours(doc)
+    if hours is not None:
+        keys.append(("resolve_hours", resolve_bucket(hours)))
+    return keys
+
+
+def _stat_id(kind: str, key) -> str:
+    return kind if kind == "total" else f"{kind}:{key}"
+
+
+async def update_idea_stats(removed: Iterable[dict] = (), added: Iterable[dict] = ()):
+    """
+    Apply idea removals/additions to the counters in a single bulk_write.
+    Documents need the STATS_FIELDS; pass the old and new version of an
+    idea to move it between categories or statuses.
+    """
+    deltas: Dict[tuple, int] = defaultdict(int)
+    for doc in removed:
+        for key in _stat_keys(doc):
+            deltas[key] -= 1
+    for doc in added:
+        for key in _stat_keys(doc):
+            deltas[key] += 1
+
+    operations = [
+        UpdateOne(
+            {"_id": _stat_id(kind, key)},
+            {"$inc": {"count": delta}, "$setOnInsert": {"kind": kind, "key": key}},
+            upsert=True,
+        )
+        for (kind, key), delta in deltas.items()
+        if delta
+    ]
+    if operations:
+        await db.idea_stats.bulk_write(operations, ordered=False)
+
+
+def median_resolve_hours(buckets: Dict[float, int]) -> Optional[float]:
+    """
+    Median of the time-to-resolve histogram, interpolated inside its bucket.
+    """
+    total = sum(count for count in buckets.values() if count > 0)
+    if not total:
+        return None
+    half = total / 2
+    seen = 0
+    for index, lower in enumerate(RESOLVE_BUCKET_HOURS):
+        count = max(buckets.get(lower, 0), 0)
+        if count and seen + count >= half:
+            if index + 1 == len(RESOLVE_BUCKET_HOURS):
+                return float(lower)
+            upper = RESOLVE_BUCKET_HOURS[index + 1]
+            return lower + (upper - lower) * (half - seen) / count
+        seen += count
+    return None
+
+
+async def read_idea_stats(days: int, weeks: int, now: Optional[datetime] = None) -> dict:
+    """
+    The dashboard figures, with the last `days` days and `weeks` weeks of new ideas.
+    """
+    now = now or datetime.utcnow()
+    since_day = (now - timedelta(days=days - 1)).strftime(DAY_FORMAT)
+    since_week = (now - timedelta(weeks=weeks - 1)).strftime(WEEK_FORMAT)
+    cursor = db.idea_stats.find(
+        {"$or": [
+            {"kind": {"$in": ["total", "category", "status", "resolve_hours"]}},
+            {"kind": "day", "key": {"$gte": since_day}},
+            {"kind": "week", "key": {"$gte": since_week}},
+        ]},
+        {"kind": 1, "key": 1, "count": 1},
+    )
+    stats = {"total": 0, "by_category": {}, "by_status": {}, "by_day": {}, "by_week": {}}
+    groups = {"category": "by_category", "status": "by_status", "day": "by_day", "week": "by_week"}
+    buckets = {}
+    async for doc in cursor:
+        kind, count = doc["kind"], doc.get("count", 0)
+        if kind == "total":
+            stats["total"] = max(count, 0)
+        elif kind == "resolve_hours":
+            buckets[doc["key"]] = count
+        elif count > 0:
+            stats[groups[kind]][doc["key"]] = count
+
+    stats["by_day"] = dict(sorted(stats["by_day"].items()))
+    stats["by_week"] = dict(sorted(stats["by_week"].items()))
+    stats["resolved"] = sum(count for count in buckets.values() if count > 0)
+    median = median_resolve_hours(buckets)
+    stats["median_hours_to_resolve"] = round(median, 1) if median is not None else None
+    return stats
+
+
+async def rebuild_idea_stats():
+    """
+    Recompute every counter from the ideas collection in one aggregation.
+    """
+    pipeline = [
+        {"$project": {
+            "category": 1,
+            "status": 1,
+            "day": {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}},
+            "week": {"$dateToString": {"format": WEEK_FORMAT, "date": "$created_at"}},
+            "resolve_hours": {"$cond": [
+                {"$and": [{"$eq": ["$status", RESOLVED]}, {"$eq": [{"$type": "$resolved_at"}, "date"]}, {"$eq": [{"$type": "$created_at"}, "date"]}]},
+                {"$max": [0, {"$divide": [{"$subtract": ["$resolved_at", "$created_at"]}, 3600 * 1000]}]},
+                None,
+            ]},
+        }},
+        {"$facet": {
+            "total": [{"$group": {"_id": "all", "count": {"$sum": 1}}}],
+            "category": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+            "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "day": [{"$group": {"_id": "$day", "count": {"$sum": 1}}}],
+            "week": [{"$group": {"_id": "$week", "count": {"$sum": 1}}}],
+            "resolve_hours": [
+                {"$match": {"resolve_hours": {"$ne": None}}},
+                {"$bucket": {"groupBy": "$resolve_hours", "boundaries": list(RESOLVE_BUCKET_HOURS), "default": RESOLVE_BUCKET_HOURS[-1]}},
+            ],
+        }},
+    ]
+    facets = (await db.ideas.aggregate(pipeline).to_list(length=1))[0]
+
+    # Overwrite counts in place rather than emptying the collection, so the
+    # dashboard never reads a half-rebuilt state
+    counts = {}
+    for kind, groups in facets.items():
+        for group in groups:
+            if group["_id"] is not None:
+                counts[_stat_id(kind, group["_id"])] = (kind, group["_id"], group["count"])
+    operations = [
+        UpdateOne({"_id": stat_id}, {"$set": {"kind": kind, "key": key, "count": count}}, upsert=True)
+        for stat_id, (kind, key, count) in counts.items()
+    ]
+    async for doc in db.idea_stats.find({}, {"_id": 1}):
+        if doc["_id"] not in counts:
+            operations.append(DeleteOne({"_id": doc["_id"]}))
+    for start in range(0, len(operations), 1000):
+        await db.idea_stats.bulk_write(operations[start:start + 1000], ordered=False)
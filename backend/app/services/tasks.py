@@ -0,0 +1,180 @@
+# app/services/tasks.py
+#
+# Handlers for the background jobs enqueued by the write endpoints.
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.geo import to_geo_point
+from app.core.indexes import index_registry
+from app.core.jobs import job_queue
+from app.core.response_cache import COMMENTS, IDEA_LISTS, comments_tag, idea_tag, response_cache
+from app.services.clusters import idea_geohash, rebuild_idea_cells, update_idea_cells
+from app.services.geocoding import geocoder
+from app.services.idea_events import mark_ideas_changed
+from app.services.migrations import run_migration
+from app.services.search import TEXT_PROJECTION, rebuild_search_terms, update_search_terms
+from app.services.stats import STATS_FIELDS, rebuild_idea_stats, update_idea_stats
+from app.services.ranking import reconcile_comment_counts, redecay_hot_scores
+from app.services.votes import reconcile_vote_counts
+
+# Ideas/comments/votes removed per round of a delete cascade
+CASCADE_BATCH_SIZE = 500
+
+CELL_FIELDS = {"geohash": 1, "latitude": 1, "longitude": 1, "category": 1, "status": 1}
+
+
+async def enqueue_geocode(idea_id: str, location: str):
+    await job_queue.enqueue(
+        "geocode_idea",
+        {"idea_id": idea_id, "location": location},
+        key=f"geocode_idea:{idea_id}",
+    )
+
+
+async def _give_up_geocode(payload: dict):
+    await db.ideas.update_one(
+        {"_id": ObjectId(payload["idea_id"]), "geocode_pending": True},
+        {"$set": {"geocode_pending": False}},
+    )
+    await response_cache.invalidate(idea_tag(payload["idea_id"]))
+
+
+@job_queue.register("geocode_idea", on_failure=_give_up_geocode)
+async def geocode_idea(payload: dict):
+    coordinates = await geocoder.geocode(payload["location"], strict=True)
+
+    update = {"geocode_pending": False, "latitude": None, "longitude": None}
+    if coordinates:
+        update.update(coordinates)
+        update["geo"] = to_geo_point(coordinates["latitude"], coordinates["longitude"])
+        update["geohash"] = idea_geohash(update)
+
+    # The geocode_pending guard makes a retried job a no-op and skips ideas deleted meanwhile
+    idea = await db.ideas.find_one_and_update(
+        {"_id": ObjectId(payload["idea_id"]), "geocode_pending": True},
+        {"$set": update},
+        projection=CELL_FIELDS,
+        return_document=ReturnDocument.AFTER,
+    )
+    if idea is not None:
+        await response_cache.invalidate(idea_tag(payload["idea_id"]))
+        # Map (bbox) subscribers first see the idea once it has coordinates
+        mark_ideas_changed(payload["idea_id"])
+        if coordinates:
+            await update_idea_cells(added=[idea])
+
+
+async def _delete_ideas(ideas: list):
+    """
+    Remove ideas together with their votes, comments and map cell counts.
+    Dependents go first so a retried job still finds the ideas they hang off.
+    """
+    idea_ids = [str(idea["_id"]) for idea in ideas]
+    await db.votes.delete_many({"idea_id": {"$in": idea_ids}})
+    await db.comments.delete_many({"idea_id": {"$in": idea_ids}})
+    result = await db.ideas.delete_many({"_id": {"$in": [idea["_id"] for idea in ideas]}})
+    if result.deleted_count:
+        await update_idea_cells(removed=ideas)
+        await update_idea_stats(removed=ideas)
+        await update_search_terms(removed=ideas)
+
+
+@job_queue.register("delete_idea_content")
+async def delete_idea_content(payload: dict):
+    idea = payload["idea"]
+    await db.votes.delete_many({"idea_id": idea["id"]})
+    await db.comments.delete_many({"idea_id": idea["id"]})
+    await update_idea_cells(removed=[idea])
+    await response_cache.invalidate(comments_tag(idea["id"]))
+
+
+@job_queue.register("delete_ideas_content")
+async def delete_ideas_content(payload: dict):
+    # delete_idea_content for the ideas of a bulk moderation pass; without
+    # "counters" the pass has the cells rebuilt instead
+    ideas = payload["ideas"]
+    idea_ids = [idea["id"] for idea in ideas]
+    await db.votes.delete_many({"idea_id": {"$in": idea_ids}})
+    await db.comments.delete_many({"idea_id": {"$in": idea_ids}})
+    if payload.get("counters", True):
+        await update_idea_cells(removed=ideas)
+    await response_cache.invalidate(*[comments_tag(idea_id) for idea_id in idea_ids])
+
+
+@job_queue.register("delete_user_content")
+async def delete_user_content(payload: dict):
+    user_id = payload["user_id"]
+    while True:
+        ideas = await db.ideas.find({"creator_id": user_id}, {**CELL_FIELDS, **STATS_FIELDS, **TEXT_PROJECTION}).limit(CASCADE_BATCH_SIZE).to_list(length=CASCADE_BATCH_SIZE)
+        if not ideas:
+            break
+        await _delete_ideas(ideas)
+        await response_cache.invalidate(IDEA_LISTS, *[idea_tag(idea["_id"]) for idea in ideas])
+
+    # Their votes on other people's ideas also go, so those counters are recomputed
+    voted_ideas = await db.votes.distinct("idea_id", {"user_id": user_id})
+    await db.votes.delete_many({"user_id": user_id})
+    for start in range(0, len(voted_ideas), CASCADE_BATCH_SIZE):
+        batch = [i for i in voted_ideas[start:start + CASCADE_BATCH_SIZE] if ObjectId.is_valid(i)]
+        await reconcile_vote_counts(batch)
+
+    commented_ideas = await db.comments.distinct("idea_id", {"user_id": user_id})
+    await db.comments.delete_many({"user_id": user_id})
+    await response_cache.invalidate(COMMENTS)
+    for start in range(0, len(commented_ideas), CASCADE_BATCH_SIZE):
+        batch = [i for i in commented_ideas[start:start + CASCADE_BATCH_SIZE] if ObjectId.is_valid(i)]
+        await reconcile_comment_counts(batch)
+
+
+@job_queue.register("reconcile_votes")
+async def reconcile_votes(payload: dict):
+    await reconcile_vote_counts(payload.get("idea_ids"))
+
+
+@job_queue.register("redecay_hot_scores")
+async def redecay_hot(payload: dict):
+    await redecay_hot_scores()
+
+
+@job_queue.register("rebuild_search_terms")
+async def rebuild_search_vocabulary(payload: dict):
+    await rebuild_search_terms()
+
+
+@job_queue.register("rebuild_idea_cells")
+async def rebuild_cells(payload: dict):
+    await rebuild_idea_cells()
+
+
+@job_queue.register("rebuild_idea_stats")
+async def rebuild_stats(payload: dict):
+    await rebuild_idea_stats()
+
+
+@job_queue.register("reconcile_indexes")
+async def reconcile_indexes(payload: dict):
+    await index_registry.reconcile()
+
+
+@job_queue.register("run_migration")
+async def migrate(payload: dict):
+    await run_migration(payload["name"])
+
+
+job_queue.schedule_every("redecay_hot_scores", settings.HOT_REDECAY_INTERVAL_SECONDS)
+job_queue.schedule_every("rebuild_idea_stats", settings.STATS_REBUILD_INTERVAL_SECONDS)
+job_queue.schedule_every("rebuild_search_terms", settings.SEARCH_TERMS_REBUILD_INTERVAL_SECONDS)
+
+
+async def recover_pending_geocodes():
+    """
+    Re-enqueue geocoding for ideas whose job was never persisted (the
+    process stopped between the insert and the enqueue). Keyed jobs make
+    this a no-op for ideas that already have one.
+    """
+    cursor = db.ideas.find({"geocode_pending": True}, {"location": 1})
+    async for idea in cursor:
+        await enqueue_geocode(str(idea["_id"]), idea.get("location") or "")
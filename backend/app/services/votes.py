@@ -0,0 +1,286 @@
+# app/services/votes.py
+#
+# Vote engine. A user's vote on an idea lives in `votes` (unique on
+# idea_id + user_id); the idea carries denormalized `upvotes`, `downvotes` and
+# `vote_score` counters that are adjusted by the delta between the previous
+# and the new vote. The previous vote comes back from the same atomic
+# find_one_and_update that writes the new one, so concurrent clicks always
+# apply consistent deltas.
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.core.database import db
+from app.core.jobs import job_queue
+from app.core.response_cache import IDEAS, idea_tag, ranking_tag, response_cache
+from app.crud import crud_ideas, crud_votes
+from app.services.idea_events import mark_ideas_changed
+from app.services.ranking import counters_update, hot_score_expr
+
+logger = logging.getLogger(__name__)
+
+VOTE_TYPES = ("upvote", "downvote")
+
+
+class IdeaNotFound(Exception):
+    pass
+
+
+async def _invalidate_counters(idea_ids: Iterable[str]):
+    idea_ids = list(idea_ids)
+    # Push subscribers get the new counters with the hub's next coalesced round
+    mark_ideas_changed(*idea_ids)
+    await response_cache.invalidate(*[idea_tag(idea_id) for idea_id in idea_ids], ranking_tag("top"), ranking_tag("hot"))
+
+
+def vote_deltas(previous: Optional[str], current: Optional[str]) -> dict:
+    """
+    Counter changes for moving a user's vote from `previous` to `current`
+    (either may be None for "no vote").
+    """
+    inc = {"vote_score": 0, "upvotes": 0, "downvotes": 0}
+    for vote_type, sign in ((previous, -1), (current, 1)):
+        if vote_type == "upvote":
+            inc["upvotes"] += sign
+            inc["vote_score"] += sign
+        elif vote_type == "downvote":
+            inc["downvotes"] += sign
+            inc["vote_score"] -= sign
+    return {field: value for field, value in inc.items() if value}
+
+
+async def apply_counter_deltas(idea_id: str, deltas: dict) -> bool:
+    """
+    Add the deltas to the idea's counters and refresh its hot score;
+    returns False when the idea does not exist.
+    """
+    if not await crud_ideas.apply_counters(idea_id, deltas):
+        return False
+    await _invalidate_counters([idea_id])
+    return True
+
+
+class VoteCounterBuffer:
+    """
+    Write-behind buffer for the idea vote counters (opt-in via VOTE_WRITE_BEHIND).
+
+    Vote documents are still written synchronously; only the denormalized
+    counters are coalesced in memory per idea and written as one unordered
+    bulk_write every `flush_interval` seconds or once `max_pending` votes
+    have accumulated, so a viral idea takes one $inc per flush instead of
+    one per vote.
+    """
+
+    def __init__(self, enabled: bool, flush_interval: float, max_pending: int):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._pending_votes = 0
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+        # Ideas recently confirmed to exist, so buffered votes skip the lookup
+        self._known_ideas = TTLCache(maxsize=10000, ttl=300)
+        self.flushes = 0
+        self.flushed_votes = 0
+        self.flush_errors = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def add(self, idea_id: str, deltas: dict):
+        counters = self._pending[idea_id]
+        for field, value in deltas.items():
+            counters[field] += value
+        self._pending_votes += 1
+        if self._pending_votes >= self.max_pending and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.create_task(self.flush())
+
+    async def idea_exists(self, idea_id: str) -> bool:
+        if self._known_ideas.get(idea_id) is not MISSING:
+            return True
+        if await crud_ideas.get_idea(idea_id, {"_id": 1}) is None:
+            return False
+        self._known_ideas.set(idea_id, True)
+        return True
+
+    def forget(self, idea_id: str):
+        self._known_ideas.pop(idea_id)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, votes = self._pending, self._pending_votes
+        self._pending = defaultdict(lambda: defaultdict(int))
+        self._pending_votes = 0
+
+        operations, idea_ids = [], []
+        for idea_id, counters in pending.items():
+            inc = {field: value for field, value in counters.items() if value}
+            if inc:
+                operations.append(UpdateOne({"_id": ObjectId(idea_id)}, counters_update(inc)))
+                idea_ids.append(idea_id)
+        if not operations:
+            return
+
+        started = time.perf_counter()
+        try:
+            await db.ideas.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Some updates were applied; re-queueing would double count the rest.
+            # The counters of the failed ones are recounted from `votes` instead.
+            self.flush_errors += 1
+            write_errors = e.details.get("writeErrors") or []
+            logger.error("Flushing buffered vote counters partially failed: %s", write_errors)
+            failed = sorted({idea_ids[error["index"]] for error in write_errors if "index" in error}) or idea_ids
+            try:
+                await job_queue.enqueue("reconcile_votes", {"idea_ids": failed})
+            except PyMongoError:
+                logger.exception("Enqueueing the recount of %d vote counters failed", len(failed))
+            await _invalidate_counters(pending)
+            return
+        except PyMongoError:
+            # Keep the deltas and retry them with the next flush
+            self.flush_errors += 1
+            logger.exception("Flushing %d buffered vote counters failed", len(operations))
+            for idea_id, counters in pending.items():
+                for field, value in counters.items():
+                    self._pending[idea_id][field] += value
+            self._pending_votes += votes
+            return
+        elapsed = time.perf_counter() - started
+        await _invalidate_counters(pending)
+        self.flushes += 1
+        self.flushed_votes += votes
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the periodic flush and write out whatever is still buffered.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending_ideas": len(self._pending),
+            "pending_votes": self._pending_votes,
+            "flushes": self.flushes,
+            "flushed_votes": self.flushed_votes,
+            "flush_errors": self.flush_errors,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
+
+
+vote_counter_buffer = VoteCounterBuffer(
+    enabled=settings.VOTE_WRITE_BEHIND,
+    flush_interval=settings.VOTE_FLUSH_INTERVAL_MS / 1000,
+    max_pending=settings.VOTE_FLUSH_MAX_PENDING,
+)
+
+
+async def cast_vote(idea_id: str, user_id: str, vote_type: str) -> Optional[str]:
+    """
+    Record `vote_type` for the user and return their previous vote, if any.
+    Repeating the current vote costs a single round trip and changes nothing.
+    """
+    buffered = vote_counter_buffer.enabled
+    if buffered and not await vote_counter_buffer.idea_exists(idea_id):
+        raise IdeaNotFound(idea_id)
+
+    try:
+        previous = await crud_votes.upsert_vote(idea_id, user_id, vote_type)
+    except DuplicateKeyError:
+        # Two first votes raced on the upsert; the loser now updates the winner's document
+        previous = await crud_votes.upsert_vote(idea_id, user_id, vote_type)
+    previous_type = previous["vote_type"] if previous else None
+
+    deltas = vote_deltas(previous_type, vote_type)
+    if deltas and buffered:
+        vote_counter_buffer.add(idea_id, deltas)
+    elif deltas and not await apply_counter_deltas(idea_id, deltas):
+        # The idea does not exist: put the vote back the way it was
+        await crud_votes.restore_vote(idea_id, user_id, previous_type)
+        raise IdeaNotFound(idea_id)
+    return previous_type
+
+
+async def retract_vote(idea_id: str, user_id: str) -> Optional[str]:
+    """
+    Remove the user's vote and return what it was (None if there was none).
+    """
+    previous = await crud_votes.delete_vote(idea_id, user_id)
+    if previous is None:
+        return None
+    deltas = vote_deltas(previous["vote_type"], None)
+    if deltas and vote_counter_buffer.enabled:
+        vote_counter_buffer.add(idea_id, deltas)
+    elif deltas:
+        await apply_counter_deltas(idea_id, deltas)
+    return previous["vote_type"]
+
+
+async def reconcile_vote_counts(idea_ids: Optional[Iterable[str]] = None):
+    """
+    Recompute `upvotes`, `downvotes`, `vote_score` and `hot_score` from the votes
+    collection, server side, for the given ideas or for every idea.
+    """
+    match = {}
+    if idea_ids is not None:
+        match = {"_id": {"$in": [ObjectId(idea_id) for idea_id in idea_ids]}}
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {"created_at": 1, "comment_count": 1}},
+        {"$lookup": {
+            "from": "votes",
+            "let": {"idea_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$idea_id", "$$idea_id"]}}},
+                {"$group": {
+                    "_id": None,
+                    "upvotes": {"$sum": {"$cond": [{"$eq": ["$vote_type", "upvote"]}, 1, 0]}},
+                    "downvotes": {"$sum": {"$cond": [{"$eq": ["$vote_type", "downvote"]}, 1, 0]}},
+                }},
+            ],
+            "as": "tally",
+        }},
+        {"$set": {
+            "upvotes": {"$ifNull": [{"$first": "$tally.upvotes"}, 0]},
+            "downvotes": {"$ifNull": [{"$first": "$tally.downvotes"}, 0]},
+        }},
+        {"$set": {"vote_score": {"$subtract": ["$upvotes", "$downvotes"]}}},
+        {"$set": {"hot_score": hot_score_expr()}},
+        {"$project": {"upvotes": 1, "downvotes": 1, "vote_score": 1, "hot_score": 1}},
+        {"$merge": {"into": "ideas", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+    await db.ideas.aggregate(pipeline).to_list(length=None)
+    if idea_ids is None:
+        await response_cache.invalidate(IDEAS)
+    else:
+        await _invalidate_counters(idea_ids)
@@ -0,0 +1,109 @@
+"""
+Login storm benchmark: latency of unrelated requests while bcrypt runs.
+
+Simulates a burst of logins (bcrypt verify) next to a steady stream of cheap
+requests that only wait on I/O, and reports the latency percentiles of the
+cheap requests with bcrypt run inline on the event loop (the old
+verify_password) and through PasswordHasher.
+
+    cd backend
+    python -m benchmarks.login_storm --logins 40 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+from app.core.hashing import PasswordHasher
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe(latencies, stop: asyncio.Event, interval: float):
+    """
+    Cheap "requests" arrive every `interval` seconds on a fixed schedule, the
+    way they would hit the socket. Latency is measured from the scheduled
+    arrival, so time spent waiting for a blocked event loop is counted.
+    """
+    async def request(arrived):
+        await asyncio.sleep(0.001)  # stands in for a fast DB round trip
+        latencies.append(time.perf_counter() - arrived)
+
+    tasks = []
+    next_arrival = time.perf_counter()
+    while True:
+        # Spawn every arrival that is due, including those missed while the loop was blocked
+        now = time.perf_counter()
+        while next_arrival <= now:
+            tasks.append(asyncio.create_task(request(next_arrival)))
+            next_arrival += interval
+        if stop.is_set():
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+    await asyncio.gather(*tasks)
+
+
+async def storm(mode: str, context: CryptContext, hashed: str, logins: int, concurrency: int, hash_concurrency: int):
+    hasher = PasswordHasher(context, max_concurrency=hash_concurrency)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with gate:
+            if mode == "inline":
+                context.verify("correct horse", hashed)
+            else:
+                await hasher.verify("correct horse", hashed)
+
+    latencies = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(latencies, stop, interval=0.005))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    duration = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    hasher.shutdown()
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "storm_seconds": round(duration, 3),
+        "logins_per_second": round(logins / duration, 2),
+        "other_requests": len(latencies),
+        "other_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "other_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "other_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "other_max_ms": round(max(latencies) * 1000, 2),
+        "other_mean_ms": round(statistics.mean(latencies) * 1000, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent login requests")
+    parser.add_argument("--hash-concurrency", type=int, default=4, help="PasswordHasher cap")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash("correct horse")
+    results = []
+    for mode in ("inline", "offloaded"):
+        results.append(await storm(mode, context, hashed, args.logins, args.concurrency, args.hash_concurrency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""
+Deterministic benchmark data, written through the app's own document
+builders so the stored shape matches what the endpoints write.
+
+Ideas are stored already geocoded (the way they look once the geocode_idea
+job has run) around a fixed city center; vote and comment counts follow a
+long tail, with a handful of "hot" ideas drawing most of the activity.
+Derived data - hot scores, map cells, the search vocabulary, the dashboard
+counters - is rebuilt by the same functions the admin jobs use.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+from app.core.database import db
+from app.core.geo import to_geo_point
+from app.crud import crud_comments, crud_ideas, crud_users
+from app.models.comment import CommentCreate
+from app.models.idea import IdeaCategory, IdeaCreate, IdeaStatus
+from app.models.user import User, UserCreate
+from app.services.clusters import idea_geohash, rebuild_idea_cells
+from app.services.search import rebuild_search_terms
+from app.services.stats import rebuild_idea_stats
+from app.services.votes import reconcile_vote_counts
+
+PASSWORD = "benchmark-password"
+CENTER = (18.5204, 73.8567)
+SPREAD_DEGREES = 0.08
+BATCH_SIZE = 1000
+
+STREETS = ["Station Road", "MG Road", "Market Lane", "Temple Street", "Canal Road", "Hill View", "Ring Road", "School Lane"]
+PROBLEMS = {
+    IdeaCategory.WASTE: ["Garbage not collected", "Overflowing dustbin", "Illegal dumping"],
+    IdeaCategory.POTHOLES: ["Deep pothole", "Broken road surface", "Sinking manhole"],
+    IdeaCategory.HEALTH: ["Stagnant water breeding mosquitoes", "Clinic closed on weekdays"],
+    IdeaCategory.TRANSPORT: ["Bus stop without shelter", "Signal not working", "No pedestrian crossing"],
+    IdeaCategory.PARKS: ["Broken swings", "Park gate locked", "Dead trees in garden"],
+    IdeaCategory.SAFETY: ["Streetlight out", "Open electrical box", "Missing railing"],
+    IdeaCategory.ENVIRONMENT: ["Tree cutting without permit", "Smoke from burning leaves"],
+    IdeaCategory.INFRASTRUCTURE: ["Leaking water pipe", "Blocked storm drain", "Cracked footpath"],
+}
+REMARKS = [
+    "Same problem on my street, reported it last week too.",
+    "This has been going on for more than a month.",
+    "Children walk past here every morning, please fix it soon.",
+    "The ward office said someone would come but nobody did.",
+    "Fixed for two days and now it is back again.",
+]
+# Most ideas wait for triage; a few have moved on
+STATUS_WEIGHTS = {
+    IdeaStatus.READ: 60,
+    IdeaStatus.OPEN: 15,
+    IdeaStatus.SENT_TO_DEPT: 10,
+    IdeaStatus.WORK_IN_PROGRESS: 8,
+    IdeaStatus.RESOLVED: 7,
+}
+
+
+class Dataset:
+    """
+    What the scenarios need to know about the seeded data.
+    """
+
+    def __init__(self, users: List[User], admin: User, idea_ids: List[str], hot_idea_ids: List[str], locations: List[str]):
+        self.users = users
+        self.admin = admin
+        self.idea_ids = idea_ids
+        self.hot_idea_ids = hot_idea_ids
+        self.locations = locations
+
+
+async def _insert(collection, documents: List[dict]):
+    for start in range(0, len(documents), BATCH_SIZE):
+        await collection.insert_many(documents[start:start + BATCH_SIZE], ordered=False)
+
+
+def _activity(rng: random.Random, mean: float, hot: bool, cap: int) -> int:
+    if mean <= 0:
+        return 0
+    value = rng.expovariate(1 / mean) * (20 if hot else 1)
+    return min(int(value), cap)
+
+
+async def seed(
+    rng: random.Random,
+    users: int,
+    ideas: int,
+    votes_per_idea: float,
+    comments_per_idea: float,
+    hashed_password: str,
+    hot_ideas: int = 10,
+) -> Dataset:
+    """
+    Insert the data set into an empty database. Every user shares
+    `hashed_password` (the hash of PASSWORD), so seeding does not pay for
+    one bcrypt run per account.
+    """
+    now = datetime.utcnow()
+
+    user_docs = []
+    for n in range(max(users, 2)):
+        user = UserCreate(email=f"user{n}@benchmark.example.com", full_name=f"Benchmark User {n}", password=PASSWORD)
+        user_docs.append(crud_users.new_user_document(user, hashed_password, created_at=now - timedelta(hours=n)))
+    user_docs[0]["is_admin"] = True
+    await _insert(db.users, user_docs)
+    principals = [
+        User(id=str(doc["_id"]), email=doc["email"], full_name=doc["full_name"], is_admin=doc["is_admin"], created_at=doc["created_at"])
+        for doc in user_docs
+    ]
+
+    idea_docs = []
+    locations = []
+    for n in range(ideas):
+        category = rng.choice(list(IdeaCategory))
+        location = f"{rng.randint(1, 400)} {rng.choice(STREETS)}"
+        idea = IdeaCreate(
+            title=f"{rng.choice(PROBLEMS[category])} near {location}",
+            description=f"{rng.choice(REMARKS)} Reported by residents around {location}.",
+            category=category,
+            location=location,
+        )
+        created_at = now - timedelta(hours=rng.expovariate(1 / 240))
+        doc = crud_ideas.new_idea_document(idea, rng.choice(principals), created_at=created_at)
+        latitude = CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+        longitude = CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+        doc.update(latitude=latitude, longitude=longitude, geocode_pending=False, geo=to_geo_point(latitude, longitude))
+        doc["geohash"] = idea_geohash(doc)
+        doc["status"] = rng.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()))[0].value
+        if doc["status"] == IdeaStatus.RESOLVED.value:
+            doc["resolved_at"] = min(now, created_at + timedelta(hours=rng.expovariate(1 / 96)))
+        doc["_id"] = ObjectId()
+        idea_docs.append(doc)
+        locations.append(location)
+    idea_ids = [str(doc["_id"]) for doc in idea_docs]
+    hot_idea_ids = rng.sample(idea_ids, min(hot_ideas, len(idea_ids)))
+    hot = set(hot_idea_ids)
+
+    vote_docs = []
+    comment_docs = []
+    for doc, idea_id in zip(idea_docs, idea_ids):
+        voters = rng.sample(principals, _activity(rng, votes_per_idea, idea_id in hot, len(principals)))
+        for voter in voters:
+            voted_at = doc["created_at"] + timedelta(minutes=rng.randint(1, 600))
+            vote_type = "upvote" if rng.random() < 0.85 else "downvote"
+            vote_docs.append({"idea_id": idea_id, "user_id": str(voter.id), "vote_type": vote_type, "created_at": voted_at, "updated_at": voted_at})
+
+        count = _activity(rng, comments_per_idea, idea_id in hot, 10 * len(principals))
+        for n in range(count):
+            comment = CommentCreate(content=rng.choice(REMARKS))
+            written_at = doc["created_at"] + timedelta(minutes=n + 1)
+            comment_docs.append(crud_comments.new_comment_document(comment, idea_id, rng.choice(principals), created_at=written_at))
+        doc["comment_count"] = count
+    await _insert(db.ideas, idea_docs)
+    await _insert(db.votes, vote_docs)
+    await _insert(db.comments, comment_docs)
+
+    # Vote counters and hot scores (which also weigh comment_count) in one server-side pass
+    await reconcile_vote_counts()
+    await rebuild_idea_cells()
+    await rebuild_search_terms()
+    await rebuild_idea_stats()
+    return Dataset(principals, principals[0], idea_ids, hot_idea_ids, locations)
@@ -0,0 +1,140 @@
+"""
+Serialization benchmark: raw Mongo documents -> JSON response body.
+
+Compares, per page size, the previous list-endpoint path (copy `_id` into
+`id`, build a model per document, FastAPI's response_model validation and
+JSONResponse encoding) with app.core.serialization.render_json on documents
+shaped by mongo_projection. Only CPU work is measured; no database needed.
+
+    cd backend
+    python -m benchmarks.serialization --page-sizes 10 50 100 500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.serialization import render_json
+from app.models.comment import Comment
+from app.models.idea import Idea, IdeaCategory, IdeaStatus
+from app.models.user import User
+
+
+def fake_idea(n: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "title": f"Broken streetlight number {n}",
+        "description": "The streetlight at the corner has been out for two weeks. " * 3,
+        "category": random.choice(list(IdeaCategory)).value,
+        "location": f"{n} Station Road",
+        "latitude": 18.5 + random.random() / 10,
+        "longitude": 73.8 + random.random() / 10,
+        "creator_id": str(ObjectId()),
+        "creator_name": "Asha Kulkarni",
+        "status": random.choice(list(IdeaStatus)).value,
+        "vote_score": random.randint(-5, 200),
+        "upvotes": random.randint(0, 200),
+        "downvotes": random.randint(0, 5),
+        "comment_count": random.randint(0, 40),
+        "created_at": datetime.utcnow() - timedelta(minutes=n),
+        "geocode_pending": False,
+        # Stored but not part of the response model
+        "geo": {"type": "Point", "coordinates": [73.8, 18.5]},
+        "geohash": "tek4fyz1",
+        "hot_score": random.random(),
+        "minhash": list(range(48)),
+        "lsh_bands": [f"{i}:abcdef012345" for i in range(16)],
+    }
+
+
+def fake_user(n: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "email": f"user{n}@example.com",
+        "full_name": f"User {n}",
+        "is_admin": False,
+        "created_at": datetime.utcnow() - timedelta(hours=n),
+        "hashed_password": "$2b$12$" + "x" * 53,
+    }
+
+
+def fake_comment(n: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "content": f"Same problem on my street, reported it last week too ({n}).",
+        "idea_id": str(ObjectId()),
+        "user_id": str(ObjectId()),
+        "user_name": f"User {n}",
+        "created_at": datetime.utcnow() - timedelta(minutes=n),
+    }
+
+
+def projected(model, doc: dict) -> dict:
+    # What Mongo returns for mongo_projection(model): model fields plus `_id` and a string `id`
+    fields = set(model.model_fields) | {"_id"}
+    shaped = {key: value for key, value in doc.items() if key in fields}
+    shaped["id"] = str(doc["_id"])
+    return shaped
+
+
+async def legacy(model, field, docs: List[dict]) -> bytes:
+    items = []
+    for doc in docs:
+        doc = dict(doc)
+        doc["id"] = str(doc["_id"])
+        items.append(model(**doc))
+    content = await serialize_response(field=field, response_content=items)
+    return JSONResponse(content).body
+
+
+async def fast(model, field, docs: List[dict]) -> bytes:
+    return render_json(List[model], docs)
+
+
+async def measure(fn, model, field, docs, seconds: float) -> dict:
+    await fn(model, field, docs)  # warm up caches
+    pages = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        await fn(model, field, docs)
+        pages += 1
+    elapsed = time.perf_counter() - started
+    return {"pages_per_second": round(pages / elapsed, 1), "us_per_item": round(elapsed / pages / len(docs) * 1e6, 2)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 50, 100, 500])
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent per measurement")
+    args = parser.parse_args()
+
+    results = []
+    for model, make in ((Idea, fake_idea), (User, fake_user), (Comment, fake_comment)):
+        field = create_model_field(name=f"Response_{model.__name__}", type_=List[model], mode="serialization")
+        for size in args.page_sizes:
+            raw = [make(n) for n in range(size)]
+            shaped = [projected(model, doc) for doc in raw]
+            assert json.loads(await legacy(model, field, raw)) == json.loads(await fast(model, field, shaped))
+            before = await measure(legacy, model, field, raw, args.seconds)
+            after = await measure(fast, model, field, shaped, args.seconds)
+            results.append({
+                "model": model.__name__,
+                "page_size": size,
+                "legacy": before,
+                "fast": after,
+                "speedup": round(after["pages_per_second"] / before["pages_per_second"], 2),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,409 @@
+"""
+End-to-end benchmark suite: the whole app, in process, against a local mongod.
+
+Boots app.main:app (startup and shutdown handlers included) behind
+httpx.ASGITransport, seeds a throwaway database, then drives each scenario
+with a fixed number of requests at a fixed concurrency:
+
+    list_pages       idea listings in every sort order, following cursors and
+                     re-polling with If-None-Match the way the frontend does
+    idea_detail      an idea and its comment thread, skewed to hot ideas
+    vote_storm       many users voting on the same few ideas at once
+    login_burst      password logins (bcrypt) arriving together
+    comment_threads  users commenting on hot ideas while others read them
+    map_browse       nearby, bounding box and cluster queries
+    search           typo-tolerant text search
+    admin_export     full NDJSON exports of the idea collection
+
+Per scenario it reports throughput, latency percentiles, status codes and
+what each request cost in MongoDB commands (from the Server-Timing header)
+and in crud round trips (app.crud.base.count_queries). Geocoding never
+leaves the process: the geocoder's HTTP transport is replaced by a stub.
+
+    cd backend
+    python -m benchmarks.suite --ideas 5000 --users 500 --output before.json
+    python -m benchmarks.suite --ideas 5000 --users 500 --baseline before.json
+
+With --baseline the exit status is 1 when a scenario's p95 latency or
+throughput moved past --tolerance, or it needs more commands per request.
+Runs are seeded (--seed), so two runs against the same code issue the same
+requests. The database named by --database is dropped before and after.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+DB_COMMANDS = re.compile(r'db;dur=[\d.]+;desc="(\d+) commands"')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def configure_environment(args):
+    # Settings are read when app.core.config is imported, so this runs first
+    os.environ["MONGODB_URL"] = args.mongo_url
+    os.environ["MONGODB_NAME"] = args.database
+    os.environ["SERVER_TIMING"] = "true"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    # Every request of a storm would otherwise be logged as slow
+    os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+    os.environ.setdefault("SLOW_QUERY_MS", "60000")
+    os.environ.setdefault("GEOCODER_MIN_INTERVAL_SECONDS", "0")
+
+
+def fake_nominatim(request: httpx.Request) -> httpx.Response:
+    # Stable coordinates per query string, inside the seeded area
+    from benchmarks.seed import CENTER, SPREAD_DEGREES
+
+    digest = hashlib.blake2b(request.url.params.get("q", "").encode(), digest_size=4).digest()
+    lat = CENTER[0] + (digest[0] / 255 - 0.5) * 2 * SPREAD_DEGREES
+    lon = CENTER[1] + (digest[1] / 255 - 0.5) * 2 * SPREAD_DEGREES
+    return httpx.Response(200, json=[{"lat": str(lat), "lon": str(lon)}])
+
+
+class ScenarioResult:
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.db_commands: List[int] = []
+        self.crud_queries: List[int] = []
+        self.errors: Counter = Counter()
+        self.elapsed = 0.0
+
+    def report(self) -> dict:
+        requests = len(self.latencies)
+        mean = lambda values: round(sum(values) / len(values), 2) if values else None
+        ms = lambda seconds: round(seconds * 1000, 2)
+        return {
+            "requests": requests,
+            "concurrency": self.concurrency,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_rps": round(requests / self.elapsed, 1) if self.elapsed else 0.0,
+            "latency_ms": {
+                "p50": ms(percentile(self.latencies, 50)),
+                "p95": ms(percentile(self.latencies, 95)),
+                "p99": ms(percentile(self.latencies, 99)),
+                "max": ms(max(self.latencies, default=0.0)),
+                "mean": ms(sum(self.latencies) / requests) if requests else 0.0,
+            },
+            "status": {str(code): count for code, count in sorted(self.statuses.items())},
+            "errors": dict(self.errors),
+            "db_commands_per_request": mean(self.db_commands),
+            "crud_queries_per_request": mean(self.crud_queries),
+        }
+
+
+async def run_scenario(name: str, operation: Callable[[int], Awaitable[httpx.Response]], requests: int, concurrency: int) -> ScenarioResult:
+    from app.crud.base import count_queries
+
+    result = ScenarioResult(name, concurrency)
+    numbers = iter(range(requests))
+
+    async def worker():
+        for n in numbers:
+            started = time.perf_counter()
+            with count_queries() as queries:
+                try:
+                    response = await operation(n)
+                except Exception as e:
+                    result.errors[type(e).__name__] += 1
+                    continue
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[response.status_code] += 1
+            result.crud_queries.append(queries.total)
+            match = DB_COMMANDS.search(response.headers.get("server-timing", ""))
+            if match:
+                result.db_commands.append(int(match.group(1)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+class Scenarios:
+    """
+    Request generators, one method per scenario. `n` is the request number;
+    everything else comes from the seeded generator, so runs repeat.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, dataset, rng: random.Random):
+        from app.api.endpoints.auth import create_access_token
+        from benchmarks.seed import PASSWORD
+
+        self.client = client
+        self.data = dataset
+        self.rng = rng
+        self.password = PASSWORD
+        self.tokens = {
+            user.email: create_access_token({"sub": user.email, "is_admin": user.is_admin})
+            for user in dataset.users
+        }
+        # Cursors and ETags seen so far, as a client would remember them
+        self.cursors: Dict[str, List[str]] = {}
+        self.etags: Dict[str, str] = {}
+
+    def _auth(self, user) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[user.email]}"}
+
+    def _idea(self) -> str:
+        # Most traffic goes to the few ideas everyone is talking about
+        if self.rng.random() < 0.6:
+            return self.rng.choice(self.data.hot_idea_ids)
+        return self.rng.choice(self.data.idea_ids)
+
+    async def _poll(self, url: str, params: dict) -> httpx.Response:
+        key = url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        headers = {}
+        if key in self.etags and self.rng.random() < 0.5:
+            headers["If-None-Match"] = self.etags[key]
+        response = await self.client.get(url, params=params, headers=headers)
+        if "etag" in response.headers:
+            self.etags[key] = response.headers["etag"]
+        return response
+
+    async def list_pages(self, n: int) -> httpx.Response:
+        sort = self.rng.choice(["newest", "newest", "hot", "top"])
+        params = {"sort": sort, "limit": 20}
+        if self.rng.random() < 0.3:
+            params["category"] = self.rng.choice(["waste", "potholes", "transport", "safety"])
+        if self.rng.random() < 0.5:
+            # Cards with comment counts and the two latest comments
+            params["comments"] = 2
+        cursors = self.cursors.setdefault(repr(sorted(params.items())), [])
+        if cursors and self.rng.random() < 0.4:
+            params["cursor"] = self.rng.choice(cursors)
+        response = await self._poll("/api/ideas/", params)
+        next_cursor = response.headers.get("x-next-cursor")
+        if next_cursor and len(cursors) < 5:
+            cursors.append(next_cursor)
+        return response
+
+    async def idea_detail(self, n: int) -> httpx.Response:
+        idea_id = self._idea()
+        if n % 2:
+            return await self._poll(f"/api/ideas/{idea_id}/comments/", {"limit": 50})
+        return await self._poll(f"/api/ideas/{idea_id}", {})
+
+    async def vote_storm(self, n: int) -> httpx.Response:
+        idea_id = self.rng.choice(self.data.hot_idea_ids[:3])
+        user = self.rng.choice(self.data.users)
+        vote_type = "upvote" if self.rng.random() < 0.8 else "downvote"
+        return await self.client.post(f"/api/ideas/{idea_id}/vote", params={"vote_type": vote_type}, headers=self._auth(user))
+
+    async def login_burst(self, n: int) -> httpx.Response:
+        user = self.rng.choice(self.data.users)
+        # One in ten users mistypes their password
+        password = self.password if self.rng.random() < 0.9 else self.password + "x"
+        return await self.client.post("/api/auth/token", data={"username": user.email, "password": password})
+
+    async def comment_threads(self, n: int) -> httpx.Response:
+        idea_id = self.rng.choice(self.data.hot_idea_ids)
+        if n % 3 == 0:
+            user = self.rng.choice(self.data.users)
+            content = f"Adding to this: still not fixed as of request {n}."
+            return await self.client.post(f"/api/ideas/{idea_id}/comments/", json={"content": content}, headers=self._auth(user))
+        return await self._poll(f"/api/ideas/{idea_id}/comments/", {"limit": 50, "sort": "newest"})
+
+    async def map_browse(self, n: int) -> httpx.Response:
+        from benchmarks.seed import CENTER, SPREAD_DEGREES
+
+        lat = CENTER[0] + self.rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES) / 2
+        lng = CENTER[1] + self.rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES) / 2
+        half = self.rng.choice([0.005, 0.02, 0.05])
+        bbox = f"{lng - half},{lat - half},{lng + half},{lat + half}"
+        kind = n % 3
+        if kind == 0:
+            return await self.client.get("/api/ideas/nearby", params={"lat": lat, "lng": lng, "radius": 1500})
+        if kind == 1:
+            return await self.client.get("/api/ideas/bbox", params={"bbox": bbox})
+        return await self.client.get("/api/ideas/clusters", params={"bbox": bbox, "zoom": self.rng.choice([12, 14, 16])})
+
+    async def search(self, n: int) -> httpx.Response:
+        from benchmarks.seed import PROBLEMS
+
+        words = self.rng.choice(self.rng.choice(list(PROBLEMS.values()))).lower().split()
+        word = self.rng.choice([w for w in words if len(w) > 3] or words)
+        if self.rng.random() < 0.3 and len(word) > 4:
+            # A typo: drop one letter
+            cut = self.rng.randrange(1, len(word) - 1)
+            word = word[:cut] + word[cut + 1:]
+        return await self.client.get("/api/ideas/search", params={"q": word})
+
+    async def admin_export(self, n: int) -> httpx.Response:
+        # Read the whole stream; the response only ends after the last batch
+        async with self.client.stream("GET", "/api/admin/ideas/export", params={"format": "ndjson"}, headers=self._auth(self.data.admin)) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response
+
+
+# name -> (requests, concurrency) at --scale 1
+SCENARIOS = {
+    "list_pages": (600, 20),
+    "idea_detail": (600, 20),
+    "vote_storm": (800, 50),
+    "login_burst": (60, 30),
+    "comment_threads": (400, 20),
+    "map_browse": (300, 10),
+    "search": (300, 10),
+    "admin_export": (4, 1),
+}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Regressions of `results` against an earlier run of the suite.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        if current["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['latency_ms']['p95']} -> {current['latency_ms']['p95']} ms")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        # Query counts do not depend on the machine, so any increase counts
+        for key in ("db_commands_per_request", "crud_queries_per_request"):
+            if before.get(key) is not None and current.get(key) is not None and current[key] > before[key] + 0.05:
+                regressions.append(f"{name}: {key} {before[key]} -> {current[key]}")
+    return regressions
+
+
+async def run(args) -> dict:
+    from app.core.database import close_db_client, connect_db_client, db
+    from app.core.hashing import password_hasher
+    from app.core.indexes import index_registry
+    from app.main import app
+    from app.services.geocoding import geocoder
+    from benchmarks.seed import PASSWORD, seed
+
+    geocoder.transport = httpx.MockTransport(fake_nominatim)
+    await connect_db_client().drop_database(db.name)
+    rng = random.Random(args.seed)
+    selected = args.scenarios or list(SCENARIOS)
+
+    try:
+        async with app.router.lifespan_context(app):
+            started = time.perf_counter()
+            dataset = await seed(
+                rng,
+                users=args.users,
+                ideas=args.ideas,
+                votes_per_idea=args.votes_per_idea,
+                comments_per_idea=args.comments_per_idea,
+                hashed_password=await password_hasher.hash(PASSWORD),
+            )
+            # Secondary indexes are otherwise still building while the scenarios run
+            await index_registry.reconcile()
+            seed_seconds = time.perf_counter() - started
+            print(f"Seeded {args.users} users and {args.ideas} ideas in {seed_seconds:.1f}s", file=sys.stderr)
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+                scenarios = Scenarios(http, dataset, rng)
+                results = {}
+                for name in selected:
+                    requests, concurrency = SCENARIOS[name]
+                    requests = max(1, int(requests * args.scale))
+                    result = await run_scenario(name, getattr(scenarios, name), requests, concurrency)
+                    results[name] = result.report()
+                    summary = results[name]
+                    print(
+                        f"{name:16} {summary['throughput_rps']:8.1f} req/s  p50 {summary['latency_ms']['p50']:7.1f} ms"
+                        f"  p95 {summary['latency_ms']['p95']:7.1f} ms  p99 {summary['latency_ms']['p99']:7.1f} ms"
+                        f"  db/req {summary['db_commands_per_request']}  status {summary['status']}",
+                        file=sys.stderr,
+                    )
+    finally:
+        if not args.keep_database:
+            await connect_db_client().drop_database(db.name)
+        close_db_client()
+
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "scale": args.scale,
+            "users": args.users,
+            "ideas": args.ideas,
+            "votes_per_idea": args.votes_per_idea,
+            "comments_per_idea": args.comments_per_idea,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="civic_benchmark", help="dropped before and after the run")
+    parser.add_argument("--keep-database", action="store_true", help="leave the seeded database in place afterwards")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ideas", type=int, default=2000)
+    parser.add_argument("--votes-per-idea", type=float, default=8)
+    parser.add_argument("--comments-per-idea", type=float, default=3)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="default: all")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the request count of every scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change of p95 and throughput")
+    args = parser.parse_args()
+
+    if args.database == "civic_innovation_simple":
+        parser.error("refusing to drop the application database; pick another --database")
+    configure_environment(args)
+
+    results = asyncio.run(run(args))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# serve.py
+#
+# Production entry point: SERVER_WORKERS processes sharing the port, each
+# with its own event loop (uvloop), HTTP parser (httptools) and MongoDB
+# connection pool, opened in the startup handler after the worker started.
+# On SIGTERM/SIGINT the workers stop accepting connections and give
+# in-flight requests SERVER_GRACEFUL_SHUTDOWN_SECONDS to finish before the
+# shutdown handlers flush buffered votes and close the pool. Settings come
+# from the environment (or .env), see app/core/config.py.
+#
+# One worker is the default. Several workers only behave like one when the
+# state they would otherwise keep per process is shared:
+#
+#   RESPONSE_CACHE_REDIS_URL   cached responses and their invalidations
+#                              (or RESPONSE_CACHE_ENABLED=false)
+#   REALTIME_REDIS_URL         WebSocket/SSE events of writes made through
+#                              any worker, and evictions of cached users
+#
+# so more than one is refused without them. The geocoder spaces its
+# requests by the worker count to keep the combined rate within the
+# provider's policy. uvicorn_run.py remains the auto-reloading development
+# server.
+
+import sys
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def missing_shared_state() -> list:
+    missing = []
+    if settings.RESPONSE_CACHE_ENABLED and not settings.RESPONSE_CACHE_REDIS_URL:
+        missing.append("RESPONSE_CACHE_REDIS_URL (or RESPONSE_CACHE_ENABLED=false)")
+    if not settings.REALTIME_REDIS_URL:
+        missing.append("REALTIME_REDIS_URL")
+    return missing
+
+
+if __name__ == "__main__":
+    if settings.SERVER_WORKERS > 1 and missing_shared_state():
+        sys.exit(f"SERVER_WORKERS={settings.SERVER_WORKERS} needs {' and '.join(missing_shared_state())}; see serve.py")
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+    )
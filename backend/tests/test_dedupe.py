@@ -0,0 +1,49 @@
+from app.services.dedupe import BANDS, NUM_PERMUTATIONS, signature, similarity
+
+TITLE = "Deep pothole on Station Road"
+DESCRIPTION = "A deep pothole in the middle of Station Road damages bikes and cars every day"
+
+
+def test_signature_shape():
+    sig = signature(TITLE, DESCRIPTION)
+    assert len(sig["minhash"]) == NUM_PERMUTATIONS
+    assert len(sig["lsh_bands"]) == BANDS
+    assert [band.split(":")[0] for band in sig["lsh_bands"]] == [str(band) for band in range(BANDS)]
+
+
+def test_signature_is_deterministic():
+    assert signature(TITLE, DESCRIPTION) == signature(TITLE, DESCRIPTION)
+
+
+def test_signature_ignores_case_word_order_stop_words_and_plurals():
+    assert signature(TITLE, DESCRIPTION) == signature(
+        "station road: deep POTHOLES",
+        "cars and bikes damages every day, in the middle of the deep pothole on station road",
+    )
+
+
+def test_no_signature_without_usable_words():
+    assert signature("", "") is None
+    assert signature("The", "and on at to") is None
+
+
+def test_near_duplicates_share_a_band():
+    original = signature(TITLE, DESCRIPTION)
+    reworded = signature(TITLE, DESCRIPTION.replace("every day", "each morning"))
+    assert set(original["lsh_bands"]) & set(reworded["lsh_bands"])
+    assert similarity(original["minhash"], reworded["minhash"]) >= 0.5
+
+
+def test_unrelated_reports_are_not_similar():
+    pothole = signature(TITLE, DESCRIPTION)
+    streetlight = signature("Broken streetlight", "The lamp outside the library flickers all night long")
+    assert similarity(pothole["minhash"], streetlight["minhash"]) < 0.2
+
+
+def test_similarity():
+    assert similarity([1, 2, 3, 4], [1, 2, 3, 4]) == 1.0
+    assert similarity([1, 2, 3, 4], [1, 2, 0, 0]) == 0.5
+    # Missing or mismatched signatures never match
+    assert similarity([1, 2], [1, 2, 3]) == 0.0
+    assert similarity([1, 2], None) == 0.0
+    assert similarity([], []) == 0.0
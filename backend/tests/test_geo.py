@@ -0,0 +1,62 @@
+import pytest
+
+from app.core.geo import bbox_center, bbox_polygon, geohash_center, geohash_encode, parse_bbox, to_geo_point
+
+
+def test_geohash_of_a_known_point():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(57.64911, 10.40744, 5) == "u4pru"
+
+
+@pytest.mark.parametrize("latitude, longitude", [(40.7128, -74.006), (-33.8688, 151.2093), (0.0, 0.0), (89.9, 179.9)])
+@pytest.mark.parametrize("precision", [1, 5, 8])
+def test_geohash_center_lies_in_its_cell(latitude, longitude, precision):
+    cell = geohash_encode(latitude, longitude, precision)
+    center_lat, center_lng = geohash_center(cell)
+    assert geohash_encode(center_lat, center_lng, precision) == cell
+
+
+def test_geohash_center_is_close_to_the_point():
+    center_lat, center_lng = geohash_center(geohash_encode(40.7128, -74.006, 8))
+    # Precision 8 cells are about 38m x 19m
+    assert abs(center_lat - 40.7128) < 0.001
+    assert abs(center_lng - -74.006) < 0.001
+
+
+def test_parse_bbox():
+    assert parse_bbox("-74.05,40.68,-73.9,40.82") == (-74.05, 40.68, -73.9, 40.82)
+
+
+@pytest.mark.parametrize("value", [
+    "",
+    "1,2,3",
+    "1,2,3,4,5",
+    "a,b,c,d",
+    # Longitude out of range
+    "-181,0,10,10",
+    # Latitudes out of range or inverted
+    "0,-91,10,10",
+    "0,10,10,10",
+    "0,20,10,10",
+    # min_lng not below max_lng
+    "10,0,10,10",
+    "20,0,10,10",
+])
+def test_parse_bbox_rejects_malformed_input(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_bbox_polygon_is_a_closed_ring():
+    ring = bbox_polygon((-74.05, 40.68, -73.9, 40.82))["coordinates"][0]
+    assert ring[0] == ring[-1]
+    assert len(ring) == 5
+
+
+def test_bbox_center():
+    assert bbox_center((0, 10, 20, 30)) == (20, 10)
+
+
+def test_to_geo_point():
+    assert to_geo_point(40.7, -74.0) == {"type": "Point", "coordinates": [-74.0, 40.7]}
+    assert to_geo_point(None, -74.0) is None
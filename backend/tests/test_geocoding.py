@@ -0,0 +1,46 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.geocoding import GeocodingService
+
+
+def make_service(body) -> GeocodingService:
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=body))
+    return GeocodingService(
+        base_url="http://geocoder.test/search", user_agent="test", cache_ttl=60, negative_cache_ttl=60,
+        lru_size=10, min_interval=0, timeout=1, transport=transport,
+    )
+
+
+@pytest.mark.parametrize("body, expected", [
+    ([{"lat": "52.52", "lon": "13.405"}], {"latitude": 52.52, "longitude": 13.405}),
+    ([], None),
+])
+def test_fetch(body, expected):
+    assert asyncio.run(make_service(body)._fetch("berlin")) == expected
+
+
+@pytest.mark.parametrize("body", [
+    {"error": "Unable to geocode"},
+    [{"display_name": "Berlin"}],
+    ["Berlin"],
+    [{"lat": None, "lon": "13.4"}],
+    [{"lat": "north", "lon": "13.4"}],
+    [{"lat": "91", "lon": "13.4"}],
+    [{"lat": "nan", "lon": "13.4"}],
+])
+def test_unexpected_response_is_an_upstream_error(body, monkeypatch):
+    service = make_service(body)
+    with pytest.raises(ValueError):
+        asyncio.run(service._fetch("berlin"))
+
+    # Not cached, and reported as unresolved unless the caller retries
+    async def single_flight(key):
+        return await service._fetch(key)
+
+    monkeypatch.setattr(service, "_single_flight", single_flight)
+    assert asyncio.run(service.geocode("Berlin")) is None
+    with pytest.raises(ValueError):
+        asyncio.run(service.geocode("Berlin", strict=True))
@@ -0,0 +1,260 @@
+import asyncio
+import copy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.core import jobs
+from app.core.jobs import DONE, FAILED, PENDING, RUNNING, JobQueue
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            for op, bound in condition.items():
+                if value is None or not {"$lt": value < bound, "$lte": value <= bound}[op]:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeJobs:
+    """
+    The few operations JobQueue runs against the `jobs` collection.
+    """
+
+    def __init__(self):
+        self.docs = {}
+
+    def _apply(self, doc: dict, update: dict):
+        doc.update(update.get("$set", {}))
+        for field, value in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + value
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+
+    async def insert_one(self, doc: dict):
+        doc["_id"] = ObjectId()
+        self.docs[doc["_id"]] = doc
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        for doc in self.docs.values():
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return SimpleNamespace(matched_count=1)
+        if upsert:
+            self.docs[query["_id"]] = {**query, **update.get("$setOnInsert", {})}
+        return SimpleNamespace(matched_count=0)
+
+    async def find_one_and_update(self, query: dict, update: dict, sort, return_document):
+        candidates = sorted((doc for doc in self.docs.values() if _matches(doc, query)), key=lambda doc: doc["run_at"])
+        if not candidates:
+            return None
+        self._apply(candidates[0], update)
+        return copy.deepcopy(candidates[0])
+
+
+@pytest.fixture
+def fake_jobs(monkeypatch):
+    collection = FakeJobs()
+    monkeypatch.setattr(jobs, "db", SimpleNamespace(jobs=collection))
+    return collection
+
+
+def make_queue(**options) -> JobQueue:
+    settings = {"workers": 1, "max_attempts": 3, "lease_seconds": 60, "poll_interval": 0.01, "retention_seconds": 60}
+    return JobQueue(**{**settings, **options})
+
+
+def only_job(fake_jobs: FakeJobs) -> dict:
+    (job,) = fake_jobs.docs.values()
+    return job
+
+
+def test_claim_leases_a_due_job_once(fake_jobs):
+    queue = make_queue()
+
+    async def run():
+        await queue.enqueue("geocode", {"idea_id": "1"})
+        return await queue._claim(), await queue._claim()
+
+    claimed, again = asyncio.run(run())
+    assert claimed["status"] == RUNNING
+    assert claimed["attempts"] == 1
+    assert claimed["lease"] is not None
+    assert again is None
+
+
+def test_delayed_job_is_not_claimed_early(fake_jobs):
+    queue = make_queue()
+
+    async def run():
+        await queue.enqueue("geocode", {}, delay=60)
+        return await queue._claim()
+
+    assert asyncio.run(run()) is None
+
+
+def test_keyed_job_is_enqueued_once(fake_jobs):
+    queue = make_queue()
+
+    async def run():
+        await queue.enqueue("delete_user_content", {"user_id": "1"}, key="delete_user_content:1")
+        await queue.enqueue("delete_user_content", {"user_id": "1"}, key="delete_user_content:1")
+
+    asyncio.run(run())
+    assert list(fake_jobs.docs) == ["delete_user_content:1"]
+
+
+def test_finished_job_is_done(fake_jobs):
+    queue = make_queue()
+    seen = []
+
+    @queue.register("geocode")
+    async def geocode(payload):
+        seen.append(payload)
+
+    async def run():
+        await queue.enqueue("geocode", {"idea_id": "1"})
+        await queue._run(await queue._claim())
+
+    asyncio.run(run())
+    job = only_job(fake_jobs)
+    assert seen == [{"idea_id": "1"}]
+    assert job["status"] == DONE
+    assert "lease" not in job and "locked_until" not in job
+    assert job["expires_at"] > datetime.utcnow()
+
+
+def test_failed_job_is_retried_with_backoff(fake_jobs):
+    queue = make_queue()
+
+    @queue.register("geocode")
+    async def geocode(payload):
+        raise RuntimeError("provider down")
+
+    async def run():
+        await queue.enqueue("geocode", {})
+        await queue._run(await queue._claim())
+
+    asyncio.run(run())
+    job = only_job(fake_jobs)
+    assert job["status"] == PENDING
+    assert job["run_at"] > datetime.utcnow()
+    assert "provider down" in job["last_error"]
+    assert "lease" not in job
+
+
+def test_job_fails_for_good_after_max_attempts(fake_jobs):
+    queue = make_queue(max_attempts=2)
+    failures = []
+
+    async def give_up(payload):
+        failures.append(payload)
+
+    @queue.register("geocode", on_failure=give_up)
+    async def geocode(payload):
+        raise RuntimeError("provider down")
+
+    async def run():
+        await queue.enqueue("geocode", {"idea_id": "1"})
+        for _ in range(2):
+            only_job(fake_jobs)["run_at"] = datetime.utcnow()
+            await queue._run(await queue._claim())
+
+    asyncio.run(run())
+    job = only_job(fake_jobs)
+    assert (job["status"], job["attempts"]) == (FAILED, 2)
+    assert failures == [{"idea_id": "1"}]
+
+
+def test_job_without_handler_fails(fake_jobs):
+    queue = make_queue(max_attempts=1)
+
+    async def run():
+        await queue.enqueue("unknown", {})
+        await queue._run(await queue._claim())
+
+    asyncio.run(run())
+    job = only_job(fake_jobs)
+    assert job["status"] == FAILED
+    assert "No handler" in job["last_error"]
+
+
+def test_expired_lease_is_claimed_again(fake_jobs):
+    queue = make_queue()
+
+    async def run():
+        await queue.enqueue("rebuild", {})
+        first = await queue._claim()
+        only_job(fake_jobs)["locked_until"] = datetime.utcnow() - timedelta(seconds=1)
+        second = await queue._claim()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second["attempts"] == 2
+    assert second["lease"] != first["lease"]
+
+
+def test_stale_claim_cannot_finish_or_fail_the_job(fake_jobs):
+    queue = make_queue(max_attempts=1)
+    failures = []
+
+    async def give_up(payload):
+        failures.append(payload)
+
+    @queue.register("rebuild", on_failure=give_up)
+    async def rebuild(payload):
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+
+    async def run(payload):
+        fake_jobs.docs.clear()
+        await queue.enqueue("rebuild", payload)
+        stale = await queue._claim()
+        only_job(fake_jobs)["locked_until"] = datetime.utcnow() - timedelta(seconds=1)
+        current = await queue._claim()
+        await queue._run(stale)
+        return current
+
+    current = asyncio.run(run({}))
+    assert only_job(fake_jobs)["status"] == RUNNING
+    assert only_job(fake_jobs)["lease"] == current["lease"]
+
+    asyncio.run(run({"fail": True}))
+    assert only_job(fake_jobs)["status"] == RUNNING
+    assert failures == []
+
+
+def test_running_job_renews_its_lease(fake_jobs):
+    queue = make_queue(lease_seconds=0.15)
+    claims = []
+
+    @queue.register("rebuild")
+    async def rebuild(payload):
+        # Outlives the lease several times over; nobody may claim it meanwhile
+        for _ in range(5):
+            await asyncio.sleep(0.1)
+            claims.append(await queue._claim())
+
+    async def run():
+        await queue.enqueue("rebuild", {})
+        await queue._run(await queue._claim())
+
+    asyncio.run(run())
+    assert claims == [None] * 5
+    assert only_job(fake_jobs)["status"] == DONE
+
+
+@pytest.mark.parametrize("interval", [0, -1, float("nan")])
+def test_schedule_needs_a_positive_interval(interval):
+    with pytest.raises(ValueError):
+        make_queue().schedule_every("rebuild", interval)
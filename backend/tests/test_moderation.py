@@ -0,0 +1,182 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.crud import crud_ideas
+from app.models.idea import BulkIdeaSelection, IdeaFilter
+from app.services import moderation
+from app.services.moderation import DELETED, INVALID_ID, NOT_FOUND
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict) and "$in" in condition:
+            if value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, n):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakeIdeas:
+    """
+    The operations a bulk deletion runs against the `ideas` collection.
+    `before_delete` runs just before delete_many, to stage a concurrent write.
+    """
+
+    name = "ideas"
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.before_delete = None
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    async def update_many(self, query, update):
+        matched = [doc for doc in self.docs.values() if _matches(doc, query)]
+        for doc in matched:
+            doc.update(update["$set"])
+        return SimpleNamespace(matched_count=len(matched))
+
+    async def delete_many(self, query):
+        if self.before_delete is not None:
+            self.before_delete(self)
+        matched = [oid for oid, doc in self.docs.items() if _matches(doc, query)]
+        for oid in matched:
+            del self.docs[oid]
+        return SimpleNamespace(deleted_count=len(matched))
+
+
+def make_idea(**fields) -> dict:
+    return {"_id": ObjectId(), "category": "infrastructure", "status": "new", "title": "Pothole", **fields}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"stats": [], "terms": [], "jobs": [], "invalidated": [], "published": []}
+
+    async def update_idea_stats(removed=(), added=()):
+        calls["stats"].append([dict(doc) for doc in removed])
+
+    async def update_search_terms(removed=(), added=()):
+        calls["terms"].append([dict(doc) for doc in removed])
+
+    async def enqueue(job_type, payload, key=None, delay=0):
+        calls["jobs"].append((job_type, payload))
+
+    async def invalidate(*tags):
+        calls["invalidated"].extend(tags)
+
+    monkeypatch.setattr(moderation, "update_idea_stats", update_idea_stats)
+    monkeypatch.setattr(moderation, "update_search_terms", update_search_terms)
+    monkeypatch.setattr(moderation.job_queue, "enqueue", enqueue)
+    monkeypatch.setattr(moderation.response_cache, "invalidate", invalidate)
+    monkeypatch.setattr(moderation, "publish_idea_deleted", lambda idea_id, category: calls["published"].append(idea_id))
+    return calls
+
+
+def use_ideas(monkeypatch, docs) -> FakeIdeas:
+    collection = FakeIdeas(docs)
+    monkeypatch.setattr(crud_ideas, "db", SimpleNamespace(ideas=collection))
+    return collection
+
+
+def test_bulk_delete_by_ids(monkeypatch, calls):
+    first, second = make_idea(), make_idea()
+    ideas = use_ideas(monkeypatch, [first, second])
+    missing = str(ObjectId())
+
+    results, truncated = asyncio.run(moderation.bulk_delete(BulkIdeaSelection(ids=[str(first["_id"]), missing, "nope"])))
+
+    assert results == {str(first["_id"]): DELETED, missing: NOT_FOUND, "nope": INVALID_ID}
+    assert not truncated
+    assert list(ideas.docs) == [second["_id"]]
+    assert [[doc["_id"] for doc in removed] for removed in calls["stats"]] == [[first["_id"]]]
+    assert [[doc["title"] for doc in removed] for removed in calls["terms"]] == [["Pothole"]]
+    (job_type, payload), = calls["jobs"]
+    assert job_type == "delete_ideas_content"
+    assert payload["counters"] is True
+    assert [idea["id"] for idea in payload["ideas"]] == [str(first["_id"])]
+    # The cleanup job gets the counter fields, not the text
+    assert "title" not in payload["ideas"][0]
+    assert calls["published"] == [str(first["_id"])]
+
+
+def test_bulk_delete_by_filter(monkeypatch, calls):
+    kept = make_idea(category="safety")
+    matching = [make_idea(), make_idea()]
+    ideas = use_ideas(monkeypatch, [kept, *matching])
+
+    results, truncated = asyncio.run(moderation.bulk_delete(BulkIdeaSelection(filter=IdeaFilter(category="infrastructure"))))
+
+    assert results == {str(idea["_id"]): DELETED for idea in matching}
+    assert list(ideas.docs) == [kept["_id"]]
+
+
+def test_bulk_delete_skips_ideas_deleted_before_the_claim(monkeypatch, calls):
+    first, second = make_idea(), make_idea()
+    ideas = use_ideas(monkeypatch, [first, second])
+    find = crud_ideas.find_ideas
+
+    async def find_then_lose_one(query, projection=None, limit=0):
+        found = await find(query, projection, limit)
+        # Deleted by someone else between the selection and the claim
+        ideas.docs.pop(second["_id"], None)
+        return found
+
+    monkeypatch.setattr(crud_ideas, "find_ideas", find_then_lose_one)
+    results, _ = asyncio.run(moderation.bulk_delete(BulkIdeaSelection(ids=[str(first["_id"]), str(second["_id"])])))
+
+    assert results == {str(first["_id"]): DELETED, str(second["_id"]): NOT_FOUND}
+    assert [[doc["_id"] for doc in removed] for removed in calls["stats"]] == [[first["_id"]]]
+    assert calls["jobs"][-1][1]["counters"] is True
+
+
+def test_bulk_delete_rebuilds_counters_when_it_loses_a_race(monkeypatch, calls):
+    first, second = make_idea(), make_idea()
+    ideas = use_ideas(monkeypatch, [first, second])
+    # Deleted (and counted) by a single delete after the claim
+    ideas.before_delete = lambda collection: collection.docs.pop(second["_id"])
+
+    results, _ = asyncio.run(moderation.bulk_delete(BulkIdeaSelection(ids=[str(first["_id"]), str(second["_id"])])))
+
+    # Both are gone, but the counters of the lost one were already moved
+    assert results == {str(first["_id"]): DELETED, str(second["_id"]): DELETED}
+    assert not ideas.docs
+    assert calls["stats"] == [] and calls["terms"] == []
+    job_types = [job_type for job_type, _ in calls["jobs"]]
+    assert {"rebuild_idea_stats", "rebuild_search_terms", "rebuild_idea_cells"} <= set(job_types)
+    assert calls["jobs"][-1][1]["counters"] is False
+
+
+def test_bulk_delete_leaves_ideas_claimed_by_another_pass(monkeypatch, calls):
+    first, second = make_idea(), make_idea()
+    ideas = use_ideas(monkeypatch, [first, second])
+    other_claim = ObjectId()
+    ideas.before_delete = lambda collection: collection.docs[second["_id"]].update(claim=other_claim)
+
+    asyncio.run(moderation.bulk_delete(BulkIdeaSelection(ids=[str(first["_id"]), str(second["_id"])])))
+
+    assert list(ideas.docs) == [second["_id"]]
+
+
+def test_bulk_delete_needs_ids_or_a_filter(calls):
+    with pytest.raises(ValueError):
+        asyncio.run(moderation.bulk_delete(BulkIdeaSelection()))
@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.pagination import SortMode, decode_cursor, decode_keyset, encode_cursor, encode_keyset, keyset_query
+
+DOC_ID = ObjectId()
+
+
+@pytest.mark.parametrize("value", [datetime(2024, 5, 1, 12, 30, 15, 250000), 42, 3.5, "waste", None])
+def test_keyset_round_trip(value):
+    cursor = encode_keyset("any", value, DOC_ID)
+    assert "=" not in cursor
+    assert decode_keyset(cursor, "any") == (value, DOC_ID)
+
+
+def test_cursor_carries_the_sort_key_of_the_document():
+    created_at = datetime(2024, 5, 1)
+    doc = {"_id": DOC_ID, "created_at": created_at, "vote_score": 7}
+    assert decode_cursor(encode_cursor(SortMode.NEWEST, doc), SortMode.NEWEST) == (created_at, DOC_ID)
+    assert decode_cursor(encode_cursor(SortMode.TOP, doc), SortMode.TOP) == (7, DOC_ID)
+
+
+def _raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    # Issued for another sort
+    encode_keyset("top", 3, DOC_ID),
+    "not a cursor",
+    _raw_cursor({"s": "newest", "k": {"v": 1}, "id": "not-an-object-id"}),
+    _raw_cursor({"s": "newest", "k": {"d": "yesterday"}, "id": str(DOC_ID)}),
+    _raw_cursor({"s": "newest", "id": str(DOC_ID)}),
+    _raw_cursor(["newest"]),
+])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, SortMode.NEWEST)
+    assert error.value.status_code == 400
+
+
+def test_first_page_has_no_range_condition():
+    query, sort = keyset_query({"category": "waste"}, SortMode.HOT, None)
+    assert query == {"category": "waste"}
+    assert sort == [("hot_score", -1), ("_id", -1)]
+
+
+def test_descending_page_continues_below_the_cursor():
+    cursor = encode_cursor(SortMode.TOP, {"_id": DOC_ID, "vote_score": 5})
+    query, sort = keyset_query({}, SortMode.TOP, cursor)
+    assert query == {"$or": [
+        {"vote_score": {"$lt": 5}},
+        # Ties on the sort key are broken by _id in the same direction
+        {"vote_score": 5, "_id": {"$lt": DOC_ID}},
+    ]}
+    assert sort == [("vote_score", -1), ("_id", -1)]
+
+
+def test_ascending_page_continues_above_the_cursor_within_the_filter():
+    created_at = datetime(2024, 5, 1)
+    cursor = encode_cursor(SortMode.OLDEST, {"_id": DOC_ID, "created_at": created_at})
+    query, sort = keyset_query({"status": "read"}, SortMode.OLDEST, cursor)
+    assert query == {"$and": [
+        {"status": "read"},
+        {"$or": [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "_id": {"$gt": DOC_ID}},
+        ]},
+    ]}
+    assert sort == [("created_at", 1), ("_id", 1)]
+
+
+def test_tie_break_walks_equal_keys_in_order():
+    # Documents as the index would return them for sort=top
+    docs = sorted(
+        [{"_id": ObjectId(), "vote_score": score} for score in (3, 3, 3, 2, 2, 1)],
+        key=lambda doc: (-doc["vote_score"], -int(str(doc["_id"]), 16)),
+    )
+
+    def matches(doc, condition):
+        if "$or" in condition:
+            return any(matches(doc, c) for c in condition["$or"])
+        for field, expected in condition.items():
+            if isinstance(expected, dict):
+                (op, bound), = expected.items()
+                value = int(str(doc[field]), 16) if field == "_id" else doc[field]
+                bound = int(str(bound), 16) if field == "_id" else bound
+                if not (value < bound if op == "$lt" else value > bound):
+                    return False
+            elif doc[field] != expected:
+                return False
+        return True
+
+    seen, cursor = [], None
+    while True:
+        query, _ = keyset_query({}, SortMode.TOP, cursor)
+        page = [doc for doc in docs if matches(doc, query)][:2]
+        if not page:
+            break
+        seen += page
+        cursor = encode_cursor(SortMode.TOP, page[-1])
+    assert seen == docs
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.core.principals import PrincipalCache
+
+
+class Loader:
+    def __init__(self, result="alice"):
+        self.result = result
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_principal_is_loaded_once():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    load = Loader()
+
+    async def run():
+        return [await cache.get_or_load("a@example.com", load) for _ in range(3)]
+
+    assert asyncio.run(run()) == ["alice"] * 3
+    assert load.calls == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_unknown_user_is_not_cached():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    load = Loader(result=None)
+
+    async def run():
+        await cache.get_or_load("a@example.com", load)
+        await cache.get_or_load("a@example.com", load)
+
+    asyncio.run(run())
+    assert load.calls == 2
+
+
+def test_expired_principal_is_loaded_again():
+    cache = PrincipalCache(maxsize=10, ttl=0)
+    load = Loader()
+
+    async def run():
+        await cache.get_or_load("a@example.com", load)
+        await cache.get_or_load("a@example.com", load)
+
+    asyncio.run(run())
+    assert load.calls == 2
+
+
+def test_evicted_principal_is_loaded_again():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    load = Loader()
+
+    async def run():
+        await cache.get_or_load("a@example.com", load)
+        await cache.evict("a@example.com")
+        load.result = "alice, no longer admin"
+        return await cache.get_or_load("a@example.com", load)
+
+    assert asyncio.run(run()) == "alice, no longer admin"
+    assert load.calls == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lookup_racing_an_eviction_is_not_cached():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+
+    async def run():
+        started, evicted = asyncio.Event(), asyncio.Event()
+
+        async def slow_load():
+            started.set()
+            await evicted.wait()
+            return "alice as read before the eviction"
+
+        lookup = asyncio.create_task(cache.get_or_load("a@example.com", slow_load))
+        await started.wait()
+        await cache.evict("a@example.com")
+        evicted.set()
+        await lookup
+        return await cache.get_or_load("a@example.com", Loader("alice"))
+
+    assert asyncio.run(run()) == "alice"
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+def test_eviction_is_broadcast_to_other_workers():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache._redis = FakeRedis()
+    asyncio.run(cache.evict("a@example.com"))
+    assert cache._redis.published == [("principal-evictions", "a@example.com")]
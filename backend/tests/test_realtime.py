@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+from app.core.realtime import RealtimeHub, Subscriber, make_event
+
+
+def make_hub(**options) -> RealtimeHub:
+    settings = {"coalesce_interval": 60, "queue_size": 10, "max_topics": 5}
+    return RealtimeHub(**{**settings, **options})
+
+
+def idea_event(idea_id: str, votes: int = 0):
+    return make_event("idea.updated", {"idea_id": idea_id, "vote_score": votes}, (f"idea:{idea_id}",))
+
+
+def drain(subscriber: Subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        events.append(json.loads(subscriber.queue.get_nowait().data))
+    return events
+
+
+class FakeRelay:
+    """
+    A relay shared by several hubs: claims hold for the whole test, sent
+    events reach every hub.
+    """
+
+    def __init__(self):
+        self.hubs = []
+        self.claims = {}
+
+    async def claim(self, keys, ttl):
+        claimed = [key for key in keys if key not in self.claims]
+        for key in claimed:
+            self.claims[key] = ttl
+        return claimed
+
+    async def send(self, event):
+        for hub in self.hubs:
+            hub._deliver(event)
+
+    async def close(self):
+        pass
+
+
+def test_marks_are_coalesced_into_one_load_per_round():
+    hub = make_hub()
+    loads = []
+
+    async def loader(keys):
+        loads.append(sorted(keys))
+        return [idea_event(key, votes=len(loads)) for key in keys]
+
+    async def run():
+        hub.set_loader(loader)
+        subscriber = hub.connect()
+        hub.subscribe(subscriber, "idea:a")
+        for _ in range(5):
+            hub.mark("a")
+        hub.mark("b")
+        await hub.flush()
+        await hub.flush()
+        return subscriber
+
+    subscriber = asyncio.run(run())
+    assert loads == [["a", "b"]]
+    assert drain(subscriber) == [{"type": "idea.updated", "idea_id": "a", "vote_score": 1}]
+    stats = hub.stats()
+    assert (stats["coalesced"], stats["published"], stats["pending"]) == (4, 2, 0)
+
+
+def test_marks_without_listeners_are_ignored():
+    hub = make_hub()
+    hub.mark("a")
+    assert hub.stats()["pending"] == 0
+
+
+def test_failed_load_drops_the_round():
+    hub = make_hub()
+
+    async def loader(keys):
+        raise RuntimeError("database unavailable")
+
+    async def run():
+        hub.set_loader(loader)
+        hub.connect()
+        hub.mark("a")
+        await hub.flush()
+
+    asyncio.run(run())
+    assert (hub.stats()["load_errors"], hub.stats()["pending"]) == (1, 0)
+
+
+def test_slow_subscriber_loses_its_oldest_events():
+    hub = make_hub(queue_size=2)
+
+    async def run():
+        slow, fast = hub.connect(), hub.connect()
+        hub.subscribe(slow, "idea:a")
+        hub.subscribe(fast, "idea:a")
+        for votes in range(3):
+            hub.publish(idea_event("a", votes))
+            drain(fast)
+        return slow
+
+    slow = asyncio.run(run())
+    assert [event["vote_score"] for event in drain(slow)] == [1, 2]
+    assert slow.dropped == 1
+    assert (hub.stats()["dropped"], hub.stats()["delivered"]) == (1, 6)
+
+
+def test_subscriber_matching_several_topics_gets_an_event_once():
+    hub = make_hub()
+
+    async def run():
+        subscriber = hub.connect()
+        hub.subscribe(subscriber, "idea:a")
+        hub.subscribe(subscriber, "category:safety")
+        hub.subscribe(subscriber, "bbox:0,0,10,10")
+        hub.publish(make_event("idea.updated", {"idea_id": "a"}, ("idea:a", "category:safety"), point=(5, 5)))
+        return subscriber
+
+    assert len(drain(asyncio.run(run()))) == 1
+
+
+def test_one_worker_publishes_a_key_marked_in_several():
+    relay = FakeRelay()
+    hubs = [make_hub(relay=relay), make_hub(relay=relay)]
+    relay.hubs = hubs
+    loads = []
+
+    async def loader(keys):
+        loads.append(sorted(keys))
+        return [idea_event(key) for key in keys]
+
+    async def run():
+        subscriber = hubs[1].connect()
+        hubs[1].subscribe(subscriber, "idea:a")
+        for hub in hubs:
+            hub.set_loader(loader)
+            hub.mark("a")
+        for hub in hubs:
+            await hub.flush()
+        await asyncio.gather(*hubs[0]._sending, *hubs[1]._sending)
+        return subscriber
+
+    subscriber = asyncio.run(run())
+    assert loads == [["a"]]
+    assert len(drain(subscriber)) == 1
+    # The other worker publishes it once the claim has expired
+    assert (hubs[1].stats()["postponed"], hubs[1].stats()["pending"]) == (1, 1)
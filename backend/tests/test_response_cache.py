@@ -0,0 +1,150 @@
+import asyncio
+
+from fastapi import Request, Response
+
+from app.core.response_cache import CachedResponse, MemoryBackend, ResponseCache
+
+ENTRY = CachedResponse(b'{"title":"bench"}', '"etag-1"', {})
+
+
+def request(path="/api/ideas/1", query=b"", headers=()) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query,
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    })
+
+
+def test_invalidation_drops_tagged_entries_only():
+    backend = MemoryBackend(maxsize=10)
+
+    async def run():
+        since = await backend.watermark()
+        await backend.set("a", ENTRY, ["idea:1", "ideas"], ttl=60, since=since)
+        await backend.set("b", ENTRY, ["idea:2", "ideas"], ttl=60, since=since)
+        await backend.invalidate(["idea:1"])
+        return await backend.get("a"), await backend.get("b")
+
+    assert asyncio.run(run()) == (None, ENTRY)
+
+
+def test_entry_built_before_an_invalidation_is_not_stored():
+    backend = MemoryBackend(maxsize=10)
+
+    async def run():
+        since = await backend.watermark()
+        # A write lands while the response is being built
+        await backend.invalidate(["idea:1"])
+        stored = await backend.set("a", ENTRY, ["idea:1"], ttl=60, since=since)
+        return stored, await backend.get("a")
+
+    assert asyncio.run(run()) == (False, None)
+
+
+def test_invalidation_of_other_tags_does_not_block_a_store():
+    backend = MemoryBackend(maxsize=10)
+
+    async def run():
+        since = await backend.watermark()
+        await backend.invalidate(["idea:2"])
+        return await backend.set("a", ENTRY, ["idea:1"], ttl=60, since=since)
+
+    assert asyncio.run(run()) is True
+
+
+def test_forgotten_tags_count_as_recently_invalidated():
+    backend = MemoryBackend(maxsize=10, tag_history=1)
+
+    async def run():
+        since = await backend.watermark()
+        await backend.invalidate(["idea:1"])
+        # Pushes idea:1 out of the history
+        await backend.invalidate(["idea:2"])
+        return await backend.set("a", ENTRY, ["idea:1"], ttl=60, since=since)
+
+    assert asyncio.run(run()) is False
+
+
+def test_entries_expire_and_are_bounded():
+    backend = MemoryBackend(maxsize=2)
+
+    async def run():
+        await backend.set("expired", ENTRY, [], ttl=0, since=0)
+        for key in ("a", "b", "c"):
+            await backend.set(key, ENTRY, [], ttl=60, since=0)
+        return [await backend.get(key) for key in ("expired", "a", "b", "c")]
+
+    assert asyncio.run(run()) == [None, None, ENTRY, ENTRY]
+
+
+def make_cache() -> ResponseCache:
+    return ResponseCache(MemoryBackend(maxsize=10), enabled=True, ttl=60, max_age=0)
+
+
+def test_serve_builds_once_then_answers_from_the_cache():
+    cache = make_cache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return {"title": "bench"}, ["idea:1"]
+
+    async def run():
+        first = await cache.serve(request(), Response(), dict, build)
+        second = await cache.serve(request(), Response(), dict, build)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(builds) == 1
+    assert first.body == second.body == b'{"title":"bench"}'
+    assert first.headers["etag"] == second.headers["etag"]
+    assert (cache.hits, cache.misses, cache.stores) == (1, 1, 1)
+
+
+def test_serve_answers_304_for_a_matching_etag():
+    cache = make_cache()
+
+    async def build():
+        return {"title": "bench"}, ["idea:1"]
+
+    async def run():
+        etag = (await cache.serve(request(), Response(), dict, build)).headers["etag"]
+        return await cache.serve(request(headers=[("if-none-match", f'W/{etag}')]), Response(), dict, build)
+
+    assert asyncio.run(run()).status_code == 304
+
+
+def test_serve_does_not_store_a_response_raced_by_a_write():
+    cache = make_cache()
+
+    async def build():
+        await cache.invalidate("idea:1")
+        return {"title": "before the write"}, ["idea:1"]
+
+    async def run():
+        await cache.serve(request(), Response(), dict, build)
+        return await cache.backend.get(cache.key(request()))
+
+    assert asyncio.run(run()) is None
+    assert cache.skipped_stores == 1
+
+
+def test_serve_replays_listed_headers():
+    cache = make_cache()
+
+    async def build(response):
+        response.headers["X-Next-Cursor"] = "abc"
+        return [], ["ideas"]
+
+    async def run():
+        first = Response()
+        await cache.serve(request(), first, list, lambda: build(first), headers=["X-Next-Cursor"])
+        return await cache.serve(request(), Response(), list, lambda: build(Response()), headers=["X-Next-Cursor"])
+
+    assert asyncio.run(run()).headers["x-next-cursor"] == "abc"
+
+
+def test_cache_key_ignores_query_parameter_order():
+    assert ResponseCache.key(request(query=b"b=2&a=1")) == ResponseCache.key(request(query=b"a=1&b=2"))
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import search
+from app.services.search import MAX_EXPANSIONS_PER_WORD, deletions, expand_query, tokenize
+
+
+def _matches(doc: dict, condition: dict) -> bool:
+    for field, bounds in condition.items():
+        value = doc[field]
+        values = value if isinstance(value, list) else [value]
+        for op, bound in bounds.items():
+            if op == "$in" and not set(values) & set(bound):
+                return False
+            if op == "$gte" and not value >= bound:
+                return False
+            if op == "$lt" and not value < bound:
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeSearchTerms:
+    def __init__(self, frequencies: dict):
+        self.docs = [{"_id": term, "deletes": sorted(deletions(term)), "df": df} for term, df in frequencies.items()]
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor([dict(doc) for doc in self.docs if any(_matches(doc, condition) for condition in query["$or"])])
+
+
+@pytest.fixture
+def vocabulary(monkeypatch):
+    def install(frequencies: dict) -> FakeSearchTerms:
+        collection = FakeSearchTerms(frequencies)
+        monkeypatch.setattr(search, "db", SimpleNamespace(search_terms=collection))
+        return collection
+    return install
+
+
+def test_tokenize_lowercases_and_drops_single_characters():
+    assert tokenize("Fix the  Pot-hole on 5th Ave, a.s.a.p!") == ["fix", "the", "pot", "hole", "on", "5th", "ave"]
+
+
+def test_deletions_skip_short_words():
+    assert deletions("bus") == set()
+    assert deletions("park") == {"ark", "pak", "prk", "par"}
+
+
+def test_prefix_is_expanded(vocabulary):
+    vocabulary({"mahatma": 3, "main": 5, "gandhi": 2})
+    assert asyncio.run(expand_query("Mah")) == ["mah", "mahatma"]
+
+
+def test_one_edit_is_expanded(vocabulary):
+    vocabulary({"gandhi": 2, "garden": 4})
+    # A missing, an extra and a substituted character
+    assert asyncio.run(expand_query("gandi")) == ["gandi", "gandhi"]
+    assert asyncio.run(expand_query("gardden")) == ["gardden", "garden"]
+    assert asyncio.run(expand_query("gerden")) == ["gerden", "garden"]
+
+
+def test_short_words_are_matched_exactly(vocabulary):
+    terms = vocabulary({"bus": 3, "bug": 1, "bust": 2})
+    assert asyncio.run(expand_query("bu")) == ["bu"]
+    # Never sent to the database: nothing to expand it with
+    assert terms.queries == []
+
+
+def test_words_are_deduplicated_in_query_order(vocabulary):
+    vocabulary({})
+    assert asyncio.run(expand_query("Park bench park")) == ["park", "bench"]
+
+
+def test_expansions_are_capped_most_frequent_first(vocabulary):
+    vocabulary({f"street{i:02d}": i for i in range(20)})
+    terms = asyncio.run(expand_query("street"))
+    assert terms[0] == "street"
+    assert terms[1:] == [f"street{i:02d}" for i in range(19, 19 - MAX_EXPANSIONS_PER_WORD, -1)]
+
+
+def test_empty_query(vocabulary):
+    terms = vocabulary({"park": 1})
+    assert asyncio.run(expand_query("  ?! ")) == []
+    assert terms.queries == []
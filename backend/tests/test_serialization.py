@@ -0,0 +1,40 @@
+import json
+from typing import Optional
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+from app.core.serialization import mongo_projection, render_json
+from app.models.comment import Comment
+
+
+class Item(BaseModel):
+    id: str
+    name: str
+    note: Optional[str] = None
+
+
+def test_projection_computes_id_from_object_id():
+    assert mongo_projection(Item) == {"name": 1, "note": 1, "id": {"$toString": "$_id"}}
+
+
+def test_projection_with_extra_fields():
+    assert mongo_projection(Item, "created_at", "secret") == {
+        "name": 1,
+        "note": 1,
+        "id": {"$toString": "$_id"},
+        "created_at": 1,
+        "secret": 1,
+    }
+
+
+def test_projection_covers_every_model_field():
+    projection = mongo_projection(Comment)
+    assert set(projection) == set(Comment.model_fields)
+    assert "_id" not in projection
+
+
+def test_render_json_of_projected_documents():
+    doc_id = str(ObjectId())
+    rendered = render_json(list[Item], [{"id": doc_id, "name": "bench"}])
+    assert json.loads(rendered) == [{"id": doc_id, "name": "bench", "note": None}]
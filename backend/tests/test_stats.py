@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.stats import RESOLVE_BUCKET_HOURS, median_resolve_hours, resolve_bucket, resolve_hours
+
+
+def test_median_of_an_empty_histogram():
+    assert median_resolve_hours({}) is None
+    assert median_resolve_hours({0: 0, 24: 0}) is None
+
+
+def test_median_is_interpolated_inside_its_bucket():
+    # Two ideas in [0, 1): the median sits halfway into the bucket
+    assert median_resolve_hours({0: 2}) == 0.5
+    # Four ideas in [24, 48)
+    assert median_resolve_hours({24: 4}) == 36.0
+    # One each in [0, 1) and [1, 2): the first bucket is exactly filled
+    assert median_resolve_hours({0: 1, 1: 1}) == 1.0
+    # Half of 10 is reached 2 ideas into the 4 of [8, 12)
+    assert median_resolve_hours({0: 3, 8: 4, 24: 3}) == 10.0
+
+
+def test_median_in_the_open_ended_bucket_is_its_lower_bound():
+    last = RESOLVE_BUCKET_HOURS[-1]
+    assert median_resolve_hours({0: 1, last: 5}) == float(last)
+
+
+def test_median_ignores_negative_counts():
+    # Counters can dip below zero briefly when deltas race
+    assert median_resolve_hours({0: -3, 24: 4}) == 36.0
+
+
+@pytest.mark.parametrize("hours, bucket", [(0, 0), (0.5, 0), (1, 1), (23.9, 12), (24, 24), (100000, RESOLVE_BUCKET_HOURS[-1])])
+def test_resolve_bucket(hours, bucket):
+    assert resolve_bucket(hours) == bucket
+
+
+def test_resolve_hours():
+    created_at = datetime(2024, 5, 1)
+    assert resolve_hours({"status": "resolved", "created_at": created_at, "resolved_at": created_at + timedelta(hours=30)}) == 30.0
+    # Clock skew never produces a negative time
+    assert resolve_hours({"status": "resolved", "created_at": created_at, "resolved_at": created_at - timedelta(hours=1)}) == 0.0
+    assert resolve_hours({"status": "read", "created_at": created_at, "resolved_at": created_at}) is None
+    assert resolve_hours({"status": "resolved", "created_at": created_at}) is None
@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from app.services import votes
+from app.services.ranking import counters_update
+from app.services.votes import VoteCounterBuffer, vote_deltas
+
+IDEA_A = str(ObjectId())
+IDEA_B = str(ObjectId())
+
+
+@pytest.mark.parametrize("previous, current, expected", [
+    (None, "upvote", {"vote_score": 1, "upvotes": 1}),
+    (None, "downvote", {"vote_score": -1, "downvotes": 1}),
+    ("upvote", None, {"vote_score": -1, "upvotes": -1}),
+    ("downvote", None, {"vote_score": 1, "downvotes": -1}),
+    ("upvote", "downvote", {"vote_score": -2, "upvotes": -1, "downvotes": 1}),
+    ("downvote", "upvote", {"vote_score": 2, "upvotes": 1, "downvotes": -1}),
+    ("upvote", "upvote", {}),
+    (None, None, {}),
+])
+def test_vote_deltas(previous, current, expected):
+    assert vote_deltas(previous, current) == expected
+
+
+class FakeIdeas:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append(operations)
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+class FakeDb:
+    def __init__(self, errors=()):
+        self.ideas = FakeIdeas(errors)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(errors=()):
+        fake = FakeDb(errors)
+        monkeypatch.setattr(votes, "db", fake)
+        return fake.ideas
+    return install
+
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    calls = []
+
+    async def record(idea_ids):
+        calls.append(sorted(idea_ids))
+
+    monkeypatch.setattr(votes, "_invalidate_counters", record)
+    return calls
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    calls = []
+
+    async def enqueue(job_type, payload, key=None, delay=0):
+        calls.append((job_type, payload))
+
+    monkeypatch.setattr(votes.job_queue, "enqueue", enqueue)
+    return calls
+
+
+def make_buffer(max_pending=100):
+    return VoteCounterBuffer(enabled=True, flush_interval=60, max_pending=max_pending)
+
+
+def test_flush_coalesces_votes_per_idea(fake_db, invalidated):
+    ideas = fake_db()
+    buffer = make_buffer()
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    buffer.add(IDEA_B, vote_deltas(None, "downvote"))
+    asyncio.run(buffer.flush())
+
+    assert ideas.calls == [[
+        UpdateOne({"_id": ObjectId(IDEA_A)}, counters_update({"vote_score": 2, "upvotes": 2})),
+        UpdateOne({"_id": ObjectId(IDEA_B)}, counters_update({"vote_score": -1, "downvotes": 1})),
+    ]]
+    assert invalidated == [sorted([IDEA_A, IDEA_B])]
+    stats = buffer.stats()
+    assert (stats["flushes"], stats["flushed_votes"], stats["pending_votes"]) == (1, 3, 0)
+
+
+def test_flush_skips_deltas_that_cancel_out(fake_db, invalidated):
+    ideas = fake_db()
+    buffer = make_buffer()
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    buffer.add(IDEA_A, vote_deltas("upvote", None))
+    asyncio.run(buffer.flush())
+
+    assert ideas.calls == []
+    assert buffer.stats()["pending_votes"] == 0
+
+
+def test_flush_without_pending_votes_writes_nothing(fake_db, invalidated):
+    ideas = fake_db()
+    asyncio.run(make_buffer().flush())
+    assert ideas.calls == []
+    assert invalidated == []
+
+
+def test_failed_flush_keeps_deltas_for_the_next_one(fake_db, invalidated):
+    ideas = fake_db(errors=[AutoReconnect("primary stepped down")])
+    buffer = make_buffer()
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    asyncio.run(buffer.flush())
+
+    assert buffer.stats()["flush_errors"] == 1
+    assert buffer.stats()["pending_votes"] == 1
+    assert invalidated == []
+
+    # Votes arriving in between are merged with the retried deltas
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    asyncio.run(buffer.flush())
+
+    assert ideas.calls[-1] == [
+        UpdateOne({"_id": ObjectId(IDEA_A)}, counters_update({"vote_score": 2, "upvotes": 2})),
+    ]
+    stats = buffer.stats()
+    assert (stats["flushes"], stats["flushed_votes"], stats["pending_votes"]) == (1, 2, 0)
+
+
+def test_partially_failed_flush_is_not_retried(fake_db, invalidated, enqueued):
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "boom"}]})
+    ideas = fake_db(errors=[error])
+    buffer = make_buffer()
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    buffer.add(IDEA_B, vote_deltas(None, "upvote"))
+    asyncio.run(buffer.flush())
+
+    # Re-applying would double count the updates that did succeed
+    stats = buffer.stats()
+    assert (stats["flush_errors"], stats["pending_votes"], stats["pending_ideas"]) == (1, 0, 0)
+    assert invalidated == [sorted([IDEA_A, IDEA_B])]
+    asyncio.run(buffer.flush())
+    assert len(ideas.calls) == 1
+    # Only the idea whose update failed is recounted
+    assert enqueued == [("reconcile_votes", {"idea_ids": [IDEA_B]})]
+
+
+def test_partially_failed_flush_without_indexes_recounts_every_idea(fake_db, invalidated, enqueued):
+    fake_db(errors=[BulkWriteError({"writeErrors": [{"code": 11000, "errmsg": "boom"}]})])
+    buffer = make_buffer()
+    buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+    buffer.add(IDEA_B, vote_deltas(None, "upvote"))
+    asyncio.run(buffer.flush())
+
+    assert enqueued == [("reconcile_votes", {"idea_ids": [IDEA_A, IDEA_B]})]
+
+
+def test_reaching_max_pending_starts_a_flush(fake_db, invalidated):
+    ideas = fake_db()
+    buffer = make_buffer(max_pending=2)
+
+    async def vote_twice():
+        buffer.add(IDEA_A, vote_deltas(None, "upvote"))
+        assert buffer._flushing is None
+        buffer.add(IDEA_B, vote_deltas(None, "upvote"))
+        await buffer._flushing
+
+    asyncio.run(vote_twice())
+    assert len(ideas.calls) == 1
+    assert buffer.stats()["flushed_votes"] == 2
+
+
+def test_stop_writes_out_pending_votes(fake_db, invalidated):
+    ideas = fake_db()
+    buffer = make_buffer()
+
+    async def run():
+        await buffer.start()
+        buffer.add(IDEA_A, vote_deltas(None, "downvote"))
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert ideas.calls == [[
+        UpdateOne({"_id": ObjectId(IDEA_A)}, counters_update({"vote_score": -1, "downvotes": 1})),
+    ]]